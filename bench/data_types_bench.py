@@ -0,0 +1,79 @@
+'''Compares the slotted value types with plain dataclasses.
+
+Run from the repository root with: python -m bench.data_types_bench'''
+
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from common.data_types import Color, Rect, Vec2D
+
+COUNT: int = 100_000
+
+
+# what the value types looked like before they were slotted
+@dataclass
+class PlainVec2D:
+    x: int
+    y: int
+
+    def __add__(self, other: 'PlainVec2D') -> 'PlainVec2D':
+        return PlainVec2D(self.x + other.x, self.y + other.y)
+
+    def __mul__(self, scalar: int) -> 'PlainVec2D':
+        return PlainVec2D(self.x * scalar, self.y * scalar)
+
+@dataclass
+class PlainColor:
+    r: int
+    g: int
+    b: int
+
+
+def bytes_per_instance(build: Callable[[int], object]) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    instances = [build(i) for i in range(COUNT)]
+
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    del instances
+    return (after - before) / COUNT
+
+def ops_per_second(statement: Callable[[], object]) -> float:
+    runs = 5
+    best = min(timeit.repeat(statement, number=COUNT, repeat=runs))
+    return COUNT / best
+
+
+def main() -> None:
+    print(f"memory per entity (pos, mov_dir, color) over {COUNT} entities")
+    plain = bytes_per_instance(lambda i: (PlainVec2D(i, i), PlainVec2D(0, 1), PlainColor(1, 2, 3)))
+    slotted = bytes_per_instance(lambda i: (Vec2D(i, i), Vec2D(0, 1), Color(1, 2, 3)))
+    print(f"- plain dataclasses: {plain:7.1f} bytes")
+    print(f"- slotted:           {slotted:7.1f} bytes ({plain / slotted:.2f}x smaller)")
+
+    print("player step (pos += mov_dir * speed, clamped to the world)")
+    bounds = Rect(Vec2D(50, 50), Vec2D(1550, 850))
+
+    plain_pos, plain_dir = PlainVec2D(100, 100), PlainVec2D(1, 0)
+    def plain_step() -> None:
+        nonlocal plain_pos
+        new_pos = plain_pos + plain_dir * 3
+        plain_pos = PlainVec2D(min(1550, max(50, new_pos.x)), min(850, max(50, new_pos.y)))
+
+    pos, mov_dir = Vec2D(100, 100), Vec2D(1, 0)
+    def in_place_step() -> None:
+        pos.add_scaled_into(mov_dir, 3).clamp_into(bounds)
+
+    plain_ops = ops_per_second(plain_step)
+    in_place_ops = ops_per_second(in_place_step)
+    print(f"- allocating, plain: {plain_ops/1e6:7.2f} M ops/s")
+    print(f"- in place, slotted: {in_place_ops/1e6:7.2f} M ops/s ({in_place_ops / plain_ops:.2f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from typing import Callable
+from typing import Callable, Iterable
 
 import pygame
 
@@ -7,12 +7,13 @@ from common.data_types import Vec2D
 
 
 class ClientBullet:
+    RADIUS: int = 10
 
     def __init__(self, pos: Vec2D) -> None:
 
         self.pos: Vec2D = pos
 
-        self.radius: int = 10
+        self.radius: int = ClientBullet.RADIUS
         
         self.rect = pygame.Rect(self.pos.x-self.radius, self.pos.y-self.radius, self.radius*2, self.radius*2)
 
@@ -25,3 +26,14 @@ class ClientBullet:
     @staticmethod
     def from_common(common: CommonBullet) -> 'ClientBullet':
         return ClientBullet(pos= common.pos)
+
+    @staticmethod
+    def draw_records(screen: pygame.Surface, scaler: Callable[[pygame.Rect], pygame.Rect], records: Iterable[tuple[int, int]]) -> None:
+        '''Draws bullets straight from CommonBullet.RECORDs without making a ClientBullet for each'''
+        r = ClientBullet.RADIUS
+        draw_radius = scaler(pygame.Rect(0,0,r,r)).w
+        rect = pygame.Rect(0, 0, r*2, r*2)
+
+        for x, y in records:
+            rect.update(x-r, y-r, r*2, r*2)
+            pygame.draw.circle(screen, (0, 0, 0), scaler(rect).center, draw_radius)
@@ -1,16 +1,19 @@
 import _thread
 import math
-from typing import Callable, Optional
+import time
+from typing import Callable, Iterable, Optional
 
 import pygame
 
 from client import keybinds
-from client.bullet import ClientBullet
+from client.interpolation import SnapshotBuffer, SnapshotClock, extrapolate
 from client.network import Network
 from client.pages import page_ids
 from client.player import ClientPlayer
+from client.prediction import Predictor
+from client.settings import Settings
 from common.c2s_packets import C2SClientDisconnect, C2SCreateBullet, C2SMovementUpdate, C2SRequestPlayerList
-from common.data_types import Vec2D
+from common.data_types import Color, Vec2D
 
 
 class Game:
@@ -21,6 +24,13 @@ class Game:
         
         self.this_player_id: int = -1
 
+        self.input_seq: int = 0 # numbers every movement and shot sent, in order
+        self.predictor: Predictor = Predictor(Settings.max_prediction_catch_up) # before the network threads start
+
+        self.snapshot_clock: SnapshotClock = SnapshotClock(Settings.interpolation_jitter_margin, Settings.max_interpolation_delay)
+        self.player_snapshots: SnapshotBuffer = SnapshotBuffer(Settings.snapshot_buffer_size) # (x, y, r, g, b) by id
+        self.bullet_snapshots: SnapshotBuffer = SnapshotBuffer(Settings.snapshot_buffer_size) # (x, y, vx, vy, since tick) by id
+
         try:
             self.initialise_network(port)
             self.network_live: bool = True
@@ -35,7 +45,7 @@ class Game:
         if self.network_live:
             self.network.send(C2SRequestPlayerList())
 
-        self.bullets: list[ClientBullet] = []
+        self.bullets: Iterable[tuple[int, int]] = [] # CommonBullet.RECORDs
 
         self.movement_codes: list[int] = [0, 0, 0, 0]
         self.movement_codes_dirty: bool = False
@@ -51,7 +61,6 @@ class Game:
             self.page_changer(page_ids.PAGE_MENU)
             raise ConnectionAbortedError()
 
-        _thread.start_new_thread(self.network.packet_loop, ())
         _thread.start_new_thread(self.network.read_loop, ())
 
     def get_this_player(self) -> Optional[ClientPlayer]:
@@ -73,25 +82,67 @@ class Game:
             return
         
         self.send_network_updates()
+
+        now = time.perf_counter()
+        if Settings.predict_movement:
+            self.predictor.advance(now)
+
+        self.update_view(now)
+
+    def update_view(self, now: float) -> None:
+        '''Works out what to draw this frame from the buffered snapshots'''
+        tick = self.snapshot_clock.tick_at(now)
+
+        self.players = [ClientPlayer(id, Vec2D(x, y), Color(r, g, b)) for id, (x, y, r, g, b) in self.player_snapshots.sample(tick).items()]
+        self.bullets = [extrapolate(b, tick) for b in self.bullet_snapshots.sample(tick).values()]
+
+        self.show_prediction()
+
+    def show_prediction(self) -> None:
+        '''Draws this client's player where it's predicted to be rather than where the server last had it'''
+        pos = self.predictor.pos
+        if pos is None or not Settings.predict_movement:
+            return
+
+        for p in self.players:
+            if p.id == self.this_player_id:
+                p.move_to(pos.clone())
+                return
     
     def send_network_updates(self) -> None:
         if not self.network_live:
             return
 
+        self.network.resend_redundant()
+
         if self.movement_codes_dirty:
             dx = self.movement_codes[3] - self.movement_codes[2]
             dy = self.movement_codes[1] - self.movement_codes[0]
-            self.network.send(C2SMovementUpdate(Vec2D(dx,dy)))
+            mov_dir = Vec2D(dx,dy)
+            seq = self.next_input_seq()
+
+            self.predictor.record_input(seq, mov_dir)
+            self.network.send(C2SMovementUpdate(mov_dir, seq))
 
             self.movement_codes_dirty = False
         
         if self.shoot_angle != -1:
             rounded_angle: int = int(self.shoot_angle * 100) # fixed point decimal of angle 00000-36000
 
-            self.network.send(C2SCreateBullet(rounded_angle))
+            seq = self.next_input_seq()
+
+            self.predictor.record_input(seq, self.predictor.mov_dir)
+            # the tick being drawn, so the server can test hits against what was on screen
+            view_tick = round(self.snapshot_clock.render_tick)
+
+            self.network.send(C2SCreateBullet(rounded_angle, seq, view_tick))
             self.shoot_angle = -1
 
 
+    def next_input_seq(self) -> int:
+        self.input_seq += 1
+        return self.input_seq
+
     def check_event(self, event: pygame.event.Event) -> int:
         if event.type == pygame.KEYDOWN:
             return self._check_keydown_events(event)
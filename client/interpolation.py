@@ -0,0 +1,133 @@
+import collections
+import threading
+from typing import Optional
+
+from common import movement
+
+Entity = tuple[int, ...] # x, y, then anything else that's drawn
+
+GAIN: float = 1 / 16 # weight of each new arrival in the running estimates
+
+
+def extrapolate(entity: Entity, tick: float) -> tuple[int, int]:
+    '''Where an entity stored as (x, y, vx, vy, since), moving in a straight
+    line from (x, y) since that tick, is at tick'''
+    x, y, vx, vy, since = entity
+    age = max(0, tick - since)
+    return (x + round(vx*age), y + round(vy*age))
+
+
+class SnapshotClock:
+    '''Works out which server tick to draw from when tick stamped snapshots
+    arrive. Drawing runs a little behind the newest snapshot, by about one
+    snapshot interval plus a margin for how unevenly they arrive, so there
+    is usually a later snapshot to move towards'''
+
+    TICK_TIME: float = 1 / movement.TPS
+
+    def __init__(self, jitter_margin: float, max_delay: float) -> None:
+        self.jitter_margin: float = jitter_margin
+        self.max_delay: float = max_delay
+
+        self.offset: Optional[float] = None # local arrival time minus server time, smoothed
+        self.jitter: float = 0              # mean distance of arrivals from offset
+        self.interval: float = SnapshotClock.TICK_TIME # between snapshots, smoothed
+        self.last_tick: int = -1
+
+        self.render_tick: float = 0 # never goes backwards
+
+    @property
+    def delay(self) -> float:
+        return min(self.max_delay, self.interval + self.jitter_margin*self.jitter)
+
+    def observe(self, tick: int, now: float) -> None:
+        sample = now - tick*SnapshotClock.TICK_TIME
+
+        if self.offset is None or abs(sample - self.offset) > 4*self.max_delay:
+            self.offset = sample # first snapshot, or the server clock jumped
+            self.jitter = 0
+        else:
+            self.jitter += (abs(sample - self.offset) - self.jitter) * GAIN
+            self.offset += (sample - self.offset) * GAIN
+
+        if tick > self.last_tick:
+            if self.last_tick != -1:
+                self.interval += ((tick - self.last_tick)*SnapshotClock.TICK_TIME - self.interval) * GAIN
+            self.last_tick = tick
+
+    def tick_at(self, now: float) -> float:
+        '''Server tick to draw at local time now'''
+        if self.offset is None:
+            return 0
+
+        self.render_tick = max(self.render_tick, (now - self.offset - self.delay) / SnapshotClock.TICK_TIME)
+        return self.render_tick
+
+
+class Snapshot:
+    __slots__ = ("tick", "entities", "tracked")
+
+    def __init__(self, tick: int, entities: dict[int, Entity], tracked: bool) -> None:
+        self.tick: int = tick
+        self.entities: dict[int, Entity] = entities
+        self.tracked: bool = tracked # keys are entity ids, so entities can be matched between snapshots
+
+
+class SnapshotBuffer:
+    '''Recent snapshots of one kind of entity, by server tick. Sampling
+    between two of them moves each entity in both part way from one
+    position to the other, however often it's sampled'''
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity: int = capacity
+        self.snapshots: collections.deque[Snapshot] = collections.deque()
+
+        self.late: int = 0    # arrived after being drawn past
+        self.starved: int = 0 # samples after the newest snapshot, so held still
+
+        # pushed by the network threads, sampled by the game loop
+        self.lock: threading.Lock = threading.Lock()
+
+    def push(self, tick: int, entities: dict[int, Entity], tracked: bool = True) -> None:
+        with self.lock:
+            if self.snapshots and tick <= self.snapshots[-1].tick:
+                self.late += tick < self.snapshots[-1].tick
+                return
+
+            self.snapshots.append(Snapshot(tick, entities, tracked))
+            if len(self.snapshots) > self.capacity:
+                self.snapshots.popleft()
+
+    def sample(self, tick: float) -> dict[int, Entity]:
+        '''Entities as they were at tick. Call with ticks that never go backwards'''
+        with self.lock:
+            snapshots = self.snapshots
+            while len(snapshots) >= 2 and snapshots[1].tick <= tick:
+                snapshots.popleft()
+
+            if not snapshots:
+                return {}
+
+            a = snapshots[0]
+            if len(snapshots) == 1 or tick <= a.tick:
+                self.starved += tick > a.tick
+                return a.entities
+
+            b = snapshots[1]
+            if not (a.tracked and b.tracked):
+                return a.entities
+
+        alpha = (tick - a.tick) / (b.tick - a.tick)
+
+        entities: dict[int, Entity] = {}
+        for id, start in a.entities.items():
+            end = b.entities.get(id)
+            if end is None:
+                entities[id] = start # gone by b
+                continue
+
+            x = start[0] + round((end[0] - start[0]) * alpha)
+            y = start[1] + round((end[1] - start[1]) * alpha)
+            entities[id] = (x, y) + end[2:]
+
+        return entities # ones new in b appear once it's reached
@@ -1,15 +1,21 @@
-import queue
+import _thread
 import socket
+import threading
+import time
 from typing import TYPE_CHECKING, Optional
 
-from client.bullet import ClientBullet
+from client.interpolation import Entity
 from client.pages import page_ids
-from client.player import ClientPlayer
-from common import packet_ids
-from common.c2s_packets import C2SHandshake
+from client.settings import Settings
+from common import datagram, movement, packet_ids
+from common.c2s_packets import C2SHandshake, C2SSnapshotAck, C2SUdpBind
+from common.datagram import Reassembler, StaleFilter
 from common.packet_base import Packet
+from common.packet_dispatch import DECODE_ERRORS, MalformedPacket, PacketDispatcher
 from common.packet_header import PacketHeader
-from common.s2c_packets import S2CBullets, S2CDisconnectPlayer, S2CHandshake, S2CPlayers, S2CSendID
+from common.packet_schema import RecordArray
+from common.s2c_packets import S2CBullets, S2CCompressed, S2CDisconnectPlayer, S2CFailedHandshake, S2CFragment, S2CHandshake, S2CInputAck, S2CPlayers, S2CSendID, S2CUdpToken, S2CWorldDelta, WorldDeltaView
+from common.stream_reader import StreamReader
 
 if TYPE_CHECKING:
     from client.game import Game
@@ -22,9 +28,38 @@ class Network:
         self.serverAddr: str = "127.0.0.1"
         self.port: int = port
 
-        self.recieved_packets: queue.Queue[bytes] = queue.Queue()
+        self.reader: StreamReader = StreamReader(Settings.recv_buffer_size)
         self.quit: bool = False
 
+        self.server_capabilities: int = 0
+        self.capabilities: int = 0
+
+        # optional datagram channel, bound once the server sends a token
+        self.udp: Optional[socket.socket] = None
+        self.udp_token: int = -1
+        self.udp_bound: bool = False
+        self.udp_seq: int = 0
+        self.udp_filter: StaleFilter = StaleFilter()
+        self.reassembler: Reassembler = Reassembler(Settings.max_pending_fragmented)
+
+        self.redundant_datagram: Optional[bytes] = None
+        self.redundant_sends_left: int = 0
+        self.last_redundant_send: float = 0
+
+        # packets arrive on both the TCP and UDP threads
+        self.handle_lock: threading.Lock = threading.Lock()
+        # the game thread sends input while the reader threads send acks, so frames and sequence numbers mustn't interleave
+        self.send_lock: threading.Lock = threading.Lock()
+
+        self.packets: PacketDispatcher[None] = PacketDispatcher()
+        self.register_packet_handlers()
+
+        # recent world states by sequence number that server deltas can be based on.
+        # Entities are kept as their records, less the id, until they're drawn
+        self.world_states: dict[int, tuple[dict[int, Entity], dict[int, Entity]]] = {
+            S2CWorldDelta.NO_BASELINE: ({}, {}),
+        }
+
     def connect(self) -> bool:
         self.conn.connect((self.serverAddr, self.port))
         recieved = self.recv()
@@ -38,40 +73,94 @@ class Network:
             # probably should send back a failure packet but cba rn
             return False
 
-        self.send(C2SHandshake())
+        self.capabilities = self.server_capabilities & Settings.capabilities
+        self.send(C2SHandshake(capabilities=self.capabilities, room=Settings.room))
         # print("Successfully established connection to server")
         return True
     
     def send(self, packet: Packet) -> None:
+        '''Thread safe'''
         # print(packet.encode())
-        PacketHeader.send_packet(self.conn, packet)
+        with self.send_lock:
+            if self.udp_bound and packet.get_packet_id() in datagram.UNRELIABLE_IDS:
+                self.send_unreliable(packet)
+                return
 
-    def recv(self) -> Optional[bytes]:
-        header = self.conn.recv(PacketHeader.HEADER_SIZE)
-        if not header:
-            return None
+            PacketHeader.send_packet(self.conn, packet)
 
-        packet_size = PacketHeader.get_packet_size(header)
+    def send_unreliable(self, packet: Packet) -> None:
+        '''Only call holding send_lock'''
+        self.udp_seq = (self.udp_seq + 1) % datagram.SEQ_MODULO
+        data: bytes = datagram.encode_seq(self.udp_seq) + packet.encode()
 
-        raw_packet = self.conn.recv(packet_size)
-        if not raw_packet:
-            return None
-        
-        return raw_packet
+        self._send_datagram(data)
+
+        if packet.get_packet_id() == packet_ids.C2S_MOVEMENT_UPDATE:
+            # repeated over the next few ticks in case this one is lost. The server drops the copies
+            self.redundant_datagram = data
+            self.redundant_sends_left = Settings.udp_redundancy
+            self.last_redundant_send = time.perf_counter()
+
+    def resend_redundant(self) -> None:
+        with self.send_lock:
+            if self.redundant_datagram is None or self.redundant_sends_left <= 0:
+                return
+
+            now = time.perf_counter()
+            if now - self.last_redundant_send < Settings.udp_redundancy_interval:
+                return
+
+            self._send_datagram(self.redundant_datagram)
+            self.redundant_sends_left -= 1
+            self.last_redundant_send = now
+
+    def _send_datagram(self, data: bytes) -> None:
+        if self.udp is None:
+            return
+
+        try:
+            self.udp.send(data)
+        except OSError:
+            pass # unreliable anyway
+
+    def open_udp(self, token: int) -> None:
+        self.udp_token = token
+
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.connect((self.serverAddr, self.port))
+        self.udp.settimeout(Settings.udp_bind_retry)
+
+        _thread.start_new_thread(self.udp_read_loop, ())
+
+    def recv(self) -> Optional[memoryview]:
+        '''Blocks until a single frame is available. Any frames read alongside it stay buffered for read_loop'''
+        while True:
+            raw_packet = self.reader.next_frame()
+            if raw_packet is not None:
+                return raw_packet
+
+            if self.reader.recv(self.conn) == 0:
+                return None
 
     def read_loop(self) -> None:
         while not self.quit:
             try:
-                raw_packet = self.recv()
+                for raw_packet in self.reader.frames():
+                    with self.handle_lock:
+                        error = self.handle_packet(raw_packet)
 
-                if raw_packet is None:
+                    if isinstance(error, MalformedPacket):
+                        # the stream can't be trusted past a frame that doesn't decode
+                        print(f"Disconnecting: {error}")
+                        self.close_connection()
+                        return
+
+                if self.quit or self.reader.recv(self.conn) == 0:
                     if not self.quit:
                         print("Disconnected")
                         self.close_connection()
                     break
 
-                self.recieved_packets.put(raw_packet)
-
             except OSError as e:
                 if e.errno == 9:
                     if not self.quit:
@@ -87,11 +176,54 @@ class Network:
                     self.close_connection()
                 break
 
-    def packet_loop(self) -> None:
+    def udp_read_loop(self) -> None:
+        assert self.udp is not None
+
+        buffer: bytearray = bytearray(Settings.max_datagram_size)
+        view: memoryview = memoryview(buffer)
+
         while not self.quit:
-            raw_packet = self.recieved_packets.get()
-            self.handle_packet(raw_packet)
-            self.recieved_packets.task_done()
+            if not self.udp_bound:
+                self._send_datagram(datagram.encode_seq(0) + C2SUdpBind(self.udp_token).encode())
+
+            try:
+                size = self.udp.recv_into(buffer)
+            except socket.timeout:
+                continue
+            except OSError:
+                if self.quit:
+                    break
+                continue # server not listening for datagrams (yet)
+
+            if size < datagram.SEQ_SIZE + packet_ids.packet_id_size:
+                continue
+
+            # the first datagram through proves the server has our address
+            self.udp_bound = True
+
+            seq, raw_packet = datagram.split(view[:size])
+            packet_type = Packet.decode_id(raw_packet)
+
+            try:
+                if packet_type == packet_ids.S2C_FRAGMENT:
+                    whole = self.reassembler.add(seq, S2CFragment.decode_data(raw_packet))
+                    if whole is None:
+                        continue
+
+                    seq, raw_packet = whole[0], memoryview(whole[1])
+                    packet_type = Packet.decode_id(raw_packet)
+
+                if packet_type == packet_ids.S2C_COMPRESSED:
+                    raw_packet = memoryview(S2CCompressed.decode_data(raw_packet).decompress())
+                    packet_type = Packet.decode_id(raw_packet)
+            except DECODE_ERRORS:
+                continue # dropped like a lost datagram
+
+            if packet_type not in datagram.UNRELIABLE_IDS or not self.udp_filter.accept(packet_type, seq):
+                continue
+
+            with self.handle_lock:
+                self.handle_packet(raw_packet)
 
     def close_connection(self, needs_closing: bool = True) -> None:
         if self.quit == True:
@@ -103,66 +235,119 @@ class Network:
             self.conn.shutdown(socket.SHUT_RDWR)
             self.conn.close()
 
+        if self.udp is not None:
+            self.udp.close()
+
 #===== ABOVE THIS LINE IS NETWORK INTERNALS =====
 
-    def handle_packet(self, raw_packet: bytes) -> Optional[Exception]:
-        packet_type = Packet.decode_id(raw_packet)
+    def register_packet_handlers(self) -> None:
+        for packet_id, decoder, handler in (
+            (packet_ids.S2C_HANDSHAKE,         S2CHandshake.decode_data,        self.handle_handshake),
+            (packet_ids.S2C_HANDSHAKE_FAIL,    S2CFailedHandshake.decode_data,  self.handle_handshake_fail),
+            (packet_ids.S2C_PLAYERS,           S2CPlayers.decode_view,          self.handle_players),
+            (packet_ids.S2C_BULLETS,           S2CBullets.decode_view,          self.handle_bullets),
+            (packet_ids.S2C_WORLD_DELTA,       S2CWorldDelta.decode_view,       self.handle_world_delta),
+            (packet_ids.S2C_UDP_TOKEN,         S2CUdpToken.decode_data,         self.handle_udp_token),
+            (packet_ids.S2C_SEND_ID,           S2CSendID.decode_data,           self.handle_send_id),
+            (packet_ids.S2C_PLAYER_DISCONNECT, S2CDisconnectPlayer.decode_data, self.handle_disconnect),
+            (packet_ids.S2C_COMPRESSED,        S2CCompressed.decode_data,       self.handle_compressed),
+            (packet_ids.S2C_INPUT_ACK,         S2CInputAck.decode_data,         self.handle_input_ack),
+        ):
+            self.packets.register(packet_id, decoder, handler)
 
+    def handle_packet(self, raw_packet: memoryview) -> Optional[Exception]:
+        return self.packets.dispatch(raw_packet, None)
+
+    def handle_compressed(self, compressed_packet: S2CCompressed, _: None) -> Optional[Exception]:
+        try:
+            packet = compressed_packet.decompress()
+        except DECODE_ERRORS as e:
+            return MalformedPacket(packet_ids.S2C_COMPRESSED, e)
+        return self.handle_packet(memoryview(packet))
+
+    def handle_handshake(self, handshake_packet: S2CHandshake, _: None) -> Optional[Exception]:
+        if not handshake_packet.isCorrect():
+            print("Error during handshake")
+            return ConnectionError()
+
+        self.server_capabilities = handshake_packet.capabilities
+        return None
+
+    def handle_handshake_fail(self, _: S2CFailedHandshake, __: None) -> Optional[Exception]:
+        print("Server error during handshake. Aborting")
+        self.close_connection()
+        return None
+
+    def handle_players(self, players: tuple[int, RecordArray], _: None) -> Optional[Exception]:
+        tick, player_records = players
+        self.game.snapshot_clock.observe(tick, time.perf_counter())
+        self.game.player_snapshots.push(tick, {r[0]: r[1:] for r in player_records})
+        return None
+
+    def handle_bullets(self, bullets: tuple[int, RecordArray], _: None) -> Optional[Exception]:
+        tick, bullet_records = bullets
+        self.game.snapshot_clock.observe(tick, time.perf_counter())
+        # without ids bullets can't be matched between snapshots, so they're drawn where they were
+        self.game.bullet_snapshots.push(tick, {i: (x, y, 0, 0, tick) for i, (x, y) in enumerate(bullet_records)}, tracked=False)
+        return None
+
+    def handle_world_delta(self, delta_packet: WorldDeltaView, _: None) -> Optional[Exception]:
+        self.apply_world_delta(delta_packet)
+        return None
+
+    def handle_input_ack(self, ack_packet: S2CInputAck, _: None) -> Optional[Exception]:
+        self.game.predictor.reconcile(ack_packet.seq, ack_packet.steps, ack_packet.pos)
+        return None
+
+    def handle_udp_token(self, token_packet: S2CUdpToken, _: None) -> Optional[Exception]:
+        self.open_udp(token_packet.token)
+        return None
+
+    def handle_send_id(self, id_packet: S2CSendID, _: None) -> Optional[Exception]:
+        self.game.this_player_id =  id_packet.player_id
+        return None
+
+    def handle_disconnect(self, player_disconnect_packet: S2CDisconnectPlayer, _: None) -> Optional[Exception]:
+        if player_disconnect_packet.reason == S2CDisconnectPlayer.KICKED:
+            print("Kicked by server")
+
+        elif player_disconnect_packet.reason == S2CDisconnectPlayer.SERVER_CLOSED:
+            print("Server closed")
         
-        if packet_type == packet_ids.S2C_HANDSHAKE:
-            handshake_packet: S2CHandshake = S2CHandshake.decode_data(raw_packet)
-
-            if not handshake_packet.isCorrect():
-                print("Error during handshake")
-                return ConnectionError()
-            
-        elif packet_type == packet_ids.S2C_HANDSHAKE_FAIL:
-            print("Server error during handshake. Aborting")
-            self.close_connection()
-        
-        elif packet_type == packet_ids.S2C_PLAYERS:
-            players_packet: S2CPlayers = S2CPlayers.decode_data(raw_packet)
-            
-            client_players: list[ClientPlayer] = []
-
-            for common_player in players_packet.players:
-                client_players.append(ClientPlayer.from_common(common_player))
-            
-            self.game.players = client_players
-        
-        elif packet_type == packet_ids.S2C_BULLETS:
-            bullets_packet: S2CBullets = S2CBullets.decode_data(raw_packet)
-            
-            client_bullets: list[ClientBullet] = []
-
-            for common_bullet in bullets_packet.bullets:
-                client_bullets.append(ClientBullet.from_common(common_bullet))
-            
-            self.game.bullets = client_bullets
-        
-        elif packet_type == packet_ids.S2C_SEND_ID:
-            id_packet: S2CSendID = S2CSendID.decode_data(raw_packet)
+        elif player_disconnect_packet.reason == S2CDisconnectPlayer.KILLED:
+            print("You Died")
 
-            self.game.this_player_id =  id_packet.player_id
+        else:
+            print(f"Unknown disconnect reason: {player_disconnect_packet.reason}")
         
-        elif packet_type == packet_ids.S2C_PLAYER_DISCONNECT:
-            player_disconnect_packet: S2CDisconnectPlayer = S2CDisconnectPlayer.decode_data(raw_packet)
+        self.game.update_server_on_exit = False
+        self.game.page_changer(page_ids.PAGE_MENU)
+        return None
 
-            if player_disconnect_packet.reason == S2CDisconnectPlayer.KICKED:
-                print("Kicked by server")
+    def apply_world_delta(self, delta: WorldDeltaView) -> None:
+        base = self.world_states.get(delta.baseline)
+        if base is None:
+            print(f"Missing baseline {delta.baseline} for world delta {delta.seq}")
+            return
 
-            elif player_disconnect_packet.reason == S2CDisconnectPlayer.SERVER_CLOSED:
-                print("Server closed")
-            
-            elif player_disconnect_packet.reason == S2CDisconnectPlayer.KILLED:
-                print("You Died")
+        players: dict[int, Entity] = dict(base[0])
+        for id in delta.removed_players:
+            players.pop(id, None)
+        for record in delta.players:
+            players[record[0]] = record[1:]
 
-            else:
-                print(f"Unknown disconnect reason: {player_disconnect_packet.reason}")
-            
-            self.game.update_server_on_exit = False
-            self.game.page_changer(page_ids.PAGE_MENU)
+        bullets: dict[int, Entity] = dict(base[1])
+        for id in delta.removed_bullets:
+            bullets.pop(id, None)
+        for id, x, y, angle, tick in delta.bullets:
+            # only sent when fired, so they're moved along from there
+            bullets[id] = (x, y, *movement.bullet_velocity(angle), tick)
 
-        else:
-            print(f"Unknown packet (ID: {packet_type})")
-            return ConnectionError()
+        # the server only ever builds on the newest acknowledged state
+        self.world_states = {seq: state for seq, state in self.world_states.items() if seq >= delta.baseline or seq == S2CWorldDelta.NO_BASELINE}
+        self.world_states[delta.seq] = (players, bullets)
+        self.send(C2SSnapshotAck(delta.seq))
+
+        self.game.snapshot_clock.observe(delta.seq, time.perf_counter())
+        self.game.player_snapshots.push(delta.seq, players)
+        self.game.bullet_snapshots.push(delta.seq, bullets, tracked=False)
@@ -12,6 +12,7 @@ else:
 
 import pygame
 
+from client.bullet import ClientBullet
 from client.game import Game
 from client.pages.page import Page
 from client.settings import Settings
@@ -36,8 +37,7 @@ class GamePage(Page):
     def draw(self, screen: pygame.Surface, scaler: Callable[[pygame.Rect], pygame.Rect]) -> None:
         screen.fill(Settings.color_bg.to_tuple())
 
-        for bullet in self.game.bullets:
-            bullet.draw(scaler=scaler, screen=screen)
+        ClientBullet.draw_records(screen, scaler, self.game.bullets)
 
         for player in self.game.players:
             player.draw(scaler=scaler, screen=screen)
@@ -23,9 +23,19 @@ class ClientPlayer:
 
         pygame.draw.rect(screen, self.color.to_tuple(), draw_rect)
     
+    def move_to(self, pos: Vec2D) -> None:
+        self.pos = pos
+        self.rect.center = (pos.x, pos.y)
+
     @staticmethod
     def from_common(common: CommonPlayer) -> 'ClientPlayer':
         return ClientPlayer(id=common.id, pos=common.pos, color=common.color)
 
+    @staticmethod
+    def from_record(record: tuple[int, int, int, int, int, int]) -> 'ClientPlayer':
+        '''From a CommonPlayer.RECORD'''
+        id, x, y, r, g, b = record
+        return ClientPlayer(id=id, pos=Vec2D(x, y), color=Color(r, g, b))
+
     def __str__(self) -> str:
         return f"Player[id=({self.id}), pos=({self.pos}), color=({self.color})]"
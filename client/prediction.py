@@ -0,0 +1,102 @@
+import collections
+import threading
+import time
+from typing import Optional
+
+from common import movement
+from common.data_types import Vec2D
+
+
+class Predictor:
+    '''Moves this client's player as soon as its input changes, with the
+    server's movement rules, instead of waiting a round trip to see where
+    it went.
+
+    Every input is remembered with the step it was made on. When the server
+    acknowledges one it says where the player was after that input and
+    some more steps; the prediction restarts from there and replays the
+    steps since, with the inputs the server hadn't applied yet'''
+
+    STEP_TIME: float = 1 / movement.TPS
+
+    def __init__(self, max_catch_up: int) -> None:
+        self.max_catch_up: int = max_catch_up
+
+        self.pos: Optional[Vec2D] = None # unknown until the server's first acknowledgement
+        self.mov_dir: Vec2D = Vec2D(0, 0)
+
+        self.frame: int = 0 # steps taken so far
+        self.next_step: float = time.perf_counter()
+
+        # (input seq, frame it was made on, mov_dir from then on). Starts
+        # with the newest acknowledged input, as replays start from it
+        self.inputs: collections.deque[tuple[int, int, Vec2D]] = collections.deque()
+        self.acked: tuple[int, int] = (0, -1) # (seq, steps) of the newest acknowledgement used
+
+        self.corrections: int = 0 # acknowledgements that disagreed with the prediction
+
+        # inputs and steps come from the game loop, acknowledgements from the network threads
+        self.lock: threading.Lock = threading.Lock()
+
+    def record_input(self, seq: int, mov_dir: Vec2D) -> None:
+        '''Call before sending the input, so its acknowledgement can't arrive first'''
+        with self.lock:
+            self.inputs.append((seq, self.frame, mov_dir.clone()))
+            self.mov_dir = mov_dir.clone()
+
+    def advance(self, now: float) -> int:
+        '''Takes the steps due by now. Returns how many were taken'''
+        steps = 0
+        with self.lock:
+            while now >= self.next_step:
+                if steps == self.max_catch_up:
+                    self.next_step = now + Predictor.STEP_TIME # skip the rest. The next acknowledgement catches up
+                    break
+
+                self._step()
+                self.next_step += Predictor.STEP_TIME
+                steps += 1
+
+        return steps
+
+    def step(self) -> None:
+        with self.lock:
+            self._step()
+
+    def _step(self) -> None:
+        if self.pos is not None:
+            movement.step(self.pos, self.mov_dir)
+        self.frame += 1
+
+    def reconcile(self, seq: int, steps: int, pos: Vec2D) -> None:
+        '''The server had the player at pos after applying inputs up to seq and stepping steps times since'''
+        with self.lock:
+            acked_seq, acked_steps = self.acked
+            if seq < acked_seq or (seq == acked_seq and steps < acked_steps):
+                return # overtaken by a newer one
+
+            self.acked = (seq, steps)
+
+            while self.inputs and self.inputs[0][0] < seq:
+                self.inputs.popleft()
+
+            if self.inputs and self.inputs[0][0] == seq:
+                start = self.inputs[0][1] + steps
+            elif self.inputs:
+                start = self.inputs[0][1] # none applied yet, so the server hasn't moved the player for any
+            else:
+                start = self.frame
+
+            predicted = pos.clone()
+            mov_dir = Vec2D(0, 0)
+            i = 0
+            for frame in range(start, self.frame):
+                while i < len(self.inputs) and self.inputs[i][1] <= frame:
+                    mov_dir = self.inputs[i][2]
+                    i += 1
+
+                movement.step(predicted, mov_dir)
+
+            if self.pos is not None and predicted != self.pos:
+                self.corrections += 1
+            self.pos = predicted
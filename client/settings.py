@@ -1,4 +1,6 @@
 
+from common import capabilities, movement
+from common.c2s_packets import C2SHandshake
 from common.data_types import Color
 
 
@@ -23,7 +25,28 @@ class Settings:
     color_menu_button_border_alt: Color = Color(108, 151, 166)
 
     # player
-    player_radius: int = 50
+    player_radius: int = movement.PLAYER_RADIUS
+
+    predict_movement: bool = True # move this client's player straight away rather than waiting for the server
+    max_prediction_catch_up: int = 5 # steps run back to back after a stall before the rest are skipped
+
+    # everything else is drawn between the two snapshots either side of a point a little in the past
+    interpolation_jitter_margin: float = 2 # times the measured jitter added to the delay
+    max_interpolation_delay: float = 0.25 # seconds
+    snapshot_buffer_size: int = 32
 
     # bullet
-    bullet_speed: int = 10
+    bullet_speed: int = movement.BULLET_SPEED
+
+    # network
+    room: int = C2SHandshake.ROOM_AUTO # room to ask the server for
+
+    recv_buffer_size: int = 65536 + 4 # grows on demand for larger frames
+
+    capabilities: int = capabilities.UDP | capabilities.COMPRESSION # asked for if the server offers them
+
+    max_datagram_size: int = 65536
+    max_pending_fragmented: int = 4 # partly received snapshots kept while waiting for their other fragments
+    udp_bind_retry: float = 0.2 # seconds between bind attempts until the server replies
+    udp_redundancy: int = 2 # extra copies of each movement datagram
+    udp_redundancy_interval: float = 1 / 60
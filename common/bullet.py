@@ -1,29 +1,48 @@
 
 from typing import Optional
 from common.data_types import Vec2D
+from common.movement import ANGLE_STEPS
+from common.packet_schema import U16, U32, Record
 from common.player import CommonPlayer
 
 
 class CommonBullet:
-    ENCODED_SIZE: int = 4
-
-    def __init__(self, pos: Vec2D, shoot_angle: int, shooter: Optional[CommonPlayer] = None) -> None:
+    RECORD: Record = Record(("x", U16), ("y", U16))
+    # everything needed to work out where it is on any tick, sent once in deltas rather than every tick
+    SPAWN_RECORD: Record = Record(("id", U16), ("x", U16), ("y", U16), ("angle", U16), ("tick", U32))
+    ENCODED_SIZE: int = RECORD.size
+    ID_SIZE: int = 2
+
+    def __init__(self, pos: Vec2D, shoot_angle: int, shooter: Optional[CommonPlayer] = None, id: int = -1, spawn_tick: int = 0) -> None:
+        self.id: int = id # assigned by the server, only used to track bullets between snapshots
         self.owner: Optional[CommonPlayer] = shooter
         self.pos: Vec2D = pos
         self.shoot_angle: int = shoot_angle
+        self.spawn_tick: int = spawn_tick # server tick it was fired on
 
-    def encode(self) -> bytes:
-        b = self.pos.x.to_bytes(2, byteorder="big")
-        b += self.pos.y.to_bytes(2, byteorder="big")
+    def record(self) -> tuple[int, int]:
+        return (self.pos.x, self.pos.y)
 
-        return b
+    def spawn_record(self) -> tuple[int, int, int, int, int]:
+        return (self.id, self.pos.x, self.pos.y, self.shoot_angle % ANGLE_STEPS, self.spawn_tick)
 
     @staticmethod
-    def decode(bytes: bytes) -> 'CommonBullet':
-        x = int.from_bytes(bytes[:2], byteorder="big")
-        y = int.from_bytes(bytes[2:4], byteorder="big")
-
+    def from_record(record: tuple[int, int]) -> 'CommonBullet':
+        x, y = record
         return CommonBullet(pos=Vec2D(x, y), shoot_angle=-1, shooter=None)
+
+    @staticmethod
+    def from_spawn_record(record: tuple[int, int, int, int, int]) -> 'CommonBullet':
+        '''pos is where it was fired from'''
+        id, x, y, angle, tick = record
+        return CommonBullet(pos=Vec2D(x, y), shoot_angle=angle, shooter=None, id=id, spawn_tick=tick)
+
+    def encode(self) -> bytes:
+        return CommonBullet.RECORD.struct.pack(*self.record())
+
+    @staticmethod
+    def decode(bytes: bytes) -> 'CommonBullet':
+        return CommonBullet.from_record(CommonBullet.RECORD.struct.unpack_from(bytes))
     
     def __str__(self) -> str:
         return f"Bullet[pos= {self.pos}, shoot_angle= {self.shoot_angle}]"
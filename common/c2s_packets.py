@@ -12,26 +12,31 @@ else:
 from common import packet_ids
 from common.data_types import Vec2D
 from common.packet_base import Packet
+from common.packet_schema import U8, U16, U32, PacketSchema
 
 
 class C2SHandshake(Packet):
     EXPECTED_MSG = "pong"
-    def __init__(self, msg: str = EXPECTED_MSG) -> None:
+    ROOM_SIZE = 1
+    ROOM_AUTO = 0xFF # let the server pick
+    SCHEMA: PacketSchema = PacketSchema([("capabilities", U8), ("room", U8)], text=True)
+
+    def __init__(self, msg: str = EXPECTED_MSG, capabilities: int = 0, room: int = ROOM_AUTO) -> None:
         super().__init__(packet_ids.C2S_HANDSHAKE)
 
         self.message: str = msg
+        self.capabilities: int = capabilities # subset of what the server offered
+        self.room: int = room
     
     @override
     def encode_data(self) -> bytes:
-        return self.message.encode("utf-8")
+        return C2SHandshake.SCHEMA.encode((self.capabilities, self.room), text=self.message)
 
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'C2SHandshake':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        msg = packet_data.decode("utf-8")
-        return C2SHandshake(msg)
+        (caps, room), _, msg = C2SHandshake.SCHEMA.decode(data)
+        return C2SHandshake(msg, caps, room)
     
     def isCorrect(self) -> bool:
         return self.message == self.EXPECTED_MSG
@@ -50,10 +55,13 @@ class C2SRequestPlayerList(Packet):
         return C2SRequestPlayerList()
 
 class C2SMovementUpdate(Packet):
-    def __init__(self, mov_dir: Vec2D) -> None:
+    SCHEMA: PacketSchema = PacketSchema([("packed_deltas", U8), ("seq", U32)])
+
+    def __init__(self, mov_dir: Vec2D, seq: int = 0) -> None:
         super().__init__(packet_ids.C2S_MOVEMENT_UPDATE)
 
         self.mov_dir = mov_dir
+        self.seq: int = seq # client's input sequence number, shared with C2SCreateBullet
     
     @override
     def encode_data(self) -> bytes:
@@ -79,14 +87,12 @@ class C2SMovementUpdate(Packet):
             print(f"error encoding movement bytes. unknown movement Direction y-value {self.mov_dir.y}")
         
         encoded = (bdx << 2) + bdy
-        return encoded.to_bytes(1, byteorder="big")
+        return C2SMovementUpdate.SCHEMA.encode((encoded, self.seq))
 
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'C2SMovementUpdate':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        packed_deltas = int.from_bytes(packet_data, byteorder="big")
+        (packed_deltas, seq), _, _ = C2SMovementUpdate.SCHEMA.decode(data)
         packed_dx = packed_deltas >> 2
         packed_dy = packed_deltas & 0b0011
 
@@ -110,29 +116,27 @@ class C2SMovementUpdate(Packet):
         else:
             print(f"error decoding movement bytes. unknown movement Direction y-value {packed_dy}")
         
-        return C2SMovementUpdate(Vec2D(dx,dy))
+        return C2SMovementUpdate(Vec2D(dx,dy), seq)
 
 class C2SCreateBullet(Packet):
+    SCHEMA: PacketSchema = PacketSchema([("angle", U16), ("seq", U32), ("view_tick", U32)])
 
-    def __init__(self, angle: int) -> None:
+    def __init__(self, angle: int, seq: int = 0, view_tick: int = 0) -> None:
         super().__init__(packet_ids.C2S_CREATE_BULLET)
 
         self.angle: int = angle
+        self.seq: int = seq # client's input sequence number, shared with C2SMovementUpdate
+        self.view_tick: int = view_tick # server tick the client was drawing when it fired. 0 if unknown
 
     @override
     def encode_data(self) -> bytes:
-        b = self.angle.to_bytes(2, byteorder="big")
-
-        return b
+        return C2SCreateBullet.SCHEMA.encode((self.angle, self.seq, self.view_tick))
 
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'C2SCreateBullet':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        angle: int = int.from_bytes(packet_data, byteorder="big")
-
-        return C2SCreateBullet(angle)
+        (angle, seq, view_tick), _, _ = C2SCreateBullet.SCHEMA.decode(data)
+        return C2SCreateBullet(angle, seq, view_tick)
 
 class C2SClientDisconnect(Packet):
     def __init__(self) -> None:
@@ -144,5 +148,43 @@ class C2SClientDisconnect(Packet):
 
     @override
     @staticmethod
-    def decode_data(data: bytes) -> 'C2SRequestPlayerList':
-        return C2SRequestPlayerList()
+    def decode_data(data: bytes) -> 'C2SClientDisconnect':
+        return C2SClientDisconnect()
+
+class C2SSnapshotAck(Packet):
+    SCHEMA: PacketSchema = PacketSchema([("seq", U32)])
+
+    def __init__(self, seq: int) -> None:
+        super().__init__(packet_ids.C2S_SNAPSHOT_ACK)
+
+        self.seq: int = seq
+
+    @override
+    def encode_data(self) -> bytes:
+        return C2SSnapshotAck.SCHEMA.encode((self.seq,))
+
+    @override
+    @staticmethod
+    def decode_data(data: bytes) -> 'C2SSnapshotAck':
+        (seq,), _, _ = C2SSnapshotAck.SCHEMA.decode(data)
+        return C2SSnapshotAck(seq)
+
+class C2SUdpBind(Packet):
+    '''Sent over UDP to tie the datagram address to the TCP connection'''
+    SCHEMA: PacketSchema = PacketSchema([("token", U32)])
+    SIZE: int = packet_ids.packet_id_size + SCHEMA.header.size
+
+    def __init__(self, token: int) -> None:
+        super().__init__(packet_ids.C2S_UDP_BIND)
+
+        self.token: int = token
+
+    @override
+    def encode_data(self) -> bytes:
+        return C2SUdpBind.SCHEMA.encode((self.token,))
+
+    @override
+    @staticmethod
+    def decode_data(data: bytes) -> 'C2SUdpBind':
+        (token,), _, _ = C2SUdpBind.SCHEMA.decode(data)
+        return C2SUdpBind(token)
@@ -0,0 +1,5 @@
+# bit flags offered by the server in S2CHandshake and picked by the client in C2SHandshake
+capability_size = 1 # number of bytes the flags take up
+
+UDP = 1 << 0 # unreliable datagram channel for snapshots and movement
+COMPRESSION = 1 << 1 # snapshots may arrive zlib compressed in S2CCompressed
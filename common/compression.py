@@ -0,0 +1,80 @@
+import time
+import zlib
+
+from common.player import CommonPlayer
+
+WBITS: int = -15 # raw deflate. The packet id already says what the data is
+
+# primes every frame's compressor, so even small frames can refer back to it.
+# Both ends must use the same bytes, so changing this needs a new capability bit
+PRESET_DICTIONARY: bytes = (
+    bytes(CommonPlayer.RECORD.size * 4) +
+    b"".join(id.to_bytes(CommonPlayer.ID_SIZE, byteorder="big") for id in range(512))
+)
+
+
+class CompressionStats:
+    '''What compression has cost and saved so far'''
+
+    def __init__(self) -> None:
+        self.frames: int = 0  # compressed and sent compressed
+        self.skipped: int = 0 # compressed but no smaller, so sent as they were
+
+        self.raw_bytes: int = 0
+        self.compressed_bytes: int = 0
+        self.cpu_ns: int = 0
+
+    def record(self, raw_size: int, compressed_size: int, cpu_ns: int) -> None:
+        self.cpu_ns += cpu_ns
+
+        if compressed_size >= raw_size:
+            self.skipped += 1
+            return
+
+        self.frames += 1
+        self.raw_bytes += raw_size
+        self.compressed_bytes += compressed_size
+
+    @property
+    def ratio(self) -> float:
+        return self.compressed_bytes / self.raw_bytes if self.raw_bytes else 1
+
+    def __str__(self) -> str:
+        tried = self.frames + self.skipped
+        return (
+            f"Compression[frames= {self.frames}, skipped= {self.skipped}, "
+            f"ratio= {self.ratio:.2f}, saved= {self.raw_bytes - self.compressed_bytes}B, "
+            f"cpu= {self.cpu_ns/1_000_000:.1f}ms, cpu_per_frame= {self.cpu_ns/max(tried, 1)/1000:.0f}us]"
+        )
+
+
+class Compressor:
+    '''Compresses whole packets one at a time. Each packet is its own deflate
+    stream, started from the preset dictionary, so it can be decompressed
+    alone whatever was lost or dropped before it'''
+
+    def __init__(self, level: int) -> None:
+        self.primed = zlib.compressobj(level, zlib.DEFLATED, WBITS, zdict=PRESET_DICTIONARY)
+        self.stats: CompressionStats = CompressionStats()
+
+    def compress(self, packet: bytes) -> bytes:
+        start = time.thread_time_ns()
+
+        compressor = self.primed.copy() # cheaper than loading the dictionary again
+        compressed = compressor.compress(packet) + compressor.flush()
+
+        self.stats.record(len(packet), len(compressed), time.thread_time_ns() - start)
+        return compressed
+
+
+def decompress(data: bytes) -> bytes:
+    '''ValueError if data is corrupt or cut short, like the packet decoders'''
+    decompressor = zlib.decompressobj(WBITS, zdict=PRESET_DICTIONARY)
+    try:
+        packet = decompressor.decompress(data) + decompressor.flush()
+    except zlib.error as e:
+        raise ValueError(f"corrupt compressed packet: {e}") from e
+
+    if not decompressor.eof:
+        raise ValueError("truncated compressed packet")
+    return packet
@@ -1,15 +1,41 @@
-import dataclasses
 import math
 from dataclasses import dataclass
 
 
+# slotted so instances are small and attribute access is fast. Hot paths
+# use the *_into methods, which mutate in place instead of allocating
+
 @dataclass
 class Vec2D:
+    __slots__ = ("x", "y")
     x: int
     y: int
     
     def clone(self) -> 'Vec2D':
-        return dataclasses.replace(self)
+        return Vec2D(self.x, self.y)
+
+    def set(self, x: int, y: int) -> 'Vec2D':
+        self.x = x
+        self.y = y
+        return self
+
+    def add_into(self, other: 'Vec2D') -> 'Vec2D':
+        '''self += other without allocating'''
+        self.x += other.x
+        self.y += other.y
+        return self
+
+    def add_scaled_into(self, other: 'Vec2D', scalar: int) -> 'Vec2D':
+        '''self += other * scalar without allocating'''
+        self.x += other.x * scalar
+        self.y += other.y * scalar
+        return self
+
+    def clamp_into(self, bounds: 'Rect') -> 'Vec2D':
+        '''Moves self inside bounds, edges included'''
+        self.x = min(bounds.max.x, max(bounds.min.x, self.x))
+        self.y = min(bounds.max.y, max(bounds.min.y, self.y))
+        return self
 
     def is_none(self) -> bool:
         return self.x == 0 and self.y == 0
@@ -70,6 +96,7 @@ class Vec2D:
 
 @dataclass
 class Rect:
+    __slots__ = ("min", "max")
     min: Vec2D
     max: Vec2D
     
@@ -78,6 +105,7 @@ class Rect:
 
 @dataclass
 class Color:
+    __slots__ = ("r", "g", "b")
     r: int
     g: int
     b: int
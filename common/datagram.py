@@ -0,0 +1,101 @@
+from typing import Optional
+
+from common import packet_ids
+from common.s2c_packets import S2CFragment
+
+# packets that can go over the unreliable channel. Everything else stays on TCP
+UNRELIABLE_IDS: frozenset[int] = frozenset((
+    packet_ids.C2S_MOVEMENT_UPDATE,
+    packet_ids.C2S_SNAPSHOT_ACK,
+    packet_ids.S2C_PLAYERS,
+    packet_ids.S2C_BULLETS,
+    packet_ids.S2C_WORLD_DELTA,
+    packet_ids.S2C_INPUT_ACK,
+))
+
+SEQ_SIZE: int = 4
+SEQ_MODULO: int = 1 << (8*SEQ_SIZE)
+
+FRAGMENT_OVERHEAD: int = packet_ids.packet_id_size + S2CFragment.SCHEMA.header.size
+MAX_FRAGMENTS: int = (1 << 16) - 1
+MESSAGE_MODULO: int = 1 << 16
+
+
+def encode_seq(seq: int) -> bytes:
+    return seq.to_bytes(SEQ_SIZE, byteorder="big")
+
+def split(datagram: memoryview) -> tuple[int, memoryview]:
+    '''Splits a received datagram into its sequence number and the packet it carries'''
+    return int.from_bytes(datagram[:SEQ_SIZE], byteorder="big"), datagram[SEQ_SIZE:]
+
+def fragment(packet: bytes, message: int, max_size: int) -> list[bytes]:
+    '''Splits an encoded packet into S2CFragment packets of at most max_size bytes'''
+    chunk = max_size - FRAGMENT_OVERHEAD
+    count = -(-len(packet) // chunk)
+    assert count <= MAX_FRAGMENTS, f"packet of {len(packet)} bytes needs too many fragments"
+
+    return [S2CFragment(message, i, count, packet[i*chunk:(i+1)*chunk]).encode() for i in range(count)]
+
+def is_newer(seq: int, than: int) -> bool:
+    '''Serial number comparison so sequences survive wrapping'''
+    return 0 < (seq - than) % SEQ_MODULO < SEQ_MODULO // 2
+
+
+class StaleFilter:
+    '''Drops datagrams that are duplicates of, or older than, one already
+    accepted with the same packet ID'''
+
+    def __init__(self) -> None:
+        self.latest: dict[int, int] = {}
+
+    def accept(self, packet_id: int, seq: int) -> bool:
+        latest = self.latest.get(packet_id)
+        if latest is not None and not is_newer(seq, latest):
+            return False
+
+        self.latest[packet_id] = seq
+        return True
+
+
+class PendingMessage:
+    __slots__ = ("first_seq", "parts", "missing")
+
+    def __init__(self, first_seq: int, count: int) -> None:
+        self.first_seq: int = first_seq
+        self.parts: list[Optional[bytes]] = [None] * count
+        self.missing: int = count
+
+
+class Reassembler:
+    '''Rebuilds packets that arrived as fragments. A message that lost a
+    fragment never completes, so only the newest few are kept'''
+
+    def __init__(self, max_pending: int) -> None:
+        self.max_pending: int = max_pending
+        self.pending: dict[int, PendingMessage] = {} # by message, oldest first
+
+    def add(self, seq: int, fragment: S2CFragment) -> Optional[tuple[int, bytes]]:
+        '''Returns the whole packet once its last fragment arrives, along with the
+        sequence number of its first fragment to filter it by'''
+        if not 0 <= fragment.index < fragment.count:
+            return None
+
+        message = self.pending.get(fragment.message)
+        if message is None:
+            if len(self.pending) >= self.max_pending:
+                del self.pending[next(iter(self.pending))]
+
+            # the fragments of a message are sent back to back so their sequence numbers are consecutive
+            message = PendingMessage((seq - fragment.index) % SEQ_MODULO, fragment.count)
+            self.pending[fragment.message] = message
+
+        if len(message.parts) != fragment.count or message.parts[fragment.index] is not None:
+            return None # duplicate, or a reused message id
+
+        message.parts[fragment.index] = bytes(fragment.data) # the datagram buffer is reused
+        message.missing -= 1
+        if message.missing:
+            return None
+
+        del self.pending[fragment.message]
+        return message.first_seq, b"".join(message.parts) # type: ignore[arg-type]
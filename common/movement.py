@@ -0,0 +1,46 @@
+import math
+
+from common.data_types import Rect, Vec2D
+
+# Movement rules. The server runs them every tick and clients run them
+# too, to move their own player before the server has replied and to move
+# bullets between their spawn and removal. Both ends must agree, so they
+# live here rather than in either's settings
+
+TPS: int = 60 # movement is per tick, so clients predict at the server's rate
+
+WORLD_WIDTH: int = 1600
+WORLD_HEIGHT: int = 900
+
+PLAYER_RADIUS: int = 50
+PLAYER_SPEED: int = 3
+PLAYER_DIAGONAL_SPEED: int = math.ceil(PLAYER_SPEED / 1.2) # per axis. Rounds up so diagonals aren't too slow
+
+PLAYER_BOUNDS: Rect = Rect( # where the player's centre can be
+    Vec2D(PLAYER_RADIUS, PLAYER_RADIUS),
+    Vec2D(WORLD_WIDTH - PLAYER_RADIUS, WORLD_HEIGHT - PLAYER_RADIUS),
+)
+
+BULLET_SPEED: int = 10
+ANGLE_STEPS: int = 36000 # shoot angles are in centidegrees
+
+
+def speed(mov_dir: Vec2D) -> int:
+    return PLAYER_DIAGONAL_SPEED if mov_dir.x and mov_dir.y else PLAYER_SPEED
+
+def step(pos: Vec2D, mov_dir: Vec2D) -> bool:
+    '''Moves pos one tick along mov_dir, staying in bounds. False if mov_dir is none'''
+    if mov_dir.is_none():
+        return False
+
+    pos.add_scaled_into(mov_dir, speed(mov_dir)).clamp_into(PLAYER_BOUNDS)
+    return True
+
+def bullet_velocity(shoot_angle: int) -> tuple[int, int]:
+    # pol to cart
+    shifted_angle: float = (shoot_angle / 100) - 90
+
+    rawx = int(BULLET_SPEED * math.cos(math.radians(shifted_angle)))
+    rawy = int(BULLET_SPEED * math.sin(math.radians(shifted_angle)))
+
+    return rawx, rawy
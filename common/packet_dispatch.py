@@ -0,0 +1,85 @@
+import struct
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+from common import packet_ids
+from common.packet_base import Packet
+
+C = TypeVar("C") # what the handlers are told about where a packet came from
+
+Decoder = Callable[[memoryview], Any]
+Handler = Callable[[Any, C], Optional[Exception]]
+Hook = Callable[[int, int, C], None] # packet id, size, context
+
+UNKNOWN_PACKET: Exception = ConnectionError("unknown packet id") # shared, never raised
+
+# what decoders raise on truncated or garbled data. UnicodeDecodeError is a ValueError
+DECODE_ERRORS: tuple[type[Exception], ...] = (struct.error, ValueError)
+
+
+class MalformedPacket(ConnectionError):
+    '''Returned, never raised, for a packet its decoder couldn't read'''
+
+    def __init__(self, packet_id: int, cause: Exception) -> None:
+        super().__init__(f"malformed packet {packet_id}: {cause}")
+        self.packet_id: int = packet_id
+
+
+class Route(Generic[C]):
+    __slots__ = ("decoder", "handler", "hooks")
+
+    def __init__(self, decoder: Decoder, handler: Handler[C]) -> None:
+        self.decoder: Decoder = decoder
+        self.handler: Handler[C] = handler
+        self.hooks: list[Hook[C]] = []
+
+
+class PacketDispatcher(Generic[C]):
+    '''Routes packets to their handlers with one lookup in a table indexed
+    by packet id. Each route has a decoder, turning the packet's bytes into
+    what the handler takes, and any number of hooks run before it.
+
+    Every packet is counted by id. Ids without a route are only counted,
+    so a misbehaving peer can't flood the console'''
+
+    def __init__(self) -> None:
+        id_count = 1 << (8*packet_ids.packet_id_size)
+
+        self.routes: list[Optional[Route[C]]] = [None] * id_count
+        self.counts: list[int] = [0] * id_count
+        self.unknown: int = 0
+
+    def register(self, packet_id: int, decoder: Decoder, handler: Handler[C]) -> None:
+        route = self.routes[packet_id]
+        if route is None:
+            self.routes[packet_id] = Route(decoder, handler)
+        else:
+            route.decoder, route.handler = decoder, handler
+
+    def add_hook(self, packet_id: int, hook: Hook[C]) -> None:
+        route = self.routes[packet_id]
+        assert route is not None, f"no route for packet {packet_id}"
+        route.hooks.append(hook)
+
+    def dispatch(self, data: memoryview, context: C) -> Optional[Exception]:
+        '''Decodes and handles one packet. Returns the handler's error, UNKNOWN_PACKET or MalformedPacket'''
+        packet_id = Packet.decode_id(data)
+        route = self.routes[packet_id]
+
+        if route is None:
+            self.unknown += 1
+            return UNKNOWN_PACKET
+
+        self.counts[packet_id] += 1
+        for hook in route.hooks:
+            hook(packet_id, len(data), context)
+
+        try:
+            packet = route.decoder(data)
+        except DECODE_ERRORS as e:
+            return MalformedPacket(packet_id, e)
+
+        return route.handler(packet, context)
+
+    def stats(self) -> dict[int, int]:
+        '''Packets handled by id, for the ids that have been seen'''
+        return {id: count for id, count in enumerate(self.counts) if count}
@@ -2,21 +2,28 @@ import socket
 from common.packet_base import Packet
 
 class PacketHeader:
-    HEADER_SIZE: int = 2
+    '''Length prefix of a frame. Packets under 32 KiB have a 2 byte header.
+    Bigger ones set the top bit and use 4 bytes, for up to 2 GiB'''
+    HEADER_SIZE: int = 2 # short header, and the least needed to know the header's size
+    LONG_HEADER_SIZE: int = 4
+
+    LONG_FLAG: int = 0x80 # top bit of the first byte
+    MAX_SHORT_SIZE: int = (1 << 15) - 1
+    MAX_PACKET_SIZE: int = (1 << 31) - 1
 
     def __init__(self, packet: Packet) -> None:
         self.payload: bytes = packet.encode()
 
         self.packet_size: int = len(self.payload)
-    
+
     def send(self, conn: socket.socket) -> None:
-        header: bytes = self.packet_size.to_bytes(PacketHeader.HEADER_SIZE, byteorder="big")
+        header: bytes = PacketHeader.encode_size(self.packet_size)
 
         conn.send(header + self.payload)
-    
+
     @staticmethod
     def sendBytes(conn: socket.socket, data: bytes) -> None:
-        header: bytes = len(data).to_bytes(PacketHeader.HEADER_SIZE, byteorder="big")
+        header: bytes = PacketHeader.encode_size(len(data))
 
         conn.send(header + data)
 
@@ -24,10 +31,28 @@ class PacketHeader:
     def send_packet(conn: socket.socket, packet: Packet) -> None:
         data: bytes = packet.encode()
 
-        header: bytes = len(data).to_bytes(PacketHeader.HEADER_SIZE, byteorder="big")
+        header: bytes = PacketHeader.encode_size(len(data))
 
         conn.send(header + data)
 
+    @staticmethod
+    def encode_size(size: int) -> bytes:
+        if size <= PacketHeader.MAX_SHORT_SIZE:
+            return size.to_bytes(PacketHeader.HEADER_SIZE, byteorder="big")
+
+        if size > PacketHeader.MAX_PACKET_SIZE:
+            raise ValueError(f"packet of {size} bytes is too big to frame")
+
+        return (size | PacketHeader.LONG_FLAG << 8*(PacketHeader.LONG_HEADER_SIZE-1)).to_bytes(PacketHeader.LONG_HEADER_SIZE, byteorder="big")
+
+    @staticmethod
+    def header_size(first_byte: int) -> int:
+        return PacketHeader.LONG_HEADER_SIZE if first_byte & PacketHeader.LONG_FLAG else PacketHeader.HEADER_SIZE
+
     @staticmethod
     def get_packet_size(header: bytes) -> int:
-        return int.from_bytes(header, byteorder="big")
+        '''header must hold the whole header, which is header_size(header[0]) bytes'''
+        if header[0] & PacketHeader.LONG_FLAG:
+            return int.from_bytes(header[:PacketHeader.LONG_HEADER_SIZE], byteorder="big") & PacketHeader.MAX_PACKET_SIZE
+
+        return int.from_bytes(header[:PacketHeader.HEADER_SIZE], byteorder="big")
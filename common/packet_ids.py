@@ -6,6 +6,8 @@ C2S_PLAYER_REQUEST = 1
 C2S_MOVEMENT_UPDATE = 2
 C2S_CREATE_BULLET = 3
 C2S_CLIENT_DISCONNECT = 4
+C2S_SNAPSHOT_ACK = 5
+C2S_UDP_BIND = 6
 
 #S2C PACKETS
 S2C_HANDSHAKE = 128 + 0
@@ -14,3 +16,8 @@ S2C_PLAYERS = 128 + 2
 S2C_BULLETS = 128 + 3
 S2C_SEND_ID = 128 + 4
 S2C_PLAYER_DISCONNECT = 128 + 5
+S2C_WORLD_DELTA = 128 + 6
+S2C_UDP_TOKEN = 128 + 7
+S2C_FRAGMENT = 128 + 8
+S2C_COMPRESSED = 128 + 9
+S2C_INPUT_ACK = 128 + 10
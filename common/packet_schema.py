@@ -0,0 +1,180 @@
+import struct
+from typing import TYPE_CHECKING, Any, Iterator, Optional, Sequence
+
+from common import packet_ids
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# field types. Everything is big endian
+U8: str = "B"
+U16: str = "H"
+U32: str = "I"
+
+NUMPY_TYPES: dict[str, str] = {U8: "u1", U16: ">u2", U32: ">u4"}
+
+COUNT: struct.Struct = struct.Struct(">H") # length prefix of a counted record list
+
+
+class Record:
+    '''A fixed size group of fields repeated in a list. Records with one
+    field are plain values, otherwise tuples in field order'''
+
+    def __init__(self, *fields: tuple[str, str]) -> None:
+        self.names: tuple[str, ...] = tuple(name for name, _ in fields)
+        self.types: tuple[str, ...] = tuple(type for _, type in fields)
+        self.format: str = "".join(self.types)
+
+        self.struct: struct.Struct = struct.Struct(">" + self.format)
+        self.size: int = self.struct.size
+        self.scalar: bool = len(fields) == 1
+
+        # offset and struct of each field, for reading one field in place
+        self.fields: dict[str, tuple[int, struct.Struct]] = {}
+        offset = 0
+        for name, type in fields:
+            field = struct.Struct(">" + type)
+            self.fields[name] = (offset, field)
+            offset += field.size
+
+    def pack_into(self, buffer: bytearray, offset: int, records: Sequence[Any]) -> int:
+        '''Writes every record from offset. Returns the offset after them'''
+        if self.scalar:
+            # one repeated format, packed in a single call
+            struct.pack_into(f">{len(records)}{self.format}", buffer, offset, *records)
+            return offset + len(records)*self.size
+
+        pack = self.struct.pack_into
+        for record in records:
+            pack(buffer, offset, *record)
+            offset += self.size
+
+        return offset
+
+    def unpack_from(self, data: bytes, offset: int, count: int) -> list[Any]:
+        if self.scalar:
+            return list(struct.unpack_from(f">{count}{self.format}", data, offset))
+
+        return list(self.struct.iter_unpack(memoryview(data)[offset:offset + count*self.size]))
+
+    def numpy_dtype(self) -> 'np.dtype':
+        '''Structured dtype with the same layout. Raises ModuleNotFoundError without NumPy'''
+        import numpy as np
+        return np.dtype([(name, NUMPY_TYPES[type]) for name, type in zip(self.names, self.types)])
+
+
+class RecordArray:
+    '''Records read in place from a packet's buffer. Nothing is decoded until
+    it's accessed, so a snapshot doesn't cost an object per record. The
+    buffer must not change while the array is in use'''
+
+    def __init__(self, record: Record, data: memoryview) -> None:
+        self.record: Record = record
+        self.count: int = len(data) // record.size
+        self.data: memoryview = data[:self.count*record.size] # whole records only
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("record index out of range")
+
+        values = self.record.struct.unpack_from(self.data, index*self.record.size)
+        return values[0] if self.record.scalar else values
+
+    def __iter__(self) -> Iterator[Any]:
+        if self.record.scalar:
+            return (value for (value,) in self.record.struct.iter_unpack(self.data))
+
+        return self.record.struct.iter_unpack(self.data)
+
+    def field(self, index: int, name: str) -> int:
+        '''Reads one field of one record'''
+        offset, field = self.record.fields[name]
+        return field.unpack_from(self.data, index*self.record.size + offset)[0]
+
+    def to_numpy(self) -> 'np.ndarray':
+        '''Structured array sharing the buffer. Raises ModuleNotFoundError without NumPy'''
+        import numpy as np
+        return np.frombuffer(self.data, dtype=self.record.numpy_dtype())
+
+
+class PacketSchema:
+    '''Layout of a packet's data after its id: fixed fields, then count
+    prefixed record lists, then optionally a record list, utf-8 text or raw
+    bytes running to the end of the packet.
+
+    The structs are built once when the packet class is defined. Encoding
+    sizes the whole packet up front and packs straight into it'''
+
+    def __init__(self, fields: Sequence[tuple[str, str]] = (), lists: Sequence[Record] = (), rest: Optional[Record] = None, text: bool = False, raw: bool = False) -> None:
+        assert (rest is not None) + text + raw <= 1, "only one thing can fill the rest of a packet"
+
+        self.names: tuple[str, ...] = tuple(name for name, _ in fields)
+        self.header: struct.Struct = struct.Struct(">" + "".join(type for _, type in fields))
+
+        self.lists: tuple[Record, ...] = tuple(lists)
+        self.rest: Optional[Record] = rest
+        self.text: bool = text
+        self.raw: bool = raw
+
+    def encode(self, values: Sequence[Any] = (), lists: Sequence[Sequence[Any]] = (), rest: Sequence[Any] = (), text: str = "", raw: bytes = b"") -> bytes:
+        tail = text.encode("utf-8") if self.text else raw if self.raw else b""
+
+        size = self.header.size + len(tail)
+        for record, records in zip(self.lists, lists):
+            size += COUNT.size + len(records)*record.size
+        if self.rest is not None:
+            size += len(rest)*self.rest.size
+
+        buffer = bytearray(size)
+        self.header.pack_into(buffer, 0, *values)
+        offset = self.header.size
+
+        for record, records in zip(self.lists, lists):
+            COUNT.pack_into(buffer, offset, len(records))
+            offset = record.pack_into(buffer, offset + COUNT.size, records)
+
+        if self.rest is not None:
+            self.rest.pack_into(buffer, offset, rest)
+        elif self.text or self.raw:
+            buffer[offset:] = tail
+
+        return bytes(buffer)
+
+    def decode(self, data: bytes, lazy: bool = False) -> tuple[tuple[Any, ...], list[Any], Any]:
+        '''Splits a whole packet, id included, into its field values, record lists
+        and rest. The rest is a record list, text, a memoryview of the raw bytes or None.
+
+        lazy gives RecordArrays over data instead of lists'''
+        view = memoryview(data)
+        offset = packet_ids.packet_id_size
+
+        values = self.header.unpack_from(data, offset)
+        offset += self.header.size
+
+        lists: list[Any] = []
+        for record in self.lists:
+            (count,) = COUNT.unpack_from(data, offset)
+            offset += COUNT.size
+
+            if lazy:
+                lists.append(RecordArray(record, view[offset:offset + count*record.size]))
+            else:
+                lists.append(record.unpack_from(data, offset, count))
+            offset += count*record.size
+
+        rest: Any = None
+        if self.rest is not None and lazy:
+            rest = RecordArray(self.rest, view[offset:])
+        elif self.rest is not None:
+            rest = self.rest.unpack_from(data, offset, (len(data) - offset) // self.rest.size)
+        elif self.text:
+            rest = str(data[offset:], "utf-8")
+        elif self.raw:
+            rest = view[offset:]
+
+        return values, lists, rest
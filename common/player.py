@@ -1,8 +1,11 @@
 from common.data_types import Color, Vec2D
+from common.packet_schema import U8, U16, Record
 
 
 class CommonPlayer:
-    ENCODED_SIZE: int = 8
+    RECORD: Record = Record(("id", U16), ("x", U16), ("y", U16), ("r", U8), ("g", U8), ("b", U8))
+    ENCODED_SIZE: int = RECORD.size
+    ID_SIZE: int = 2
 
     def __init__(self, id: int, pos: Vec2D, mov_dir: Vec2D, color: Color) -> None:
 
@@ -13,32 +16,20 @@ class CommonPlayer:
 
         self.color = color
 
-    def encode(self) -> bytes:
-        b = bytes()
-
-        b += self.id.to_bytes(1, byteorder="big") # if ever get over 255 players at once then I'll improve it
-
-        b += self.pos.x.to_bytes(2, byteorder="big")
-        b += self.pos.y.to_bytes(2, byteorder="big")
+    def record(self) -> tuple[int, int, int, int, int, int]:
+        return (self.id, self.pos.x, self.pos.y, self.color.r, self.color.g, self.color.b)
 
-        b += self.color.r.to_bytes(1, byteorder="big")
-        b += self.color.g.to_bytes(1, byteorder="big")
-        b += self.color.b.to_bytes(1, byteorder="big")
+    @staticmethod
+    def from_record(record: tuple[int, int, int, int, int, int]) -> 'CommonPlayer':
+        id, x, y, r, g, b = record
+        return CommonPlayer(id=id, pos=Vec2D(x, y), mov_dir=Vec2D(0,0), color=Color(r,g,b))
 
-        return b
+    def encode(self) -> bytes:
+        return CommonPlayer.RECORD.struct.pack(*self.record())
 
     @staticmethod
     def decode(bytes: bytes) -> 'CommonPlayer':
-        id = int.from_bytes(bytes[0:1], byteorder="big")
-
-        x = int.from_bytes(bytes[1:3], byteorder="big")
-        y = int.from_bytes(bytes[3:5], byteorder="big")
-
-        r = int.from_bytes(bytes[5:6], byteorder="big")
-        g = int.from_bytes(bytes[6:7], byteorder="big")
-        b = int.from_bytes(bytes[7:8], byteorder="big")
-
-        return CommonPlayer(id=id, pos=Vec2D(x, y), mov_dir=Vec2D(0,0), color=Color(r,g,b))
+        return CommonPlayer.from_record(CommonPlayer.RECORD.struct.unpack_from(bytes))
     
     def __str__(self) -> str:
         return f"Player[id= {self.id}, pos= {self.pos}, movDir= {self.mov_dir}]"
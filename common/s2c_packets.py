@@ -1,4 +1,5 @@
 import sys
+from typing import Optional
 
 if sys.version_info >= (3, 12):
     from typing import override
@@ -9,30 +10,33 @@ else:
     def override(method: F, /) -> F:
         return method
 
-from common import packet_ids
+from common import compression, packet_ids
 from common.bullet import CommonBullet
+from common.data_types import Vec2D
 from common.packet_base import Packet
+from common.packet_schema import U8, U16, U32, PacketSchema, Record, RecordArray
 from common.player import CommonPlayer
 
 
 class S2CHandshake(Packet):
     EXPECTED_MSG: str = "ping"
-    def __init__(self, msg: str = EXPECTED_MSG) -> None:
+    SCHEMA: PacketSchema = PacketSchema([("capabilities", U8)], text=True)
+
+    def __init__(self, msg: str = EXPECTED_MSG, capabilities: int = 0) -> None:
         super().__init__(packet_ids.S2C_HANDSHAKE)
 
         self.message: str = msg
+        self.capabilities: int = capabilities # offered by the server
     
     @override
     def encode_data(self) -> bytes:
-        return self.message.encode("utf-8")
+        return S2CHandshake.SCHEMA.encode((self.capabilities,), text=self.message)
 
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'S2CHandshake':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        msg = packet_data.decode("utf-8")
-        return S2CHandshake(msg)
+        (caps,), _, msg = S2CHandshake.SCHEMA.decode(data)
+        return S2CHandshake(msg, caps)
     
     def isCorrect(self) -> bool:
         return self.message == self.EXPECTED_MSG
@@ -48,78 +52,70 @@ class S2CFailedHandshake(Packet):
 
     @override
     @staticmethod
-    def decode_data(data: bytes) -> 'S2CHandshake':
-        return S2CHandshake()
+    def decode_data(data: bytes) -> 'S2CFailedHandshake':
+        return S2CFailedHandshake()
 
 
 class S2CPlayers(Packet):
-    def __init__(self, players: list[CommonPlayer]) -> None:
+    SCHEMA: PacketSchema = PacketSchema([("tick", U32)], rest=CommonPlayer.RECORD)
+
+    def __init__(self, players: list[CommonPlayer], encoded: Optional[bytes] = None, tick: int = 0) -> None:
         super().__init__(packet_ids.S2C_PLAYERS)
 
         self.players = players
+        self.encoded: Optional[bytes] = encoded # records already encoded by the sender
+        self.tick: int = tick # server tick the players are from
 
     @override
     def encode_data(self) -> bytes:
-        b = bytes()
-        for player in self.players:
-            b += player.encode()
-        
-        return b
+        if self.encoded is not None:
+            return S2CPlayers.SCHEMA.header.pack(self.tick) + self.encoded
+
+        return S2CPlayers.SCHEMA.encode((self.tick,), rest=[player.record() for player in self.players])
 
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'S2CPlayers':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        player_list: list[CommonPlayer] = []
-
-        players = [ packet_data[i:i+CommonPlayer.ENCODED_SIZE] for i in range(0, len(packet_data), CommonPlayer.ENCODED_SIZE) ]
-
-        for p in players:
-            if len(p) == 0:
-                continue
+        (tick,), _, records = S2CPlayers.SCHEMA.decode(data)
+        return S2CPlayers([CommonPlayer.from_record(r) for r in records], tick=tick)
 
-            player = CommonPlayer.decode(p)
-
-            player_list.append(player)
-
-        return S2CPlayers(player_list)
+    @staticmethod
+    def decode_view(data: bytes) -> tuple[int, RecordArray]:
+        '''The tick and the player records in place, as CommonPlayer.RECORD tuples'''
+        (tick,), _, records = S2CPlayers.SCHEMA.decode(data, lazy=True)
+        return tick, records
 
 class S2CBullets(Packet):
+    SCHEMA: PacketSchema = PacketSchema([("tick", U32)], rest=CommonBullet.RECORD)
 
-    def __init__(self, bullets: list[CommonBullet]) -> None:
+    def __init__(self, bullets: list[CommonBullet], encoded: Optional[bytes] = None, tick: int = 0) -> None:
         super().__init__(packet_ids.S2C_BULLETS)
         
         self.bullets = bullets
+        self.encoded: Optional[bytes] = encoded # records already encoded by the sender
+        self.tick: int = tick # server tick the bullets are from
 
     @override
     def encode_data(self) -> bytes:
-        b = bytes()
-        for bullet in self.bullets:
-            b += bullet.encode()
-        
-        return b
+        if self.encoded is not None:
+            return S2CBullets.SCHEMA.header.pack(self.tick) + self.encoded
+
+        return S2CBullets.SCHEMA.encode((self.tick,), rest=[bullet.record() for bullet in self.bullets])
     
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'S2CBullets':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        bullet_list: list[CommonBullet] = []
-
-        players = [ packet_data[i:i+CommonBullet.ENCODED_SIZE] for i in range(0, len(packet_data), CommonBullet.ENCODED_SIZE) ]
-
-        for p in players:
-            if len(p) == 0:
-                continue
+        (tick,), _, records = S2CBullets.SCHEMA.decode(data)
+        return S2CBullets([CommonBullet.from_record(r) for r in records], tick=tick)
 
-            bullet = CommonBullet.decode(p)
-
-            bullet_list.append(bullet)
-
-        return S2CBullets(bullet_list)
+    @staticmethod
+    def decode_view(data: bytes) -> tuple[int, RecordArray]:
+        '''The tick and the bullet records in place, as CommonBullet.RECORD tuples'''
+        (tick,), _, records = S2CBullets.SCHEMA.decode(data, lazy=True)
+        return tick, records
 
 class S2CSendID(Packet):
+    SCHEMA: PacketSchema = PacketSchema([("player_id", U16)])
 
     def __init__(self, id: int) -> None:
         super().__init__(packet_ids.S2C_SEND_ID)
@@ -128,20 +124,19 @@ class S2CSendID(Packet):
     
     @override
     def encode_data(self) -> bytes:
-        return self.player_id.to_bytes(1, byteorder="big")
+        return S2CSendID.SCHEMA.encode((self.player_id,))
 
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'S2CSendID':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        player_id = int.from_bytes(packet_data, byteorder="big")
+        (player_id,), _, _ = S2CSendID.SCHEMA.decode(data)
         return S2CSendID(player_id)
 
 class S2CDisconnectPlayer(Packet):
     KICKED = 0
     KILLED = 1
     SERVER_CLOSED = 2
+    SCHEMA: PacketSchema = PacketSchema([("reason", U8)])
 
     def __init__(self, reason: int) -> None:
         super().__init__(packet_ids.S2C_PLAYER_DISCONNECT)
@@ -150,12 +145,164 @@ class S2CDisconnectPlayer(Packet):
     
     @override
     def encode_data(self) -> bytes:
-        return self.reason.to_bytes(1, byteorder="big")
+        return S2CDisconnectPlayer.SCHEMA.encode((self.reason,))
 
     @override
     @staticmethod
     def decode_data(data: bytes) -> 'S2CDisconnectPlayer':
-        packet_data = data[packet_ids.packet_id_size:]
-
-        reason = int.from_bytes(packet_data, byteorder="big")
+        (reason,), _, _ = S2CDisconnectPlayer.SCHEMA.decode(data)
         return S2CDisconnectPlayer(reason)
+
+class S2CUdpToken(Packet):
+    '''Token the client sends back over UDP to bind its datagram address'''
+    SCHEMA: PacketSchema = PacketSchema([("token", U32)])
+
+    def __init__(self, token: int) -> None:
+        super().__init__(packet_ids.S2C_UDP_TOKEN)
+
+        self.token: int = token
+
+    @override
+    def encode_data(self) -> bytes:
+        return S2CUdpToken.SCHEMA.encode((self.token,))
+
+    @override
+    @staticmethod
+    def decode_data(data: bytes) -> 'S2CUdpToken':
+        (token,), _, _ = S2CUdpToken.SCHEMA.decode(data)
+        return S2CUdpToken(token)
+
+class WorldDeltaView:
+    '''A world delta read in place. The lists are RecordArrays over the
+    packet's buffer, so they're only valid as long as it is'''
+    __slots__ = ("seq", "baseline", "removed_players", "players", "removed_bullets", "bullets")
+
+    def __init__(self, seq: int, baseline: int, removed_players: RecordArray, players: RecordArray, removed_bullets: RecordArray, bullets: RecordArray) -> None:
+        self.seq: int = seq
+        self.baseline: int = baseline
+
+        self.removed_players: RecordArray = removed_players # ids
+        self.players: RecordArray = players # CommonPlayer.RECORD tuples
+        self.removed_bullets: RecordArray = removed_bullets
+        self.bullets: RecordArray = bullets # CommonBullet.SPAWN_RECORD tuples
+
+class S2CWorldDelta(Packet):
+    '''Changes to the world since a snapshot the client has acknowledged.
+    A bullet's path is fixed when it's fired, so bullets are only sent as
+    they come into view and removed as they go'''
+    NO_BASELINE = 0 # delta against an empty world
+    SCHEMA: PacketSchema = PacketSchema(
+        [("seq", U32), ("baseline", U32)],
+        lists=[
+            Record(("removed_player", U16)),
+            CommonPlayer.RECORD,
+            Record(("removed_bullet", U16)),
+            CommonBullet.SPAWN_RECORD,
+        ],
+    )
+
+    def __init__(self, seq: int, baseline: int, players: list[CommonPlayer], removed_players: list[int], bullets: list[CommonBullet], removed_bullets: list[int]) -> None:
+        super().__init__(packet_ids.S2C_WORLD_DELTA)
+
+        self.seq: int = seq # the server tick the state is from
+        self.baseline: int = baseline
+
+        self.players: list[CommonPlayer] = players # added or changed
+        self.removed_players: list[int] = removed_players
+
+        self.bullets: list[CommonBullet] = bullets # added
+        self.removed_bullets: list[int] = removed_bullets
+
+    @override
+    def encode_data(self) -> bytes:
+        return S2CWorldDelta.SCHEMA.encode((self.seq, self.baseline), [
+            self.removed_players,
+            [player.record() for player in self.players],
+            self.removed_bullets,
+            [bullet.spawn_record() for bullet in self.bullets],
+        ])
+
+    @override
+    @staticmethod
+    def decode_data(data: bytes) -> 'S2CWorldDelta':
+        (seq, baseline), (removed_players, players, removed_bullets, bullets), _ = S2CWorldDelta.SCHEMA.decode(data)
+
+        return S2CWorldDelta(
+            seq, baseline,
+            [CommonPlayer.from_record(r) for r in players], removed_players,
+            [CommonBullet.from_spawn_record(r) for r in bullets], removed_bullets,
+        )
+
+    @staticmethod
+    def decode_view(data: bytes) -> WorldDeltaView:
+        '''The delta with its records left in place'''
+        (seq, baseline), (removed_players, players, removed_bullets, bullets), _ = S2CWorldDelta.SCHEMA.decode(data, lazy=True)
+        return WorldDeltaView(seq, baseline, removed_players, players, removed_bullets, bullets)
+
+class S2CFragment(Packet):
+    '''One piece of a packet too big for a single datagram'''
+    SCHEMA: PacketSchema = PacketSchema([("message", U16), ("index", U16), ("count", U16)], raw=True)
+
+    def __init__(self, message: int, index: int, count: int, data: bytes) -> None:
+        super().__init__(packet_ids.S2C_FRAGMENT)
+
+        self.message: int = message # the same for every fragment of a packet
+        self.index: int = index
+        self.count: int = count
+        self.data: bytes = data
+
+    @override
+    def encode_data(self) -> bytes:
+        return S2CFragment.SCHEMA.encode((self.message, self.index, self.count), raw=self.data)
+
+    @override
+    @staticmethod
+    def decode_data(data: bytes) -> 'S2CFragment':
+        '''data is a view of the packet it was decoded from'''
+        (message, index, count), _, fragment_data = S2CFragment.SCHEMA.decode(data)
+        return S2CFragment(message, index, count, fragment_data)
+
+class S2CCompressed(Packet):
+    '''Another whole packet, id included, compressed'''
+    SCHEMA: PacketSchema = PacketSchema(raw=True)
+
+    def __init__(self, data: bytes) -> None:
+        super().__init__(packet_ids.S2C_COMPRESSED)
+
+        self.data: bytes = data
+
+    @override
+    def encode_data(self) -> bytes:
+        return S2CCompressed.SCHEMA.encode(raw=self.data)
+
+    @override
+    @staticmethod
+    def decode_data(data: bytes) -> 'S2CCompressed':
+        _, _, compressed = S2CCompressed.SCHEMA.decode(data)
+        return S2CCompressed(compressed)
+
+    def decompress(self) -> bytes:
+        return compression.decompress(self.data)
+
+class S2CInputAck(Packet):
+    '''Where the server has the client's own player, after applying its
+    inputs up to seq and then stepping the player forward steps ticks'''
+    SCHEMA: PacketSchema = PacketSchema([("seq", U32), ("steps", U16), ("x", U16), ("y", U16)])
+    MAX_STEPS: int = (1 << 16) - 1
+
+    def __init__(self, seq: int, steps: int, pos: Vec2D) -> None:
+        super().__init__(packet_ids.S2C_INPUT_ACK)
+
+        self.seq: int = seq # 0 before any input has been applied
+        self.steps: int = steps
+        self.pos: Vec2D = pos
+
+    @override
+    def encode_data(self) -> bytes:
+        return S2CInputAck.SCHEMA.encode((self.seq, min(self.steps, S2CInputAck.MAX_STEPS), self.pos.x, self.pos.y))
+
+    @override
+    @staticmethod
+    def decode_data(data: bytes) -> 'S2CInputAck':
+        (seq, steps, x, y), _, _ = S2CInputAck.SCHEMA.decode(data)
+        return S2CInputAck(seq, steps, Vec2D(x, y))
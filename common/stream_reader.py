@@ -0,0 +1,107 @@
+import socket
+from typing import Iterator, Optional
+
+from common.packet_header import PacketHeader
+
+
+class FrameTooLarge(ValueError):
+    '''A frame header claimed more than the reader will take'''
+
+
+class StreamReader:
+    '''Reassembles length prefixed frames from a stream socket.
+
+    Data is read with recv_into straight into a preallocated buffer and frames
+    are handed out as memoryview slices of it, so no bytes are copied or
+    allocated per packet. A frame is only valid until the next call to recv, so
+    drain frames() before reading again.
+
+    Frames over max_frame_size raise FrameTooLarge as soon as their header
+    arrives, before any room is made for them'''
+
+    def __init__(self, capacity: int = 4096, max_frame_size: int = PacketHeader.MAX_PACKET_SIZE) -> None:
+        self.max_frame_size: int = max_frame_size
+        self.buffer: bytearray = bytearray(capacity)
+        self.view: memoryview = memoryview(self.buffer)
+
+        self.start: int = 0 # first byte not yet handed out
+        self.end: int = 0   # first byte not yet filled
+
+    def recv(self, conn: socket.socket) -> int:
+        '''Reads whatever is available from conn in one syscall. Returns 0 when the peer has closed'''
+        if self.start == self.end:
+            self.start = self.end = 0
+
+        else:
+            pending_size = self._pending_frame_size()
+            if self.end == len(self.buffer) or self.start + pending_size > len(self.buffer):
+                self._reserve(pending_size)
+
+        read = conn.recv_into(self.view[self.end:])
+        self.end += read
+        return read
+
+    def next_frame(self) -> Optional[memoryview]:
+        available = self.end - self.start
+        if available < PacketHeader.HEADER_SIZE:
+            return None
+
+        header_size = PacketHeader.header_size(self.buffer[self.start])
+        if available < header_size:
+            return None
+
+        frame_size = self._frame_size(header_size)
+        if available < frame_size:
+            return None
+
+        frame_start = self.start + header_size
+        self.start += frame_size
+        return self.view[frame_start:self.start]
+
+    def frames(self) -> Iterator[memoryview]:
+        '''Yields every complete frame currently buffered'''
+        while True:
+            frame = self.next_frame()
+            if frame is None:
+                return
+            yield frame
+
+    def _pending_frame_size(self) -> int:
+        available = self.end - self.start
+        if available < PacketHeader.HEADER_SIZE:
+            return PacketHeader.HEADER_SIZE
+
+        header_size = PacketHeader.header_size(self.buffer[self.start])
+        if available < header_size:
+            return header_size
+
+        return self._frame_size(header_size)
+
+    def _frame_size(self, header_size: int) -> int:
+        '''Size, header included, of the frame whose whole header is at start'''
+        packet_size = PacketHeader.get_packet_size(self.view[self.start:self.start+header_size])
+        if packet_size > self.max_frame_size:
+            raise FrameTooLarge(f"frame of {packet_size} bytes is over the {self.max_frame_size} byte limit")
+
+        return header_size + packet_size
+
+    def _compact(self) -> None:
+        '''Moves the partial frame at the back of the buffer to the front'''
+        available = self.end - self.start
+        self.buffer[:available] = bytes(self.view[self.start:self.end]) # copy as the regions can overlap
+        self.start, self.end = 0, available
+
+    def _reserve(self, frame_size: int) -> None:
+        '''Makes sure a frame of frame_size fits from the start of the buffer'''
+        if frame_size <= len(self.buffer):
+            self._compact()
+            return
+
+        # views already handed out keep the old buffer alive, so swap rather than resize
+        available = self.end - self.start
+        new_buffer = bytearray(max(frame_size, len(self.buffer)*2))
+        new_buffer[:available] = self.view[self.start:self.end]
+
+        self.buffer = new_buffer
+        self.view = memoryview(new_buffer)
+        self.start, self.end = 0, available
@@ -19,6 +19,10 @@ def main() -> None:
         s.start()
     else:
         from client.main import Client
+        from client.settings import Settings
+        if args.room is not None:
+            Settings.room = args.room
+
         if args.port is None:
             print("No port provided to connect to")
         
@@ -33,6 +37,7 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument("-s", "-side", choices=["client", "server"], dest="side")
     parser.add_argument("-p", "-port", type=int, dest="port")
+    parser.add_argument("-r", "-room", type=int, dest="room")
     args = parser.parse_args()
     return args
 
@@ -0,0 +1,75 @@
+from typing import Callable, Optional
+
+from common.bullet import CommonBullet
+from common.data_types import Vec2D
+from common.movement import ANGLE_STEPS, bullet_velocity
+from common.player import CommonPlayer
+from server.settings import Settings
+
+# every angle a client can send so bullets never do trig
+VELOCITY_TABLE: list[tuple[int, int]] = [bullet_velocity(angle) for angle in range(ANGLE_STEPS)]
+
+
+def ticks_in_world(origin: Vec2D, velocity: tuple[int, int]) -> Optional[int]:
+    '''Ticks until a bullet leaves the world. None if it never does'''
+    world = Settings.world_rect
+    if not world.contains(origin):
+        return 1
+
+    ticks: Optional[int] = None
+    for start, low, high, v in ((origin.x, world.min.x, world.max.x, velocity[0]), (origin.y, world.min.y, world.max.y, velocity[1])):
+        # first tick on or past the edge, as the world's edges are outside it
+        if v > 0:
+            axis_ticks = -((start - high) // v)
+        elif v < 0:
+            axis_ticks = -((low - start) // -v)
+        else:
+            continue
+
+        if ticks is None or axis_ticks < ticks:
+            ticks = axis_ticks
+
+    return ticks
+
+
+class ServerBullet(CommonBullet):
+    '''A bullet's whole path is known when it's fired so it is stored as its
+    origin and velocity. The position is only worked out, once per tick,
+    when something asks for it'''
+
+    def __init__(self, origin: Vec2D, shoot_angle: int, clock: Callable[[], int], shooter: Optional[CommonPlayer] = None) -> None:
+        self.clock: Callable[[], int] = clock
+        self.velocity: tuple[int, int] = VELOCITY_TABLE[shoot_angle % ANGLE_STEPS]
+
+        self.origin: Vec2D = origin
+        self.spawn_tick: int = clock() - 1 # takes its first step on the tick it's fired, before anything is hit
+
+        self.cached_tick: int = -1
+        self.cached_pos: Vec2D = origin.clone() # updated in place
+
+        self.rewind: int = 0 # ticks back to look for players it hits, as the shooter was seeing the past
+
+        super().__init__(origin, shoot_angle, shooter, spawn_tick=self.spawn_tick)
+
+        lifetime = ticks_in_world(origin, self.velocity)
+        self.expiry_tick: Optional[int] = None if lifetime is None else self.spawn_tick + lifetime
+
+    def spawn_record(self) -> tuple[int, int, int, int, int]:
+        return (self.id, self.origin.x, self.origin.y, self.shoot_angle % ANGLE_STEPS, self.spawn_tick)
+
+    @property # type: ignore[override]
+    def pos(self) -> Vec2D:
+        tick = self.clock()
+        if tick != self.cached_tick:
+            age = tick - self.spawn_tick
+            self.cached_pos.set(self.origin.x + self.velocity[0]*age, self.origin.y + self.velocity[1]*age)
+            self.cached_tick = tick
+
+        return self.cached_pos
+
+    @pos.setter
+    def pos(self, pos: Vec2D) -> None:
+        # only set by CommonBullet's constructor
+        self.origin = pos
+        self.spawn_tick = self.clock() - 1
+        self.cached_tick = -1
@@ -0,0 +1,56 @@
+from typing import Union
+
+from common.c2s_packets import C2SCreateBullet, C2SMovementUpdate
+
+Command = Union[C2SMovementUpdate, C2SCreateBullet]
+
+
+class CommandBuffer:
+    '''Inputs from one client waiting for the next tick, keyed by the
+    sequence number the client gave them. Draining gives them back in the
+    order they were made, whichever channel each came over'''
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self.pending: dict[int, Command] = {}
+
+        self.last_seq: int = 0       # newest input applied. Clients number theirs from 1
+        self.last_move_seq: int = -1 # newest movement applied. Older ones are out of date
+        self.applied_tick: int = -1  # when last_seq was applied
+
+        self.dropped: int = 0
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def steps_since_applied(self, tick: int) -> int:
+        '''Ticks stepped with last_seq applied, counting the tick it was applied on'''
+        return 0 if self.applied_tick == -1 else tick - self.applied_tick + 1
+
+    def push(self, seq: int, command: Command) -> None:
+        if seq in self.pending:
+            return # e.g. a redundant copy of a movement datagram
+
+        if isinstance(command, C2SMovementUpdate) and seq <= self.last_move_seq:
+            return # superseded by a movement already applied
+
+        if len(self.pending) >= self.limit:
+            self.dropped += 1
+            return
+
+        self.pending[seq] = command
+
+    def drain(self, tick: int) -> list[Command]:
+        '''Pending commands in the order they were made, to be applied on tick'''
+        if self.pending:
+            self.applied_tick = tick
+
+        commands = [self.pending[seq] for seq in sorted(self.pending)]
+
+        for seq, command in self.pending.items():
+            self.last_seq = max(self.last_seq, seq)
+            if isinstance(command, C2SMovementUpdate):
+                self.last_move_seq = max(self.last_move_seq, seq)
+
+        self.pending.clear()
+        return commands
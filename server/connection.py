@@ -1,31 +1,70 @@
+import selectors
 import socket
+from typing import TYPE_CHECKING, Optional
+
+from common.datagram import StaleFilter
+from common.stream_reader import StreamReader
+from server.outbox import Outbox
+from server.settings import Settings
+from server.snapshot_rate import SnapshotRate
+from server.snapshots import DeltaTracker
+
+if TYPE_CHECKING:
+    from server.room import Room
 
 
 class Connection:
 
-    def __init__(self, s: socket.socket) -> None:
+    def __init__(self, s: socket.socket, peer_name: tuple[str, int]) -> None:
         self.socket: socket.socket = s
+        self.peer_name: tuple[str, int] = peer_name # from accept, as the peer may already have gone
 
         self.player_id: int = -1
+        self.room: Optional[Room] = None # chosen during the handshake
 
         self.is_open: bool = False
-        
+        self.closed: bool = False
+
+        self.reader: StreamReader = StreamReader(Settings.recv_buffer_size, Settings.max_client_frame_size)
+        self.outbox: Outbox = Outbox(Settings.outbox_limit_bytes)
+        self.behind_ticks: int = 0
+
+        self.deltas: DeltaTracker = DeltaTracker()
+        self.snapshot_rate: SnapshotRate = SnapshotRate()
+
+        # (input seq, x, y) last sent in an S2CInputAck, and how many more times to repeat it
+        self.input_ack: Optional[tuple[int, int, int]] = None
+        self.input_ack_repeats: int = 0
+
+        self.capabilities: int = 0 # agreed during the handshake
+
+        self.udp_token: int = -1
+        self.udp_addr: Optional[tuple[str, int]] = None
+        self.udp_seq: int = 0
+        self.udp_filter: StaleFilter = StaleFilter()
+        self.selector_events: int = selectors.EVENT_READ
+
     def __str__(self) -> str:
-        return f"Conn[id= {self.player_id}, name= {self.get_peer_name()}, open= {self.is_open}]"
+        room = -1 if self.room is None else self.room.id
+        return f"Conn[id= {self.player_id}, room= {room}, name= {self.get_peer_name()}, open= {self.is_open}]"
 
     def open_connection(self, player_id: int) -> None:
         self.player_id = player_id
         self.is_open = True
 
     def get_peer_name(self) -> str:
-        return self.socket.getpeername()
+        return self.peer_name
 
     def close(self, shutdown: bool) -> None:
-        if not self.is_open:
+        if self.closed:
             return
 
+        self.closed = True
         self.is_open = False
         if shutdown:
-            self.socket.shutdown(socket.SHUT_RDWR)
+            try:
+                self.socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass # peer already gone
         self.socket.close()
-        
+
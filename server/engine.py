@@ -0,0 +1,149 @@
+import sys
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Optional
+
+if sys.version_info >= (3, 12):
+    from typing import override
+else:
+    from typing import Any, Callable, TypeVar
+
+    F = TypeVar("F", bound=Callable[..., Any])
+    def override(method: F, /) -> F:
+        return method
+
+from common import movement
+from server.bullet import ServerBullet
+from server.settings import Settings
+from server.spatial_grid import CellIndex, SpatialGrid
+
+if TYPE_CHECKING:
+    from server.game_data import GameData
+
+
+class StepResult:
+    '''What changed during one engine step'''
+
+    def __init__(self) -> None:
+        self.players_dirty: bool = False
+        self.bullets_dirty: bool = False
+
+        self.gone_bullets: set[int] = set() # out of the world or hit someone
+        self.killed_players: list[int] = []
+
+
+class Engine(ABC):
+    '''Simulates the players and bullets of a GameData. The game owns the
+    entities and tells the engine when they come and go.
+
+    When several bullets hit a player in the same step the one with the
+    lowest id counts, so every engine gives the same results.
+
+    A bullet with a rewind is tested against where players were that many
+    ticks ago, from the game's position history'''
+
+    def __init__(self, game: 'GameData') -> None:
+        self.game: GameData = game
+
+    @abstractmethod
+    def step(self, expired: set[int]) -> StepResult:
+        '''Moves everything on to the current tick. expired are the bullets that have left the world'''
+        pass
+
+    def add_bullet(self, bullet: ServerBullet) -> None:
+        pass
+
+    def remove_bullets(self, bullet_ids: set[int]) -> None:
+        pass
+
+    def remove_player(self, player_id: int) -> None:
+        pass
+
+    def encode_players(self) -> Optional[bytes]:
+        '''Records of every player, in game.players order, or None to encode the objects'''
+        return None
+
+    def encode_bullets(self) -> Optional[bytes]:
+        '''Records of every bullet, in game.bullets order, or None to encode the objects'''
+        return None
+
+
+class ObjectEngine(Engine):
+    '''Steps each entity object in turn'''
+
+    def __init__(self, game: 'GameData') -> None:
+        super().__init__(game)
+
+        # broadphase for collisions. Players only need checking against bullets in the cells they overlap
+        self.bullet_cells: CellIndex = CellIndex(SpatialGrid(Settings.world_rect, Settings.collision_cell_size))
+
+    @override
+    def step(self, expired: set[int]) -> StepResult:
+        result = StepResult()
+        result.gone_bullets.update(expired)
+
+        for player in self.game.players:
+            if movement.step(player.pos, player.mov_dir):
+                result.players_dirty = True
+
+        for bullet in self.game.bullets:
+            result.bullets_dirty = True
+
+            if bullet.id not in expired:
+                self.bullet_cells.move(bullet.id, bullet.pos)
+
+        r = Settings.player_radius
+        reach = r + Settings.player_speed * Settings.max_rewind_ticks # covers where players were for rewound bullets
+        tick = self.game.current_tick()
+        history = self.game.history
+
+        for player in self.game.players:
+            hit: int = -1
+            for id in self.bullet_cells.ids_in(self.bullet_cells.grid.area_around(player.pos, reach)):
+                if id in result.gone_bullets:
+                    continue # each bullet only hits once
+
+                bullet = self.game.bullets.get(id)
+                if bullet is None or bullet.owner is player:
+                    continue
+
+                if bullet.rewind:
+                    then = history.position(player.id, tick - bullet.rewind)
+                    if then is None:
+                        continue # the shooter couldn't have seen them
+                    px, py = then
+                else:
+                    px, py = player.pos.x, player.pos.y
+
+                # inside the player's square. Edges don't count, like Rect.contains
+                pos = bullet.pos
+                if abs(pos.x - px) < r and abs(pos.y - py) < r and (hit == -1 or id < hit):
+                    hit = id
+
+            if hit != -1:
+                result.gone_bullets.add(hit)
+                result.killed_players.append(player.id)
+
+                result.bullets_dirty = True
+                result.players_dirty = True
+
+        return result
+
+    @override
+    def add_bullet(self, bullet: ServerBullet) -> None:
+        self.bullet_cells.move(bullet.id, bullet.pos)
+
+    @override
+    def remove_bullets(self, bullet_ids: set[int]) -> None:
+        for id in bullet_ids:
+            self.bullet_cells.remove(id)
+
+
+def create_engine(game: 'GameData') -> Engine:
+    if Settings.engine == "numpy":
+        try:
+            from server.numpy_engine import NumpyEngine
+            return NumpyEngine(game)
+        except ModuleNotFoundError:
+            print("NumPy isn't installed. Using the object engine")
+
+    return ObjectEngine(game)
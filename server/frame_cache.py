@@ -0,0 +1,49 @@
+from typing import Callable, Hashable, Optional
+
+from common.packet_base import Packet
+from common.packet_header import PacketHeader
+
+
+class Frame:
+    '''A packet encoded once together with its length header. The buffers are
+    immutable so one frame can be queued on any number of connections'''
+
+    def __init__(self, packet: Packet, packet_id: Optional[int] = None) -> None:
+        # packet_id is of the packet carried when it's wrapped, e.g. compressed, so
+        # it is still treated as that packet while queued
+        self.packet_id: int = packet.get_packet_id() if packet_id is None else packet_id
+
+        self.payload: bytes = packet.encode()
+        self.header: bytes = PacketHeader.encode_size(len(self.payload))
+
+        self.payload_size: int = len(self.payload)
+        self.size: int = len(self.header) + self.payload_size
+
+        self.fragments: Optional[list[bytes]] = None # datagram sized pieces, split the first time they are needed
+        self.compressed: Optional[Frame] = None # for clients that take compression. This frame when it doesn't pay
+
+
+class FrameCache:
+    '''Frames of snapshot packets for the current tick.
+
+    Entries are thrown away when the tick changes. Anything that changes the
+    state a cached frame was built from during a tick has to invalidate it'''
+
+    def __init__(self) -> None:
+        self.tick: int = -1
+        self.frames: dict[Hashable, Frame] = {}
+
+    def get(self, tick: int, key: Hashable, build: Callable[[], Packet]) -> Frame:
+        if tick != self.tick:
+            self.frames.clear()
+            self.tick = tick
+
+        frame = self.frames.get(key)
+        if frame is None:
+            frame = Frame(build())
+            self.frames[key] = frame
+
+        return frame
+
+    def invalidate(self, key: Hashable) -> None:
+        self.frames.pop(key, None)
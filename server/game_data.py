@@ -1,99 +1,116 @@
-import math
+import heapq
 import random
 from typing import TYPE_CHECKING, Optional
 
+from common import packet_ids
 from common.bullet import CommonBullet
-from common.data_types import Color, Rect, Vec2D
+from common.c2s_packets import C2SCreateBullet, C2SMovementUpdate
+from common.data_types import Color, Vec2D
 from common.player import CommonPlayer
-from common.s2c_packets import S2CBullets, S2CDisconnectPlayer, S2CPlayers
+from common.s2c_packets import S2CDisconnectPlayer
+from server.bullet import ServerBullet
+from server.commands import CommandBuffer
 from server.connection import Connection
+from server.engine import Engine, StepResult, create_engine
+from server.position_history import PositionHistory
+from server.registry import Registry
 from server.settings import Settings
+from server.snapshots import EMPTY_WORLD, WorldState
+from server.spatial_grid import SpatialGrid
 
 if TYPE_CHECKING:
-    from server.main import Server
+    from server.room import Room
 
 class GameData:
-    def __init__(self, server: 'Server') -> None:
-        self.server: Server = server
+    def __init__(self, room: 'Room') -> None:
+        self.room: Room = room
 
-        self.players: list[CommonPlayer] = []
-        self.bullets: list[CommonBullet] = []
-    
-    def update(self) -> None:
-        
-        players_dirty = False
-        for player in self.players:
-            if player.mov_dir.is_none():
-                continue
-            
-            players_dirty = True
-            velocity: Vec2D = player.mov_dir * Settings.player_speed
-
-            if player.mov_dir.x and player.mov_dir.y:
-                velocity = velocity / 1.2
-
-            new_pos = player.pos + velocity
+        self.players: Registry[CommonPlayer] = Registry()
+        self.history: PositionHistory = PositionHistory(Settings.max_rewind_ticks + 1)
+        self.commands: dict[int, CommandBuffer] = {} # inputs for the next tick, by player id
+        self.bullets: Registry[ServerBullet] = Registry()
+        self.next_bullet_id: int = 0
+        self.expiry_queue: list[tuple[int, int]] = [] # (expiry tick, bullet id). Entries of bullets that hit someone are left in
 
-            player.pos.x = min(Settings.world_width  - Settings.player_radius, max(Settings.player_radius, new_pos.x))
-            player.pos.y = min(Settings.world_height - Settings.player_radius, max(Settings.player_radius, new_pos.y))
-        
-        bullet_dirty = False
-        for bullet in self.bullets:
+        self.engine: Engine = create_engine(self)
 
-            # pol to cart
-            shifted_angle: float = (bullet.shoot_angle / 100) - 90
+        self.grid: SpatialGrid = SpatialGrid(Settings.world_rect, Settings.interest_cell_size)
+        self.world_state: WorldState = EMPTY_WORLD
+        self.world_dirty: bool = True # set when entities are added or removed between ticks
 
-            rawx = int(Settings.bullet_speed * math.cos(math.radians(shifted_angle)))
-            rawy = int(Settings.bullet_speed * math.sin(math.radians(shifted_angle)))
+        # moved since the last snapshot was sent. Snapshots go out every snapshot_interval ticks
+        self.players_unsent: bool = False
+        self.bullets_unsent: bool = False
+    
+    def update(self) -> None:
+        self.apply_commands()
 
-            bullet.pos += Vec2D(rawx, rawy)
+        step: StepResult = self.engine.step(self.pop_expired_bullets())
+        self.players_unsent |= step.players_dirty
+        self.bullets_unsent |= step.bullets_dirty
 
-            bullet_dirty = True
-
-            if not Settings.world_rect.contains(bullet.pos):
-                self.bullets.remove(bullet)
-                continue
+        if step.gone_bullets:
+            self.remove_bullets(step.gone_bullets)
 
         dead_conns: list[Connection] = []
-        for player in self.players:
-            player_rect: Rect = Rect(
-                (player.pos-Vec2D(Settings.player_radius, Settings.player_radius)),
-                (player.pos+Vec2D(Settings.player_radius, Settings.player_radius)),
-            )
-            conn: Optional[Connection] = self.get_connection(player.id)
+        for id in step.killed_players:
+            conn: Optional[Connection] = self.get_connection(id)
             if conn is None:
-                print(f"Couldn't find connection assosiated with player id {player.id}")
+                print(f"Couldn't find connection assosiated with player id {id}")
                 raise LookupError()
+            dead_conns.append(conn)
 
-            gone_bullets: list[CommonBullet] = []
-            for bullet in self.bullets:
-                if bullet.owner is player:
-                    continue
+        for c in dead_conns:
+            self.room.send(c, S2CDisconnectPlayer(S2CDisconnectPlayer.KILLED))
+            self.room.close_connection(c)
 
-                if player_rect.contains(bullet.pos):
-                    dead_conns.append(conn)
-                    gone_bullets.append(bullet)
+        if Settings.max_rewind_ticks:
+            self.history.record(self.room.tick, self.players)
 
-                    bullet_dirty = True
-                    players_dirty = True
-                    break
+        if self.room.tick % Settings.snapshot_interval == 0:
+            self.send_snapshots()
 
-            self.bullets = [b for b in self.bullets if b not in gone_bullets]
+    def send_snapshots(self) -> None:
+        players_dirty, bullets_dirty = self.players_unsent, self.bullets_unsent
+        self.players_unsent = self.bullets_unsent = False
 
-        for c in dead_conns:
-            self.server.send(c, S2CDisconnectPlayer(S2CDisconnectPlayer.KILLED))
-            self.server.close_connection(c)
+        if players_dirty or bullets_dirty or self.world_dirty:
+            # deltas send bullets as they're fired, so only full snapshots need where they are
+            positions = not Settings.delta_snapshots
+            self.world_state = WorldState(
+                self.room.tick, self.players.values(), self.bullets.values(), self.grid,
+                self.engine.encode_players(), self.engine.encode_bullets() if positions else None, positions,
+            )
+            self.world_dirty = False
+
+        if Settings.delta_snapshots:
+            self.room.send_world_deltas(self.world_state)
 
+        else:
+            # even when nothing changed, clients on slower rates may be due what did earlier
+            self.room.send_world_snapshots(self.world_state, players_dirty, bullets_dirty)
 
-        if players_dirty:
-            self.server.broadcast(S2CPlayers(self.players))
-        
-        if bullet_dirty:
-            self.server.broadcast(S2CBullets(self.bullets))
-        
+        self.room.send_input_acks()
+
+    def apply_commands(self) -> None:
+        '''Applies every input that arrived since the last tick, each player's in the order they were made'''
+        for player in self.players:
+            commands = self.commands[player.id]
+            if not commands:
+                continue
+
+            for command in commands.drain(self.room.tick):
+                if isinstance(command, C2SMovementUpdate):
+                    player.mov_dir = command.mov_dir
+                elif isinstance(command, C2SCreateBullet):
+                    self.add_bullet(player.pos.clone(), command.angle, player, self.rewind_ticks(command.view_tick))
 
     def add_player(self, player: CommonPlayer) -> None:
-        self.players.append(player)
+        self.players.add(player.id, player)
+        self.commands[player.id] = CommandBuffer(Settings.max_buffered_inputs)
+        self.history.forget(player.id)
+        self.room.frame_cache.invalidate(packet_ids.S2C_PLAYERS)
+        self.world_dirty = True
     
     def add_random_player(self, id: int) -> None:
         self.add_player(CommonPlayer(
@@ -107,22 +124,76 @@ class GameData:
         ))
     
     def remove_player(self, player_id: int) -> None:
-        player = self.get_player(player_id)
-        if player:
-            self.players.remove(player)
+        if self.players.remove(player_id) is not None:
+            del self.commands[player_id]
+            self.engine.remove_player(player_id)
+            self.room.frame_cache.invalidate(packet_ids.S2C_PLAYERS)
+            self.world_dirty = True
+
+    def current_tick(self) -> int:
+        return self.room.tick
+
+    def rewind_ticks(self, view_tick: int) -> int:
+        '''How far back a shot seen at view_tick should look for players to hit'''
+        if view_tick == 0:
+            return 0 # client hadn't drawn anything yet
+
+        return max(0, min(self.room.tick - view_tick, Settings.max_rewind_ticks))
+
+    def add_bullet(self, origin: Vec2D, shoot_angle: int, shooter: Optional[CommonPlayer] = None, rewind: int = 0) -> Optional[ServerBullet]:
+        id_limit = 1 << (8*CommonBullet.ID_SIZE)
+        if len(self.bullets) >= id_limit:
+            print("Too many bullets. Dropping new one")
+            return None
+
+        bullet = ServerBullet(origin, shoot_angle, self.current_tick, shooter)
+        bullet.rewind = rewind
+
+        # ids roll over, skipping any still in flight
+        while self.next_bullet_id in self.bullets:
+            self.next_bullet_id = (self.next_bullet_id + 1) % id_limit
+        bullet.id = self.next_bullet_id
+        self.next_bullet_id = (self.next_bullet_id + 1) % id_limit
+
+        self.bullets.add(bullet.id, bullet)
+        if bullet.expiry_tick is not None:
+            heapq.heappush(self.expiry_queue, (bullet.expiry_tick, bullet.id))
+
+        self.engine.add_bullet(bullet)
+        self.room.frame_cache.invalidate(packet_ids.S2C_BULLETS)
+        self.world_dirty = True
+        return bullet
+
+    def pop_expired_bullets(self) -> set[int]:
+        '''Ids of bullets that have left the world by this tick'''
+        tick = self.current_tick()
+        expired: set[int] = set()
+
+        while self.expiry_queue and self.expiry_queue[0][0] <= tick:
+            expiry_tick, id = heapq.heappop(self.expiry_queue)
+
+            bullet = self.bullets.get(id)
+            if bullet is not None and bullet.expiry_tick == expiry_tick: # id may have been reused
+                expired.add(id)
+
+        return expired
+
+    def remove_bullets(self, bullet_ids: set[int]) -> None:
+        for id in bullet_ids:
+            self.bullets.remove(id)
+        self.engine.remove_bullets(bullet_ids)
+
+        self.room.frame_cache.invalidate(packet_ids.S2C_BULLETS)
+        self.world_dirty = True
     
     def get_player(self, player_id: int) -> Optional[CommonPlayer]:
-        for player in self.players:
-            if player.id == player_id:
-                return player # if more than 1 player with same ID something very wrong
-        
-        print(f"Couldn't find player with ID {player_id}")
-        return None
+        player = self.players.get(player_id)
+        if player is None:
+            print(f"Couldn't find player with ID {player_id}")
+        return player
 
     def get_connection(self, player_id: int) -> Optional[Connection]:
-        for conn in self.server.open_connections:
-            if conn.player_id == player_id:
-                return conn # if more than 1 connection with same ID something very wrong
-        
-        print(f"Couldn't find connection with player ID {player_id}")
-        return None
+        conn = self.room.connections.get(player_id)
+        if conn is None:
+            print(f"Couldn't find connection with player ID {player_id}")
+        return conn
@@ -0,0 +1,76 @@
+import os
+import signal
+import sys
+import threading
+from typing import Callable, NoReturn, Optional
+
+
+class Supervisor:
+    '''Owns the server's worker threads. The main thread sleeps on an event
+    until a worker or a signal asks for shutdown, then joins the workers'''
+
+    def __init__(self) -> None:
+        self.stopped: threading.Event = threading.Event()
+        self.workers: list[threading.Thread] = []
+
+        self.shutdown_requested: bool = False
+        self.forced: bool = False # asked twice, so workers aren't waited for
+        self.on_shutdown: Optional[Callable[[], None]] = None
+
+    def spawn(self, target: Callable[[], None], name: str, daemon: bool = False) -> None:
+        '''Daemon workers aren't joined on shutdown. Use it for threads stuck in blocking calls like input()'''
+        def run() -> None:
+            try:
+                target()
+            finally:
+                if not daemon:
+                    self.stop() # a core worker exiting takes the server down with it
+
+        thread = threading.Thread(target=run, name=name, daemon=daemon)
+        if not daemon:
+            self.workers.append(thread)
+        thread.start()
+
+    def install_signal_handlers(self, on_shutdown: Callable[[], None]) -> None:
+        '''on_shutdown runs on the main thread for the first SIGINT/SIGTERM. A second one
+        stops waiting and exits without the workers that haven't finished'''
+        self.on_shutdown = on_shutdown
+        signal.signal(signal.SIGINT, self.handle_signal)
+        signal.signal(signal.SIGTERM, self.handle_signal)
+
+    def handle_signal(self, signum: int, frame: object) -> None:
+        if self.shutdown_requested:
+            print(f"Received {signal.Signals(signum).name} again, exiting now")
+            self.forced = True
+            self.stop()
+            return
+
+        print(f"Received {signal.Signals(signum).name}, shutting down")
+        self.shutdown_requested = True
+        if self.on_shutdown is not None:
+            self.on_shutdown()
+
+    def wait(self) -> None:
+        '''Blocks until stop is called. Signal handlers still run on the main thread while it waits'''
+        self.stopped.wait()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+    def join(self, timeout: float = 5) -> bool:
+        '''False if a worker didn't stop in time'''
+        stopped = True
+        for thread in self.workers:
+            thread.join(0 if self.forced else timeout)
+            if thread.is_alive():
+                print(f"Worker {thread.name} didn't stop in time")
+                stopped = False
+        return stopped
+
+    def exit(self, timeout: float = 5) -> NoReturn:
+        '''Joins the workers then exits. The interpreter waits for workers still
+        running when it shuts down, so if any are stuck the process ends without it'''
+        if not self.join(timeout):
+            sys.stdout.flush()
+            os._exit(1)
+        sys.exit()
@@ -1,184 +1,115 @@
-import _thread
-import queue
 import socket
-import sys
-import time
-from typing import Optional
+from typing import Any, Callable, Optional
 
 from common import packet_ids
-from common.bullet import CommonBullet
-from common.c2s_packets import C2SCreateBullet, C2SHandshake, C2SMovementUpdate
+from common.c2s_packets import C2SClientDisconnect, C2SCreateBullet, C2SHandshake, C2SMovementUpdate, C2SRequestPlayerList, C2SSnapshotAck
 from common.packet_base import Packet
-from common.packet_header import PacketHeader
-from common.s2c_packets import S2CBullets, S2CDisconnectPlayer, S2CFailedHandshake, S2CHandshake, S2CPlayers, S2CSendID
+from common.packet_dispatch import PacketDispatcher
+from common.s2c_packets import S2CDisconnectPlayer
 from server.connection import Connection
-from server.game_data import GameData
+from server.frame_cache import Frame
+from server.lifecycle import Supervisor
+from server.network_core import NetworkCore
 from server.raw_packet import RawPacket
+from server.commands import Command
+from server.room import Room
 from server.settings import Settings
+from server.tick_scheduler import TickScheduler
 
 
 class Server:
 
     def __init__(self, port: int = 0) -> None:
         self.server: str = "127.0.0.1"
-        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
         self.port: int = port
 
-        self.recieved_packets: queue.Queue[RawPacket] = queue.Queue()
+        self.network: NetworkCore = NetworkCore(self)
+        self.supervisor: Supervisor = Supervisor()
+        self.scheduler: TickScheduler = TickScheduler(Settings.tick_time_ns, Settings.max_catch_up_ticks, Settings.tick_spin_ns)
         self.quit: bool = False
 
         self.open_connections: list[Connection] = []
 
-        self.game: GameData = GameData(self)
+        self.rooms: dict[int, Room] = {} # only rooms with someone in them exist
+
+        self.packets: PacketDispatcher[Connection] = PacketDispatcher()
+        self.register_packet_handlers()
 
     def start(self) -> None:
         try:
-            self.socket.bind((self.server, self.port))
+            self.port = self.network.listen(self.server, self.port)
         except socket.error as e:
             print(e)
             self.close_server()
             return
         
-        self.socket.listen()
-        print(f"Server started on port {self.socket.getsockname()[1]}")
-
-        _thread.start_new_thread(self.console_loop, ())
-        _thread.start_new_thread(self.main_loop, ())
-        _thread.start_new_thread(self.packet_loop, ())
-        _thread.start_new_thread(self.accept_loop, ())
-        
-        while not self.quit: pass
-        sys.exit()
-
-
-    def accept_loop(self) -> None:
-        '''Handles accepting new clients'''
-        while not self.quit:
-            sock, addr = self.socket.accept()
-            conn: Connection = Connection(sock)
-
-            print(f"Connecting to: {addr}")
-
-            _thread.start_new_thread(self.read_loop, (conn,))
-    
-    def read_loop(self, conn: Connection) -> None:
-        '''One per client to store received packets for later processing'''
-        if self.initial_handshake(conn) is not None:
-            return
-        
-        self.on_client_join(conn)
+        print(f"Server started on port {self.port}")
 
-        while not self.quit:
-            try:
-                raw_packet = self.recv(conn)
-                if raw_packet is None:
-                    print(f"Lost connection to peer")
-                    self.close_connection(conn)
-                    break
-
-                self.recieved_packets.put(RawPacket(raw_packet, conn))
-
-            except ConnectionResetError:
-                print(f"Lost connection to peer")
-                self.close_connection(conn)
-                break
-
-            except Exception as e:
-                self.close_connection(conn)
-                print("Network Error: ", e)
-                break
-    
-    def packet_loop(self) -> None:
-        '''Processes all recieved packets'''
-        while not self.quit:
-            raw_packet = self.recieved_packets.get()
-            self.handle_packet(raw_packet)
-            self.recieved_packets.task_done()
+        self.supervisor.install_signal_handlers(lambda: self.network.call_soon(self.close_server))
+        self.supervisor.spawn(self.console_loop, "console", daemon=True) # blocked in input() so can't be joined
+        self.supervisor.spawn(self.main_loop, "main")
 
-    def initial_handshake(self, conn: Connection) -> Optional[Exception]:
-        self.send(conn, S2CHandshake())
-        try:
-            check_packet = self.recv(conn)
-        except ConnectionResetError:
-            print(f"Error during response from closed peer.")
-            self.close_connection(conn, was_open=False)
-            return ConnectionError()
+        self.supervisor.wait()
+        self.supervisor.exit()
 
-        if check_packet is None:
-            print(f"No response to handshake from peer: {conn.get_peer_name()}")
-            self.send(conn, S2CFailedHandshake())
-            time.sleep(0.1) # time for client to close on their end
-            self.close_connection(conn, was_open=False)
-            return ConnectionError()
-        
-        if self.handle_packet(RawPacket(check_packet, conn)) is not None:
-            print(f"Handshake failed (incorrect data recieved) when connecting to peer: {conn.get_peer_name()}")
-            self.send(conn, S2CFailedHandshake())
-            time.sleep(0.1) # time for client to close on their end
-            self.close_connection(conn, was_open=False)
-            return ConnectionError()
-        
-        print(f"Connection established to peer: {conn.get_peer_name()}")
+    @property
+    def tick(self) -> int:
+        return self.scheduler.tick
 
     def close_server(self) -> None:
-        for c in self.open_connections:
-            self.broadcast(S2CDisconnectPlayer(S2CDisconnectPlayer.SERVER_CLOSED))
+        self.broadcast(S2CDisconnectPlayer(S2CDisconnectPlayer.SERVER_CLOSED))
+        for c in list(self.open_connections):
             self.close_connection(c)
         self.quit = True
 
     def close_connection(self, conn: Connection, was_open: bool = True, shutdown: bool = True) -> None:
+        self.network.release(conn)
         conn.close(shutdown)
         if was_open:
             self.on_client_disconnect(conn)
         
-    def get_free_id(self) -> int:
-        id = 0
-        while True:
-            if len([c for c in self.open_connections if c.player_id == id]) == 0:
-                return id
-            id += 1
-
     def broadcast(self, packet: Packet) -> None:
-        for c in self.open_connections:
-            try:
-                self.send(c, packet)
-            except BrokenPipeError:
-                pass
-            except OSError as e:
-                if e.errno == 9:
-                    pass # client has disconnected but server hasn't caught up yet
-                else:
-                    raise e
+        self.broadcast_frame(Frame(packet))
+
+    def broadcast_frame(self, frame: Frame) -> None:
+        for c in list(self.open_connections):
+            self.network.send_frame(c, frame)
     
-    def recv(self, conn: Connection) -> Optional[bytes]:
-        header = conn.socket.recv(PacketHeader.HEADER_SIZE)
-        if not header:
+    def send(self, conn: Connection, packet: Packet) -> None:
+        self.network.send(conn, packet)
+
+#===== ABOVE THIS LINE IS NETWORK INTERNALS =====
+
+    def find_room(self, requested: int) -> Optional[Room]:
+        '''The room a client joins, creating it if needed. None when it is full or there's no room left'''
+        if requested == C2SHandshake.ROOM_AUTO:
+            # fill the busiest room with space first so fewer rooms are ticking
+            open_rooms = [r for r in self.rooms.values() if not r.is_full()]
+            if open_rooms:
+                return max(open_rooms, key=lambda r: len(r.connections))
+
+            free_ids = [id for id in range(Settings.max_rooms) if id not in self.rooms]
+            if not free_ids:
+                return None
+            requested = free_ids[0]
+
+        elif requested >= Settings.max_rooms:
             return None
 
-        packet_size = PacketHeader.get_packet_size(header)
+        room = self.rooms.get(requested)
+        if room is None:
+            room = Room(self, requested)
+            self.rooms[requested] = room
 
-        raw_packet = conn.socket.recv(packet_size)
-        if not raw_packet:
+        elif room.is_full():
             return None
-        
-        # printBytes(rawPacket)
-        return raw_packet
-    
-    def send(self, conn: Connection, packet: Packet) -> None:
-        PacketHeader.send_packet(conn.socket, packet)
 
-#===== ABOVE THIS LINE IS NETWORK INTERNALS =====
+        return room
 
     def on_client_join(self, conn: Connection) -> None:
-        id = self.get_free_id()
-        conn.open_connection(id)
+        assert conn.room is not None
         self.open_connections.append(conn)
-        self.send(conn, S2CSendID(id))
-
-        self.game.add_random_player(id)
-
-        self.broadcast(S2CPlayers(self.game.players))
+        conn.room.join(conn)
     
     def on_client_disconnect(self, conn: Connection) -> None:
         id = conn.player_id
@@ -190,45 +121,76 @@ class Server:
         if id == -1:
             print("Error removing client. connection was opened but ID wasn't set")
 
-        self.game.remove_player(id)
+        room = conn.room
+        assert room is not None
+        room.leave(conn)
 
-        self.broadcast(S2CPlayers(self.game.players))
+        if not room.connections:
+            del self.rooms[room.id]
 
     def main_loop(self) -> None:
-        '''Handles main game logic separate from network events'''
+        '''Runs game ticks and services the network in between them on a single thread'''
         while not self.quit:
-            tick_start = time.perf_counter_ns()
+            if not self.open_connections:
+                self.hibernate()
+                self.scheduler.reset()
+                continue
+
+            self.scheduler.run_due(self.run_tick)
+            self.scheduler.wait(self.network.poll)
 
-            self.game.update()
+        self.network.close()
 
-            tick_stop = time.perf_counter_ns()
-            time_remaining_ns = Settings.tick_time_ns - (tick_stop-tick_start)
+    def run_tick(self) -> None:
+        for room in list(self.rooms.values()):
+            room.game.update()
+        self.network.end_tick()
 
-            if time_remaining_ns > 0:
-                time.sleep(time_remaining_ns/1_000_000_000)
+    def hibernate(self) -> None:
+        '''Stops ticking while nobody is connected. Only a socket event, like
+        the next client connecting, or a console command wakes the loop'''
+        print("No players connected. Pausing game loop")
+        while not self.quit and not self.open_connections:
+            self.network.poll(None)
+
+        if not self.quit:
+            print("Player connected. Resuming game loop")
 
     def console_loop(self) -> None:
         '''Handles server console commands'''
         while not self.quit:
-            console_input: str = input().lower().strip()
+            try:
+                console_input: str = input().lower().strip()
+            except EOFError:
+                return # no console attached
 
             if console_input in ["q", "quit"]:
-                self.close_server()
+                self.network.call_soon(self.close_server)
 
             elif console_input in ["p", "players"]:
                 print("PLAYERS:")
-                for p in self.game.players:
-                    print(f"- {p}")
+                for room in list(self.rooms.values()):
+                    for p in room.game.players:
+                        print(f"- {room.id}: {p}")
 
-                if len(self.game.players) == 0:
+                if all(len(room.game.players) == 0 for room in list(self.rooms.values())):
                     print("empty")
 
             elif console_input in ["b", "bullets"]:
                 print("BULLETS:")
-                for b in self.game.bullets:
-                    print(f"- {b}")
+                for room in list(self.rooms.values()):
+                    for b in room.game.bullets:
+                        print(f"- {room.id}: {b}")
 
-                if len(self.game.bullets) == 0:
+                if all(len(room.game.bullets) == 0 for room in list(self.rooms.values())):
+                    print("empty")
+
+            elif console_input in ["r", "rooms"]:
+                print("ROOMS:")
+                for room in list(self.rooms.values()):
+                    print(f"- {room}")
+
+                if len(self.rooms) == 0:
                     print("empty")
 
             elif console_input in ["c", "connections"]:
@@ -239,51 +201,101 @@ class Server:
                 if len(self.open_connections) == 0:
                     print("empty")
 
+            elif console_input in ["l", "links"]:
+                print("LINKS:")
+                for c in list(self.open_connections):
+                    print(f"- {c}: {c.snapshot_rate}")
+
+                if len(self.open_connections) == 0:
+                    print("empty")
+
+            elif console_input in ["t", "ticks"]:
+                print(f"TICK {self.scheduler.tick}:")
+                print(f"- {self.scheduler.stats}")
+
+            elif console_input in ["n", "packets"]:
+                print("PACKETS:")
+                for id, count in self.packets.stats().items():
+                    print(f"- {id}: {count}")
+                print(f"- unknown: {self.packets.unknown}")
+
+            elif console_input in ["z", "compression"]:
+                print("COMPRESSION:")
+                print(f"- {self.network.compressor.stats}")
+
             elif console_input in ["k", "kick"]:
                 print("CLEARING")
-                for c in self.open_connections:
-                    self.broadcast(S2CDisconnectPlayer(S2CDisconnectPlayer.KICKED))
-                    self.close_connection(c)
-
-    def handle_packet(self, raw_packet: RawPacket) -> Optional[Exception]:
-        packet_type: int = Packet.decode_id(raw_packet.data)
+                self.network.call_soon(self.kick_all)
 
-        if packet_type == packet_ids.C2S_HANDSHAKE:
-            handshake_packet: C2SHandshake = C2SHandshake.decode_data(raw_packet.data)
+    def kick_all(self) -> None:
+        self.broadcast(S2CDisconnectPlayer(S2CDisconnectPlayer.KICKED))
+        for c in list(self.open_connections):
+            self.close_connection(c)
 
-            if not handshake_packet.isCorrect():
-                print("Error during handshake")
-                return ConnectionError()
-        
-        elif packet_type == packet_ids.C2S_PLAYER_REQUEST:
-            self.send(raw_packet.sender, S2CPlayers(self.game.players))
-        
-        elif packet_type == packet_ids.C2S_MOVEMENT_UPDATE:
-            movement_packet: C2SMovementUpdate = C2SMovementUpdate.decode_data(raw_packet.data)
+    def register_packet_handlers(self) -> None:
+        for packet_id, decoder, handler in (
+            (packet_ids.C2S_HANDSHAKE,         C2SHandshake.decode_data,         self.handle_handshake),
+            (packet_ids.C2S_PLAYER_REQUEST,    C2SRequestPlayerList.decode_data, self.in_room(self.handle_player_request)),
+            (packet_ids.C2S_MOVEMENT_UPDATE,   C2SMovementUpdate.decode_data,    self.in_room(self.handle_input)),
+            (packet_ids.C2S_CREATE_BULLET,     C2SCreateBullet.decode_data,      self.in_room(self.handle_input)),
+            (packet_ids.C2S_SNAPSHOT_ACK,      C2SSnapshotAck.decode_data,       self.in_room(self.handle_snapshot_ack)),
+            (packet_ids.C2S_CLIENT_DISCONNECT, C2SClientDisconnect.decode_data,  self.in_room(self.handle_client_disconnect)),
+        ):
+            self.packets.register(packet_id, decoder, handler)
 
-            player = self.game.get_player(raw_packet.sender.player_id)
-            if player is None:
-                print(f"Error! No player assosiated with connection: {raw_packet.sender}")
+    def handle_packet(self, raw_packet: RawPacket) -> Optional[Exception]:
+        return self.packets.dispatch(raw_packet.data, raw_packet.sender)
+
+    def in_room(self, handler: Callable[[Any, Connection, Room], Optional[Exception]]) -> Callable[[Any, Connection], Optional[Exception]]:
+        '''Wraps a handler for packets only sent after the handshake has put the sender in a room'''
+        def handle(packet: Any, sender: Connection) -> Optional[Exception]:
+            room = sender.room
+            if room is None:
+                print(f"Error! Connection isn't in a room: {sender}")
                 return LookupError()
-            
-            player.mov_dir = movement_packet.mov_dir
-        
-        elif packet_type == packet_ids.C2S_CREATE_BULLET:
-            bullet_packet: C2SCreateBullet = C2SCreateBullet.decode_data(raw_packet.data)
 
-            shooting_player = self.game.get_player(raw_packet.sender.player_id)
+            return handler(packet, sender, room)
 
-            if shooting_player is None:
-                print(f"Error! No player assosiated with connection: {raw_packet.sender}")
-                return LookupError()
+        return handle
 
-            self.game.bullets.append(CommonBullet(pos=shooting_player.pos.clone(), shoot_angle=bullet_packet.angle, shooter=shooting_player))
+    def handle_handshake(self, handshake_packet: C2SHandshake, sender: Connection) -> Optional[Exception]:
+        if not handshake_packet.isCorrect():
+            print("Error during handshake")
+            return ConnectionError()
 
-            self.broadcast(S2CBullets(self.game.bullets))
-        
-        elif packet_type == packet_ids.C2S_CLIENT_DISCONNECT:
-            self.close_connection(raw_packet.sender, shutdown=False)
+        if sender.room is not None:
+            print(f"Error! Connection already joined a room: {sender}")
+            return ConnectionError()
 
-        else:
-            print(f"Unknown packet (ID: {packet_type})")
+        room = self.find_room(handshake_packet.room)
+        if room is None:
+            print(f"Couldn't join room {handshake_packet.room}. It is full or there are no rooms left")
             return ConnectionError()
+
+        sender.capabilities = handshake_packet.capabilities & self.network.capabilities
+        sender.room = room
+        return None
+
+    def handle_player_request(self, _: C2SRequestPlayerList, sender: Connection, room: Room) -> Optional[Exception]:
+        self.network.send_frame(sender, room.players_frame())
+        return None
+
+    def handle_input(self, input_packet: Command, sender: Connection, room: Room) -> Optional[Exception]:
+        '''Movement and shooting are buffered and applied at the start of the next tick'''
+        commands = room.game.commands.get(sender.player_id)
+        if commands is None:
+            print(f"Error! No player assosiated with connection: {sender}")
+            return LookupError()
+
+        commands.push(input_packet.seq, input_packet)
+        return None
+
+    def handle_snapshot_ack(self, ack_packet: C2SSnapshotAck, sender: Connection, room: Room) -> Optional[Exception]:
+        rtt = sender.deltas.ack(ack_packet.seq)
+        if rtt is not None:
+            sender.snapshot_rate.record_rtt(rtt)
+        return None
+
+    def handle_client_disconnect(self, _: C2SClientDisconnect, sender: Connection, room: Room) -> Optional[Exception]:
+        self.close_connection(sender, shutdown=False)
+        return None
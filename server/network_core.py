@@ -0,0 +1,406 @@
+import collections
+import secrets
+import selectors
+import socket
+from typing import TYPE_CHECKING, Callable, Optional
+
+from common import capabilities, datagram, packet_ids
+from common.c2s_packets import C2SUdpBind
+from common.compression import Compressor
+from common.packet_base import Packet
+from common.packet_dispatch import DECODE_ERRORS, MalformedPacket
+from common.s2c_packets import S2CCompressed, S2CFailedHandshake, S2CHandshake, S2CUdpToken
+from common.stream_reader import FrameTooLarge
+from server.connection import Connection
+from server.frame_cache import Frame
+from server.outbox import SNAPSHOT_IDS
+from server.raw_packet import RawPacket
+from server.settings import Settings
+
+if TYPE_CHECKING:
+    from server.main import Server
+
+
+class NetworkCore:
+    '''Single threaded non-blocking network layer. Owns the listening socket,
+    the handshake and the framed reads and writes of every connection'''
+
+    def __init__(self, server: 'Server') -> None:
+        self.server: Server = server
+
+        self.selector: selectors.BaseSelector = selectors.DefaultSelector()
+        self.listener: Optional[socket.socket] = None
+
+        # lets other threads hand work to the network thread and wake it from select
+        self.waker_recv, self.waker_send = socket.socketpair()
+        self.waker_recv.setblocking(False)
+        self.waker_send.setblocking(False)
+        self.selector.register(self.waker_recv, selectors.EVENT_READ, data=None)
+
+        self.callbacks: collections.deque[Callable[[], None]] = collections.deque()
+
+        # connections with frames queued since the last flush, in insertion order
+        self.pending: dict[Connection, None] = {}
+
+        # optional datagram channel for snapshots and movement
+        self.udp: Optional[socket.socket] = None
+        self.udp_buffer: bytearray = bytearray(Settings.max_datagram_size)
+        self.udp_tokens: dict[int, Connection] = {}
+        self.udp_peers: dict[tuple[str, int], Connection] = {}
+        self.fragment_message: int = 0 # id of the next packet split into fragments
+
+        self.capabilities: int = 0 # offered to clients in the handshake
+
+        self.compressor: Compressor = Compressor(Settings.compression_level)
+        if Settings.compression:
+            self.capabilities |= capabilities.COMPRESSION
+
+    def listen(self, host: str, port: int) -> int:
+        '''Binds the listening socket and returns the port it was bound to'''
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen()
+        self.listener.setblocking(False)
+
+        self.selector.register(self.listener, selectors.EVENT_READ, data=self.listener)
+        port = self.listener.getsockname()[1]
+
+        if Settings.udp_enabled:
+            self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp.bind((host, port))
+            self.udp.setblocking(False)
+
+            self.selector.register(self.udp, selectors.EVENT_READ, data=self.udp)
+            self.capabilities |= capabilities.UDP
+
+        return port
+
+    def close(self) -> None:
+        if self.listener is not None:
+            self.selector.unregister(self.listener)
+            self.listener.close()
+            self.listener = None
+
+        if self.udp is not None:
+            self.selector.unregister(self.udp)
+            self.udp.close()
+            self.udp = None
+
+        self.selector.unregister(self.waker_recv)
+        self.waker_recv.close()
+        self.waker_send.close()
+        self.selector.close()
+
+    def call_soon(self, callback: Callable[[], None]) -> None:
+        '''Thread safe. Runs callback on the network thread during the next poll'''
+        self.callbacks.append(callback)
+        try:
+            self.waker_send.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass # waker already full so the loop will wake anyway
+
+    def poll(self, timeout: Optional[float]) -> None:
+        '''Waits up to timeout seconds for socket events and processes all that are ready'''
+        for key, mask in self.selector.select(timeout):
+            if key.data is None:
+                self._run_callbacks()
+
+            elif key.data is self.listener:
+                self._accept()
+
+            elif key.data is self.udp:
+                self._read_datagrams()
+
+            else:
+                conn: Connection = key.data
+                if mask & selectors.EVENT_READ:
+                    self._read(conn)
+                if mask & selectors.EVENT_WRITE and not conn.closed:
+                    self.flush(conn)
+
+        # replies to anything handled above go out straight away
+        self.flush_pending()
+
+    def _run_callbacks(self) -> None:
+        try:
+            while self.waker_recv.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        while self.callbacks:
+            self.callbacks.popleft()()
+
+    def _accept(self) -> None:
+        assert self.listener is not None
+
+        while True:
+            try:
+                sock, addr = self.listener.accept()
+            except BlockingIOError:
+                return
+
+            try:
+                sock.setblocking(False)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                if Settings.send_buffer_size is not None:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, Settings.send_buffer_size)
+            except OSError:
+                sock.close() # reset before it could be set up
+                continue
+
+            conn: Connection = Connection(sock, addr)
+
+            print(f"Connecting to: {addr}")
+
+            self.selector.register(sock, selectors.EVENT_READ, data=conn)
+            self.send(conn, S2CHandshake(capabilities=self.capabilities))
+
+    def release(self, conn: Connection) -> None:
+        '''Makes a last attempt to write anything queued then stops watching conn'''
+        self.pending.pop(conn, None)
+
+        self.udp_tokens.pop(conn.udp_token, None)
+        if conn.udp_addr is not None:
+            self.udp_peers.pop(conn.udp_addr, None)
+            conn.udp_addr = None
+
+        if not conn.closed:
+            try:
+                while conn.outbox:
+                    conn.outbox.write_to(conn.socket)
+            except OSError:
+                pass # whatever didn't fit is lost with the connection
+
+        try:
+            self.selector.unregister(conn.socket)
+        except (KeyError, ValueError):
+            pass # never registered or already gone
+
+#===== READING =====
+
+    def _read(self, conn: Connection) -> None:
+        try:
+            read = conn.reader.recv(conn.socket)
+        except BlockingIOError:
+            return
+        except ConnectionResetError:
+            read = 0
+        except FrameTooLarge as e:
+            print(f"Dropping {conn}: {e}")
+            self._drop(conn)
+            return
+        except OSError as e:
+            print("Network Error: ", e)
+            self._drop(conn)
+            return
+
+        if read == 0:
+            if conn.is_open:
+                print(f"Lost connection to peer")
+            else:
+                print(f"No response to handshake from peer: {conn.get_peer_name()}")
+            self._drop(conn)
+            return
+
+        try:
+            for frame in conn.reader.frames():
+                if conn.closed:
+                    break
+
+                if conn.is_open:
+                    error = self._handle(conn, frame)
+                    if isinstance(error, MalformedPacket):
+                        print(f"Dropping {conn}: {error}")
+                        self._drop(conn)
+                else:
+                    self._handshake(conn, frame)
+
+        except FrameTooLarge as e:
+            print(f"Dropping {conn}: {e}")
+            self._drop(conn)
+
+    def _handle(self, conn: Connection, frame: memoryview) -> Optional[Exception]:
+        '''Handles one packet from conn. Bad data from one peer comes back as
+        MalformedPacket rather than escaping and stopping the server'''
+        try:
+            return self.server.handle_packet(RawPacket(frame, conn))
+        except DECODE_ERRORS as e:
+            return MalformedPacket(Packet.decode_id(frame), e)
+
+    def _handshake(self, conn: Connection, frame: memoryview) -> None:
+        if Packet.decode_id(frame) != packet_ids.C2S_HANDSHAKE or self._handle(conn, frame) is not None:
+            print(f"Handshake failed (incorrect data recieved) when connecting to peer: {conn.get_peer_name()}")
+            self.send(conn, S2CFailedHandshake())
+            self.server.close_connection(conn, was_open=False)
+            return
+
+        print(f"Connection established to peer: {conn.get_peer_name()}")
+        self.server.on_client_join(conn)
+
+        if conn.capabilities & capabilities.UDP:
+            conn.udp_token = secrets.randbits(32)
+            self.udp_tokens[conn.udp_token] = conn
+            self.send(conn, S2CUdpToken(conn.udp_token))
+
+    def _read_datagrams(self) -> None:
+        assert self.udp is not None
+        view = memoryview(self.udp_buffer)
+
+        while True:
+            try:
+                size, addr = self.udp.recvfrom_into(self.udp_buffer)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                continue # e.g. ICMP port unreachable from a client that has gone
+
+            if size < datagram.SEQ_SIZE + packet_ids.packet_id_size:
+                continue
+
+            seq, data = datagram.split(view[:size])
+            packet_type = Packet.decode_id(data)
+
+            if packet_type == packet_ids.C2S_UDP_BIND:
+                if len(data) == C2SUdpBind.SIZE: # anyone can send these, so check before decoding
+                    self._bind_datagrams(C2SUdpBind.decode_data(data).token, addr)
+                continue
+
+            conn = self.udp_peers.get(addr)
+            if conn is None or conn.closed or packet_type not in datagram.UNRELIABLE_IDS:
+                continue
+
+            if not conn.udp_filter.accept(packet_type, seq):
+                continue # duplicate or arrived after a newer one
+
+            self._handle(conn, data) # malformed ones are dropped like lost ones
+
+    def _bind_datagrams(self, token: int, addr: tuple[str, int]) -> None:
+        conn = self.udp_tokens.get(token)
+        if conn is None or conn.closed:
+            return
+
+        if conn.udp_addr is not None:
+            self.udp_peers.pop(conn.udp_addr, None)
+
+        conn.udp_addr = addr
+        self.udp_peers[addr] = conn
+
+    def _drop(self, conn: Connection) -> None:
+        self.server.close_connection(conn, was_open=conn.is_open, shutdown=False)
+
+#===== WRITING =====
+
+    def send(self, conn: Connection, packet: Packet) -> None:
+        self.send_frame(conn, Frame(packet))
+
+    def send_frame(self, conn: Connection, frame: Frame) -> None:
+        '''Queues frame on the connection. It is written on the next flush.
+        Snapshots go straight out as datagrams when the client has bound UDP'''
+        if conn.closed:
+            return
+
+        if conn.capabilities & capabilities.COMPRESSION:
+            frame = self._compressed(frame)
+
+        if conn.udp_addr is not None and frame.packet_id in datagram.UNRELIABLE_IDS:
+            if frame.payload_size <= Settings.max_datagram_size - datagram.SEQ_SIZE:
+                self._send_datagram(conn, frame.payload)
+                return
+
+            fragments = self._fragments(frame)
+            if fragments:
+                for fragment in fragments:
+                    self._send_datagram(conn, fragment)
+                return
+
+        conn.outbox.push(frame)
+        self.pending[conn] = None
+
+    def _compressed(self, frame: Frame) -> Frame:
+        '''frame compressed, or frame itself when compressing doesn't make it smaller.
+        Like the frame, the compressed version is shared by every client'''
+        if frame.compressed is None:
+            frame.compressed = frame
+
+            if frame.packet_id in SNAPSHOT_IDS and frame.payload_size >= Settings.compression_min_size:
+                data = self.compressor.compress(frame.payload)
+                if packet_ids.packet_id_size + len(data) < frame.payload_size:
+                    frame.compressed = Frame(S2CCompressed(data), frame.packet_id)
+
+        return frame.compressed
+
+    def _fragments(self, frame: Frame) -> list[bytes]:
+        '''frame split to fit in datagrams. Empty if it shouldn't be'''
+        if frame.fragments is None:
+            chunk = Settings.max_datagram_size - datagram.SEQ_SIZE - datagram.FRAGMENT_OVERHEAD
+            if not Settings.fragment_datagrams or -(-frame.payload_size // chunk) > Settings.max_fragments:
+                frame.fragments = []
+            else:
+                frame.fragments = datagram.fragment(frame.payload, self.fragment_message, Settings.max_datagram_size - datagram.SEQ_SIZE)
+                self.fragment_message = (self.fragment_message + 1) % datagram.MESSAGE_MODULO
+
+        return frame.fragments
+
+    def _send_datagram(self, conn: Connection, payload: bytes) -> None:
+        assert self.udp is not None and conn.udp_addr is not None
+
+        conn.udp_seq = (conn.udp_seq + 1) % datagram.SEQ_MODULO
+        seq = datagram.encode_seq(conn.udp_seq)
+
+        try:
+            if hasattr(self.udp, "sendmsg"):
+                self.udp.sendmsg([seq, payload], [], 0, conn.udp_addr)
+            else:
+                self.udp.sendto(seq + payload, conn.udp_addr)
+        except OSError:
+            return # unreliable anyway. The next snapshot replaces it
+
+        conn.snapshot_rate.record_sent(len(seq) + len(payload))
+
+    def flush_pending(self) -> None:
+        while self.pending:
+            conn = next(iter(self.pending))
+            del self.pending[conn]
+
+            if not conn.closed:
+                self.flush(conn)
+
+    def end_tick(self) -> None:
+        '''Writes everything queued during the tick, slows snapshots to clients
+        that are falling behind and drops clients that can't keep up at all'''
+        self.flush_pending()
+
+        for conn in list(self.server.open_connections):
+            if not conn.outbox:
+                conn.behind_ticks = 0
+            else:
+                conn.behind_ticks += 1
+                if conn.outbox.is_over_limit() or conn.behind_ticks > Settings.max_behind_ticks:
+                    print(f"Disconnecting slow client {conn} ({conn.outbox.size} bytes queued for {conn.behind_ticks} ticks)")
+                    self.server.close_connection(conn)
+                    continue
+
+            if conn.snapshot_rate.update(self.server.tick, conn.outbox.size, conn.behind_ticks):
+                print(f"Snapshots to {conn} now {conn.snapshot_rate.hz:g} Hz")
+
+    def flush(self, conn: Connection) -> None:
+        '''Writes as much of the outbox as the socket will take without blocking'''
+        try:
+            while conn.outbox:
+                conn.snapshot_rate.record_sent(conn.outbox.write_to(conn.socket))
+        except BlockingIOError:
+            pass
+        except OSError:
+            # client has disconnected but server hasn't caught up yet
+            self._drop(conn)
+            return
+
+        events = selectors.EVENT_READ
+        if conn.outbox:
+            events |= selectors.EVENT_WRITE
+
+        if events != conn.selector_events:
+            conn.selector_events = events
+            self.selector.modify(conn.socket, events, data=conn)
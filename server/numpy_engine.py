@@ -0,0 +1,228 @@
+import sys
+from typing import TYPE_CHECKING, Optional
+
+if sys.version_info >= (3, 12):
+    from typing import override
+else:
+    from typing import Any, Callable, TypeVar
+
+    F = TypeVar("F", bound=Callable[..., Any])
+    def override(method: F, /) -> F:
+        return method
+
+import numpy as np
+
+from common.bullet import CommonBullet
+from common.player import CommonPlayer
+from server.bullet import ServerBullet
+from server.engine import Engine, StepResult
+from server.settings import Settings
+
+if TYPE_CHECKING:
+    from server.game_data import GameData
+
+# wire layouts of CommonPlayer.encode and CommonBullet.encode
+PLAYER_RECORD = CommonPlayer.RECORD.numpy_dtype()
+BULLET_RECORD = CommonBullet.RECORD.numpy_dtype()
+
+
+class NumpyEngine(Engine):
+    '''Keeps bullets in contiguous arrays and steps everything with whole
+    array operations. Players are few and their movement is set by packets
+    so they are gathered from their objects each step.
+
+    New player positions are written back to the objects so snapshots and
+    packet handlers don't need to know which engine is running. Bullet
+    objects work out their own positions from the same trajectory'''
+
+    def __init__(self, game: 'GameData') -> None:
+        super().__init__(game)
+
+        # same order as game.bullets
+        self.bullets: list[ServerBullet] = []
+        self.bullet_ids: np.ndarray = np.empty(0, dtype=np.int32)
+        self.bullet_origins: np.ndarray = np.empty((0, 2), dtype=np.int32)
+        self.bullet_spawn_ticks: np.ndarray = np.empty(0, dtype=np.int32)
+        self.bullet_vel: np.ndarray = np.empty((0, 2), dtype=np.int32)
+        self.bullet_owners: np.ndarray = np.empty(0, dtype=np.int32) # player id, -1 once the shooter has gone
+        self.bullet_rewinds: np.ndarray = np.empty(0, dtype=np.int32)
+
+        self.new_bullets: list[ServerBullet] = [] # appended to the arrays in one go
+
+        bounds = Settings.player_bounds
+        self.pos_min: np.ndarray = np.array([bounds.min.x, bounds.min.y], dtype=np.int32)
+        self.pos_max: np.ndarray = np.array([bounds.max.x, bounds.max.y], dtype=np.int32)
+
+    @override
+    def step(self, expired: set[int]) -> StepResult:
+        result = StepResult()
+        self._flush_new_bullets()
+
+        players = self.game.players.values()
+        player_pos = self._step_players(players, result)
+
+        if len(self.bullets) == 0:
+            return result
+
+        result.bullets_dirty = True
+        bullet_pos = self._bullet_positions()
+
+        if expired:
+            gone = np.isin(self.bullet_ids, np.fromiter(expired, dtype=np.int32, count=len(expired)))
+        else:
+            gone = np.zeros(len(self.bullets), dtype=bool)
+
+        if players:
+            # players by bullets. Sides of the player's square don't count, like Rect.contains
+            r = Settings.player_radius
+            target_x, target_y = self._targets(players, player_pos)
+            hits = (
+                (np.abs(bullet_pos[None, :, 0] - target_x) < r) &
+                (np.abs(bullet_pos[None, :, 1] - target_y) < r) &
+                ~gone[None, :] &
+                (self.bullet_owners[None, :] != np.array([p.id for p in players], dtype=np.int32)[:, None])
+            )
+
+            # resolve in player order so each bullet only hits once
+            for row in np.flatnonzero(hits.any(axis=1)).tolist():
+                candidates = np.flatnonzero(hits[row] & ~gone)
+                if len(candidates) == 0:
+                    continue
+
+                hit = candidates[np.argmin(self.bullet_ids[candidates])]
+                gone[hit] = True
+                result.killed_players.append(players[row].id)
+
+                result.players_dirty = True
+
+        result.gone_bullets = set(self.bullet_ids[gone].tolist())
+        return result
+
+    def _step_players(self, players: list[CommonPlayer], result: StepResult) -> np.ndarray:
+        '''Moves players and returns their new positions'''
+        if not players:
+            return np.empty((0, 2), dtype=np.int32)
+
+        dirs = np.array([(p.mov_dir.x, p.mov_dir.y) for p in players], dtype=np.int32)
+        pos = np.array([(p.pos.x, p.pos.y) for p in players], dtype=np.int32)
+
+        moving = dirs.any(axis=1)
+        if not moving.any():
+            return pos
+
+        result.players_dirty = True
+        speed = np.where(dirs.all(axis=1), Settings.player_diagonal_speed, Settings.player_speed).astype(np.int32)
+        velocity = dirs * speed[:, None]
+
+        pos[moving] = np.clip(pos[moving] + velocity[moving], self.pos_min, self.pos_max)
+
+        for player, (px, py) in zip(players, pos.tolist()):
+            player.pos.x = px
+            player.pos.y = py
+
+        return pos
+
+    def _targets(self, players: list[CommonPlayer], player_pos: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        '''x and y of the players each bullet is tested against, broadcastable to (players, bullets).
+        Rewound bullets are tested against where players were that many ticks ago'''
+        x, y = player_pos[:, None, 0], player_pos[:, None, 1]
+
+        rewinds = self.bullet_rewinds
+        if not rewinds.any():
+            return x, y
+
+        x = np.repeat(x, len(self.bullets), axis=1)
+        y = np.repeat(y, len(self.bullets), axis=1)
+
+        tick = self.game.current_tick()
+        for rewind in np.unique(rewinds[rewinds > 0]).tolist():
+            past = self._past_positions(players, tick - rewind)
+            columns = rewinds == rewind
+            x[:, columns] = past[:, 0:1]
+            y[:, columns] = past[:, 1:2]
+
+        return x, y
+
+    def _past_positions(self, players: list[CommonPlayer], tick: int) -> np.ndarray:
+        '''Where players were at tick. Ones that weren't there are put out of reach of every bullet'''
+        unseen = -4 * Settings.player_radius
+        past = np.full((len(players), 2), unseen, dtype=np.int32)
+
+        for i, player in enumerate(players):
+            then = self.game.history.position(player.id, tick)
+            if then is not None:
+                past[i] = then
+
+        return past
+
+    def _bullet_positions(self) -> np.ndarray:
+        age = self.game.current_tick() - self.bullet_spawn_ticks
+        return self.bullet_origins + self.bullet_vel * age[:, None]
+
+    def _flush_new_bullets(self) -> None:
+        if not self.new_bullets:
+            return
+
+        owners: list[int] = []
+        for bullet in self.new_bullets:
+            owner = bullet.owner
+            owners.append(owner.id if owner is not None and self.game.players.get(owner.id) is owner else -1)
+
+        self.bullets.extend(self.new_bullets)
+        self.bullet_ids = np.concatenate((self.bullet_ids, np.array([b.id for b in self.new_bullets], dtype=np.int32)))
+        self.bullet_origins = np.concatenate((self.bullet_origins, np.array([(b.origin.x, b.origin.y) for b in self.new_bullets], dtype=np.int32)))
+        self.bullet_spawn_ticks = np.concatenate((self.bullet_spawn_ticks, np.array([b.spawn_tick for b in self.new_bullets], dtype=np.int32)))
+        self.bullet_vel = np.concatenate((self.bullet_vel, np.array([b.velocity for b in self.new_bullets], dtype=np.int32)))
+        self.bullet_owners = np.concatenate((self.bullet_owners, np.array(owners, dtype=np.int32)))
+        self.bullet_rewinds = np.concatenate((self.bullet_rewinds, np.array([b.rewind for b in self.new_bullets], dtype=np.int32)))
+
+        self.new_bullets.clear()
+
+    @override
+    def add_bullet(self, bullet: ServerBullet) -> None:
+        self.new_bullets.append(bullet)
+
+    @override
+    def remove_bullets(self, bullet_ids: set[int]) -> None:
+        self._flush_new_bullets()
+
+        keep = ~np.isin(self.bullet_ids, np.fromiter(bullet_ids, dtype=np.int32, count=len(bullet_ids)))
+
+        self.bullets = [b for b, k in zip(self.bullets, keep.tolist()) if k]
+        self.bullet_ids = self.bullet_ids[keep]
+        self.bullet_origins = self.bullet_origins[keep]
+        self.bullet_spawn_ticks = self.bullet_spawn_ticks[keep]
+        self.bullet_vel = self.bullet_vel[keep]
+        self.bullet_owners = self.bullet_owners[keep]
+        self.bullet_rewinds = self.bullet_rewinds[keep]
+
+    @override
+    def remove_player(self, player_id: int) -> None:
+        # a new player could be given the same id
+        self.bullet_owners[self.bullet_owners == player_id] = -1
+
+    @override
+    def encode_players(self) -> Optional[bytes]:
+        players = self.game.players.values()
+
+        records = np.empty(len(players), dtype=PLAYER_RECORD)
+        records["id"] = [p.id for p in players]
+        records["x"] = [p.pos.x for p in players]
+        records["y"] = [p.pos.y for p in players]
+        records["r"] = [p.color.r for p in players]
+        records["g"] = [p.color.g for p in players]
+        records["b"] = [p.color.b for p in players]
+
+        return records.tobytes()
+
+    @override
+    def encode_bullets(self) -> Optional[bytes]:
+        self._flush_new_bullets()
+
+        bullet_pos = self._bullet_positions()
+
+        records = np.empty(len(self.bullets), dtype=BULLET_RECORD)
+        records["x"] = bullet_pos[:, 0]
+        records["y"] = bullet_pos[:, 1]
+
+        return records.tobytes()
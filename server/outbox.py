@@ -0,0 +1,92 @@
+import collections
+import socket
+
+from common import packet_ids
+from server.frame_cache import Frame
+
+# snapshots replace any older unsent snapshot of the same type
+SNAPSHOT_IDS: frozenset[int] = frozenset((
+    packet_ids.S2C_PLAYERS,
+    packet_ids.S2C_BULLETS,
+    packet_ids.S2C_WORLD_DELTA, # always relative to an acknowledged state so safe to skip
+    packet_ids.S2C_INPUT_ACK,
+))
+
+MAX_BUFFERS_PER_WRITE: int = 512 # stays well under IOV_MAX
+
+
+class Outbox:
+    '''Bounded queue of encoded frames waiting to be written to one connection'''
+
+    def __init__(self, limit_bytes: int) -> None:
+        self.limit_bytes: int = limit_bytes
+
+        self.frames: collections.deque[Frame] = collections.deque()
+        self.head_offset: int = 0 # bytes of the first frame already written
+        self.size: int = 0
+
+        self.dropped: int = 0
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def is_over_limit(self) -> bool:
+        return self.size > self.limit_bytes
+
+    def push(self, frame: Frame) -> None:
+        if frame.packet_id in SNAPSHOT_IDS:
+            self._drop_stale(frame.packet_id)
+
+        self.frames.append(frame)
+        self.size += frame.size
+
+    def _drop_stale(self, packet_id: int) -> None:
+        for i, queued in enumerate(self.frames):
+            if queued.packet_id != packet_id:
+                continue
+
+            if i == 0 and self.head_offset:
+                continue # already partly on the wire
+
+            del self.frames[i]
+            self.size -= queued.size
+            self.dropped += 1
+            return
+
+    def write_to(self, conn: socket.socket) -> int:
+        '''Writes as many queued frames as possible in a single syscall.
+        Raises BlockingIOError if the socket can't take anything'''
+        if not self.frames:
+            return 0
+
+        # header and payload go out as separate buffers so shared frames are never copied
+        buffers: list[memoryview] = []
+        skip = self.head_offset
+        for frame in self.frames:
+            for part in (frame.header, frame.payload):
+                if skip >= len(part):
+                    skip -= len(part)
+                    continue
+
+                buffers.append(memoryview(part)[skip:])
+                skip = 0
+
+            if len(buffers) >= MAX_BUFFERS_PER_WRITE:
+                break
+
+        if hasattr(conn, "sendmsg"):
+            sent = conn.sendmsg(buffers)
+        else:
+            sent = conn.send(b"".join(buffers))
+
+        self._consume(sent)
+        return sent
+
+    def _consume(self, sent: int) -> None:
+        self.size -= sent
+
+        sent += self.head_offset
+        while self.frames and sent >= self.frames[0].size:
+            sent -= self.frames.popleft().size
+
+        self.head_offset = sent
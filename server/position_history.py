@@ -0,0 +1,57 @@
+from array import array
+from typing import Iterable, Optional
+
+from common.player import CommonPlayer
+
+ABSENT: int = 0xFFFF # x of a player id nobody had on that tick. Positions are never this big
+
+
+class PositionHistory:
+    '''Where every player was on each of the last few ticks, so a shot can
+    be tested against the world its shooter saw rather than the current
+    one. A ring with one array per tick of x, y pairs indexed by player id,
+    4 bytes per player per tick'''
+
+    def __init__(self, ticks: int) -> None:
+        self.ticks: int = ticks
+        self.positions: list[array] = [array("H") for _ in range(ticks)]
+        self.recorded: list[int] = [-1] * ticks # tick each slot holds
+
+    def record(self, tick: int, players: Iterable[CommonPlayer]) -> None:
+        players = list(players)
+        size = 2 * (max((p.id for p in players), default=-1) + 1)
+
+        slot = tick % self.ticks
+        positions = self.positions[slot]
+        if len(positions) != size:
+            positions = self.positions[slot] = array("H", bytes(2*size))
+
+        positions[0::2] = array("H", [ABSENT]) * (size // 2)
+        for p in players:
+            positions[2*p.id] = p.pos.x
+            positions[2*p.id + 1] = p.pos.y
+
+        self.recorded[slot] = tick
+
+    def forget(self, player_id: int) -> None:
+        '''Marks the player absent on every tick held. Ids are reused, so a new player mustn't inherit the last one's past'''
+        i = 2 * player_id
+        for positions in self.positions:
+            if i < len(positions):
+                positions[i] = ABSENT
+
+    def position(self, player_id: int, tick: int) -> Optional[tuple[int, int]]:
+        '''Where the player was at tick. None if it wasn't in the game then, or tick isn't in the history'''
+        slot = tick % self.ticks
+        if self.recorded[slot] != tick:
+            return None
+
+        positions = self.positions[slot]
+        i = 2 * player_id
+        if i >= len(positions) or positions[i] == ABSENT:
+            return None
+
+        return positions[i], positions[i + 1]
+
+    def size_bytes(self) -> int:
+        return sum(len(positions) * positions.itemsize for positions in self.positions)
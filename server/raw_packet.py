@@ -2,6 +2,6 @@ from server.connection import Connection
 
 
 class RawPacket:
-    def __init__(self, data: bytes, sender: Connection) -> None:
-        self.data: bytes = data
+    def __init__(self, data: memoryview, sender: Connection) -> None:
+        self.data: memoryview = data
         self.sender: Connection = sender
@@ -0,0 +1,67 @@
+from typing import Generic, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class IdAllocator:
+    '''Hands out ids below limit. Released ids go on a free list and are reused before new ones'''
+
+    def __init__(self, limit: int) -> None:
+        self.limit: int = limit
+        self.next_id: int = 0
+        self.free_ids: list[int] = []
+
+    def allocate(self) -> int:
+        '''-1 when every id is in use'''
+        if self.free_ids:
+            return self.free_ids.pop()
+
+        if self.next_id >= self.limit:
+            return -1
+
+        id = self.next_id
+        self.next_id += 1
+        return id
+
+    def release(self, id: int) -> None:
+        self.free_ids.append(id)
+
+
+class Registry(Generic[T]):
+    '''Objects indexed by id.
+
+    Iterating goes over a snapshot list that is only rebuilt after the
+    registry changes, so loops that add or remove entries are safe and
+    broadcasting every tick doesn't copy the whole set'''
+
+    def __init__(self) -> None:
+        self.items: dict[int, T] = {}
+        self.snapshot: Optional[list[T]] = None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, id: int) -> bool:
+        return id in self.items
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.values())
+
+    def get(self, id: int) -> Optional[T]:
+        return self.items.get(id)
+
+    def add(self, id: int, item: T) -> None:
+        self.items[id] = item
+        self.snapshot = None
+
+    def remove(self, id: int) -> Optional[T]:
+        item = self.items.pop(id, None)
+        if item is not None:
+            self.snapshot = None
+        return item
+
+    def values(self) -> list[T]:
+        '''Shared between callers until the next change so it must not be modified'''
+        if self.snapshot is None:
+            self.snapshot = list(self.items.values())
+        return self.snapshot
@@ -0,0 +1,149 @@
+from typing import TYPE_CHECKING
+
+from common import packet_ids
+from common.packet_base import Packet
+from common.s2c_packets import S2CBullets, S2CInputAck, S2CPlayers, S2CSendID
+from server.connection import Connection
+from server.frame_cache import Frame, FrameCache
+from common.player import CommonPlayer
+from server.game_data import GameData
+from server.registry import IdAllocator, Registry
+from server.settings import Settings
+from server.snapshots import WorldState
+
+if TYPE_CHECKING:
+    from server.main import Server
+
+class Room:
+    '''One match. Rooms share the server's network core and tick scheduler
+    but have their own players, bullets and broadcast scope'''
+
+    def __init__(self, server: 'Server', id: int) -> None:
+        self.server: Server = server
+        self.id: int = id
+
+        self.connections: Registry[Connection] = Registry() # by player id
+        self.player_ids: IdAllocator = IdAllocator(1 << (8*CommonPlayer.ID_SIZE))
+        self.frame_cache: FrameCache = FrameCache()
+
+        self.game: GameData = GameData(self)
+
+    def __str__(self) -> str:
+        return f"Room[id= {self.id}, players= {len(self.connections)}/{self.capacity}, bullets= {len(self.game.bullets)}]"
+
+    @property
+    def tick(self) -> int:
+        return self.server.tick
+
+    @property
+    def capacity(self) -> int:
+        '''Settings.room_capacity, but never more than there are player ids'''
+        if Settings.room_capacity is None:
+            return self.player_ids.limit
+        return min(Settings.room_capacity, self.player_ids.limit)
+
+    def is_full(self) -> bool:
+        return len(self.connections) >= self.capacity
+
+    def close_connection(self, conn: Connection) -> None:
+        self.server.close_connection(conn)
+
+    def broadcast(self, packet: Packet) -> None:
+        self.broadcast_frame(Frame(packet))
+
+    def broadcast_frame(self, frame: Frame) -> None:
+        for c in self.connections:
+            self.server.network.send_frame(c, frame)
+
+    def send(self, conn: Connection, packet: Packet) -> None:
+        self.server.network.send(conn, packet)
+
+    def players_frame(self) -> Frame:
+        return self.frame_cache.get(self.tick, packet_ids.S2C_PLAYERS, lambda: S2CPlayers(self.game.players.values(), self.game.engine.encode_players(), self.tick))
+
+    def view_for(self, conn: Connection, state: WorldState) -> WorldState:
+        '''The part of the world conn's player can see'''
+        if not Settings.interest_management:
+            return state
+
+        player = state.players.get(conn.player_id)
+        if player is None:
+            return state
+
+        return state.view(self.game.grid.area_around(player.pos, Settings.view_radius))
+
+    def send_world_snapshots(self, state: WorldState, players: bool, bullets: bool) -> None:
+        '''Sends each client full snapshots of what it can see. Changes are held
+        for clients on slower snapshot rates until they're next due'''
+        for c in self.connections:
+            rate = c.snapshot_rate
+            rate.players_unsent |= players
+            rate.bullets_unsent |= bullets
+            if not rate.is_due(self.tick) or not (rate.players_unsent or rate.bullets_unsent):
+                continue
+
+            view: WorldState = self.view_for(c, state)
+
+            if rate.players_unsent:
+                self.server.network.send_frame(c, self.frame_cache.get(self.tick, (packet_ids.S2C_PLAYERS, view.key), lambda: S2CPlayers(list(view.players.values()), b"".join(view.player_records.values()), view.tick)))
+            if rate.bullets_unsent:
+                self.server.network.send_frame(c, self.frame_cache.get(self.tick, (packet_ids.S2C_BULLETS, view.key), lambda: S2CBullets(list(view.bullets.values()), b"".join(view.bullet_records.values()), view.tick)))
+            rate.players_unsent = rate.bullets_unsent = False
+
+    def send_world_deltas(self, state: WorldState) -> None:
+        '''Sends each client that's due one the changes to what they can see since the last state it acknowledged.
+        Clients that see the same cells from the same baseline share the encoded delta'''
+        for c in self.connections:
+            if not c.snapshot_rate.is_due(self.tick):
+                continue
+
+            view: WorldState = self.view_for(c, state)
+            if not c.deltas.needs_update(view, reliable=c.udp_addr is None):
+                continue
+
+            baseline: WorldState = c.deltas.baseline
+            frame = self.frame_cache.get(self.tick, (packet_ids.S2C_WORLD_DELTA, view.key, baseline.key), lambda: view.delta_from(baseline))
+
+            self.server.network.send_frame(c, frame)
+            c.deltas.record_sent(view)
+
+    def send_input_acks(self) -> None:
+        '''Tells each client which of its inputs have been applied and where that left its player,
+        so it can correct its prediction. Sent while either changes, then repeated a few times'''
+        for c in self.connections:
+            player = self.game.players.get(c.player_id)
+            if player is None or not c.snapshot_rate.is_due(self.tick):
+                continue
+
+            commands = self.game.commands[c.player_id]
+            ack = (commands.last_seq, player.pos.x, player.pos.y)
+
+            if ack != c.input_ack:
+                c.input_ack = ack
+                c.input_ack_repeats = Settings.input_ack_redundancy
+            elif c.input_ack_repeats > 0:
+                c.input_ack_repeats -= 1
+            else:
+                continue
+
+            self.send(c, S2CInputAck(commands.last_seq, commands.steps_since_applied(self.tick), player.pos.clone()))
+
+    def join(self, conn: Connection) -> None:
+        id = self.player_ids.allocate()
+        conn.open_connection(id)
+        conn.room = self
+        self.connections.add(id, conn)
+        self.send(conn, S2CSendID(id))
+
+        self.game.add_random_player(id)
+
+        if not Settings.delta_snapshots:
+            self.broadcast_frame(self.players_frame())
+
+    def leave(self, conn: Connection) -> None:
+        self.connections.remove(conn.player_id)
+        self.game.remove_player(conn.player_id)
+        self.player_ids.release(conn.player_id)
+
+        if not Settings.delta_snapshots:
+            self.broadcast_frame(self.players_frame())
@@ -1,19 +1,80 @@
+from typing import Optional
+
+from common import movement
 from common.data_types import Rect, Vec2D
 
 
 class Settings:
-    tps: int = 60
+    tps: int = movement.TPS
     tick_time_ns: int = 1_000_000_000 // tps
+    max_catch_up_ticks: int = 5 # ticks run back to back after a stall before the rest are skipped
+    tick_spin_ns: int = 500_000 # busy wait this close to a deadline rather than sleeping past it
+
+    engine: str = "objects" # "numpy" steps entities with array operations, for big rooms. Needs numpy
+
+    # rooms. Everyone shares one arena unless max_rooms is raised to split players between rooms
+    max_rooms: int = 1
+    room_capacity: Optional[int] = None # players per room. None fits as many as there are player ids for
 
     # worldSize
-    world_width: int = 1600
-    world_height: int = 900
+    world_width: int = movement.WORLD_WIDTH
+    world_height: int = movement.WORLD_HEIGHT
 
     world_rect: Rect = Rect(Vec2D(0, 0), Vec2D(world_width, world_height))
 
-    # player
-    player_radius: int = 50
-    player_speed: int = 3
+    # player. Clients predict their own movement, so these are shared with them
+    player_radius: int = movement.PLAYER_RADIUS
+    player_speed: int = movement.PLAYER_SPEED
+    player_diagonal_speed: int = movement.PLAYER_DIAGONAL_SPEED
+
+    player_bounds: Rect = movement.PLAYER_BOUNDS # where the player's centre can be
+
+    # bullet. Clients move bullets along from where they were fired, so this is shared with them
+    bullet_speed: int = movement.BULLET_SPEED
+
+    # lag compensation. Shots are tested against players where the shooter saw them, this many ticks back at most.
+    # 0 turns it off
+    max_rewind_ticks: int = tps // 4
+
+    collision_cell_size: int = 2 * player_radius # players overlap at most 4 cells
+
+    # interest management
+    interest_management: bool = True # only send clients what is near their player
+    interest_cell_size: int = 200
+    view_radius: int = max(world_width, world_height) # sees the whole default arena
+
+    # network
+    recv_buffer_size: int = 4096 # grows on demand for larger frames
+    max_client_frame_size: int = 4096 # clients only send small packets. Bigger frames disconnect them
+    send_buffer_size: Optional[int] = None # SO_SNDBUF. None keeps the OS default
+
+    # snapshots are sent less often than the world is stepped. Clients draw between them
+    snapshot_rate: int = 30 # per second
+    snapshot_interval: int = max(1, tps // snapshot_rate) # in ticks
+
+    # each client is sent them at the fastest of these intervals it keeps up with
+    snapshot_intervals: tuple[int, ...] = (snapshot_interval, 2 * snapshot_interval, 4 * snapshot_interval)
+    rate_backlog_bytes: int = 16 * 1024 # queued in a client's outbox at the end of a tick
+    rate_behind_ticks: int = 3 # ticks in a row a client can have unsent data
+    rate_max_queue_delay: float = 0.1 # seconds snapshot round trips can grow by, as the link queues them
+    rate_settle_ticks: int = tps // 2 # after changing a client's rate, before judging it again
+    rate_recovery_ticks: int = tps * 2 # good ticks before trying a faster rate
+    rate_max_recovery_ticks: int = tps * 16 # doubled up to this when a faster rate keeps failing
+
+    max_buffered_inputs: int = 64 # per player, between two ticks
+    input_ack_redundancy: int = 2 # ticks an input ack is repeated once it stops changing, in case it was lost
+
+    delta_snapshots: bool = True # send changes against the client's last acknowledged state
+    snapshot_history: int = 64 # unacknowledged snapshots kept per client before falling back to a full one
+
+    udp_enabled: bool = True # offer clients an unreliable channel on the same port for snapshots
+    max_datagram_size: int = 1400 # bigger snapshots are split into fragments
+    fragment_datagrams: bool = True # False sends snapshots that don't fit in a datagram over TCP instead
+    max_fragments: int = 64 # snapshots needing more go over TCP, as losing any fragment loses the snapshot
+
+    compression: bool = True # offer clients zlib compressed snapshots
+    compression_level: int = 1 # higher levels cost a lot more CPU for little gain on snapshots
+    compression_min_size: int = 512 # smaller frames are sent as they are
 
-    #bullet
-    bullet_speed: int = 10
+    outbox_limit_bytes: int = 256 * 1024
+    max_behind_ticks: int = tps * 2 # ticks a client can have unsent data before being dropped
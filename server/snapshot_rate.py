@@ -0,0 +1,105 @@
+from typing import Optional
+
+from server.settings import Settings
+
+RTT_GAIN: float = 1 / 8 # weight of each new round trip in the smoothed one
+MIN_RTT_DRIFT: float = 1 / 1024 # lets the quietest round trip rise, over tens of seconds of acks, in case the route changed
+
+
+class SnapshotRate:
+    '''How often one client is sent snapshots, chosen from how well it keeps
+    up. Starts at the fastest of Settings.snapshot_intervals and drops to
+    the next slower one while the client's outbox backs up, or its round
+    trips grow as the link queues. After a run of good ticks the next faster
+    rate is tried again. If that fails soon after, the wait before the next
+    try doubles, so a link that can't take it isn't flooded every few seconds'''
+
+    def __init__(self) -> None:
+        self.level: int = 0 # index into Settings.snapshot_intervals
+
+        self.rtt: Optional[float] = None # seconds, from snapshot acks, smoothed
+        self.min_rtt: Optional[float] = None
+
+        self.sent_bytes: int = 0 # so far this second
+        self.throughput: int = 0 # bytes per second, over the last whole second
+        self.backlog: int = 0    # bytes in the outbox at the end of the last tick
+
+        self.good_ticks: int = 0
+        self.recovery_ticks: int = Settings.rate_recovery_ticks
+        self.settle_until: int = 0 # the last change is given time to take effect
+        self.last_raise: int = -1
+
+        # what changed since this client's last plain snapshot. Deltas work it out for themselves
+        self.players_unsent: bool = False
+        self.bullets_unsent: bool = False
+
+    def __str__(self) -> str:
+        rtt = "?" if self.rtt is None else f"{self.rtt*1000:.0f}ms"
+        return f"SnapshotRate[rate= {self.hz:g}Hz, rtt= {rtt}, queueing= {self.queue_delay()*1000:.0f}ms, throughput= {self.throughput/1024:.1f}KiB/s, backlog= {self.backlog}B]"
+
+    @property
+    def interval(self) -> int:
+        return Settings.snapshot_intervals[self.level]
+
+    @property
+    def hz(self) -> float:
+        return Settings.tps / self.interval
+
+    def is_due(self, tick: int) -> bool:
+        return tick % self.interval == 0
+
+    def record_sent(self, size: int) -> None:
+        self.sent_bytes += size
+
+    def record_rtt(self, rtt: float) -> None:
+        if self.rtt is None or self.min_rtt is None:
+            self.rtt = self.min_rtt = rtt
+            return
+
+        self.rtt += (rtt - self.rtt) * RTT_GAIN
+        self.min_rtt = min(rtt, self.min_rtt + (rtt - self.min_rtt) * MIN_RTT_DRIFT)
+
+    def queue_delay(self) -> float:
+        '''How much longer round trips are taking than the quietest one seen'''
+        if self.rtt is None or self.min_rtt is None:
+            return 0
+
+        return max(0, self.rtt - self.min_rtt)
+
+    def is_congested(self, behind_ticks: int) -> bool:
+        return (
+            self.backlog > Settings.rate_backlog_bytes or
+            behind_ticks > Settings.rate_behind_ticks or
+            self.queue_delay() > Settings.rate_max_queue_delay
+        )
+
+    def update(self, tick: int, backlog: int, behind_ticks: int) -> bool:
+        '''Called at the end of every tick. True if the rate changed'''
+        if tick % Settings.tps == 0:
+            self.throughput, self.sent_bytes = self.sent_bytes, 0
+        self.backlog = backlog
+
+        if tick < self.settle_until:
+            return False
+
+        if self.is_congested(behind_ticks):
+            self.good_ticks = 0
+            if self.level == len(Settings.snapshot_intervals) - 1:
+                return False
+
+            if self.last_raise != -1 and tick - self.last_raise < self.recovery_ticks:
+                self.recovery_ticks = min(2 * self.recovery_ticks, Settings.rate_max_recovery_ticks)
+
+            self.level += 1
+            self.settle_until = tick + Settings.rate_settle_ticks
+            return True
+
+        self.good_ticks += 1
+        if self.level == 0 or self.good_ticks < self.recovery_ticks:
+            return False
+
+        self.level -= 1
+        self.good_ticks = 0
+        self.last_raise = tick
+        self.settle_until = tick + Settings.rate_settle_ticks
+        return True
@@ -0,0 +1,138 @@
+import time
+from typing import Optional
+
+from common.bullet import CommonBullet
+from common.player import CommonPlayer
+from common.s2c_packets import S2CWorldDelta
+from server.settings import Settings
+from server.spatial_grid import Area, SpatialGrid
+
+
+def split_records(entities: list, encoded: bytes, size: int) -> dict[int, bytes]:
+    '''Records encoded back to back in the same order as entities, by entity id'''
+    return {e.id: encoded[i*size:(i+1)*size] for i, e in enumerate(entities)}
+
+
+class WorldState:
+    '''Encoded entities at one tick. Deltas are worked out by comparing the
+    records of two states so each entity is only encoded once per tick.
+
+    An engine that encodes every entity at once passes its payloads in,
+    otherwise each entity encodes itself.
+
+    Bullets are matched between states by object rather than by record, as
+    deltas send them when they're fired and not as they move. States only
+    used for deltas can skip encoding bullet positions altogether'''
+
+    def __init__(self, tick: int, players: list[CommonPlayer], bullets: list[CommonBullet], grid: Optional[SpatialGrid] = None, encoded_players: Optional[bytes] = None, encoded_bullets: Optional[bytes] = None, bullet_positions: bool = True) -> None:
+        self.tick: int = tick
+        self.area: Optional[Area] = None # None covers the whole world
+        self.bullet_positions: bool = bullet_positions
+
+        self.players: dict[int, CommonPlayer] = {p.id: p for p in players}
+        self.player_records: dict[int, bytes] = (
+            {p.id: p.encode() for p in players} if encoded_players is None
+            else split_records(players, encoded_players, CommonPlayer.ENCODED_SIZE)
+        )
+
+        self.bullets: dict[int, CommonBullet] = {b.id: b for b in bullets}
+        self.bullet_records: dict[int, bytes] = (
+            {} if not bullet_positions
+            else {b.id: b.encode() for b in bullets} if encoded_bullets is None
+            else split_records(bullets, encoded_bullets, CommonBullet.ENCODED_SIZE)
+        )
+
+        # entity ids by grid cell, used to cut out views
+        self.grid: Optional[SpatialGrid] = grid
+        self.player_cells: dict[int, list[int]] = {}
+        self.bullet_cells: dict[int, list[int]] = {}
+        if grid is not None:
+            for p in players:
+                self.player_cells.setdefault(grid.cell_of(p.pos), []).append(p.id)
+            for b in bullets:
+                self.bullet_cells.setdefault(grid.cell_of(b.pos), []).append(b.id)
+
+        self.views: dict[Area, WorldState] = {}
+
+    @property
+    def key(self) -> tuple[int, Optional[Area]]:
+        return (self.tick, self.area)
+
+    def view(self, area: Area) -> 'WorldState':
+        '''The part of this state inside area. Built once and shared by every client looking at the same cells'''
+        view = self.views.get(area)
+        if view is not None:
+            return view
+
+        assert self.grid is not None
+        view = WorldState(self.tick, [], [], bullet_positions=self.bullet_positions)
+        view.area = area
+
+        for cell in self.grid.cells_in(area):
+            for id in self.player_cells.get(cell, ()):
+                view.players[id] = self.players[id]
+                view.player_records[id] = self.player_records[id]
+
+            for id in self.bullet_cells.get(cell, ()):
+                view.bullets[id] = self.bullets[id]
+                if self.bullet_positions:
+                    view.bullet_records[id] = self.bullet_records[id]
+
+        self.views[area] = view
+        return view
+
+    def delta_from(self, baseline: 'WorldState') -> S2CWorldDelta:
+        players: list[CommonPlayer] = [
+            self.players[id] for id, record in self.player_records.items()
+            if baseline.player_records.get(id) != record
+        ]
+        removed_players: list[int] = [id for id in baseline.player_records if id not in self.player_records]
+
+        # ids are reused, so a different bullet under the same id is sent as new
+        bullets: list[CommonBullet] = [bullet for id, bullet in self.bullets.items() if baseline.bullets.get(id) is not bullet]
+        removed_bullets: list[int] = [id for id in baseline.bullets if id not in self.bullets]
+
+        return S2CWorldDelta(self.tick, baseline.tick, players, removed_players, bullets, removed_bullets)
+
+EMPTY_WORLD: WorldState = WorldState(S2CWorldDelta.NO_BASELINE, [], [])
+
+
+class DeltaTracker:
+    '''Per connection history of the states sent and the newest one the client has acknowledged'''
+
+    def __init__(self) -> None:
+        self.baseline: WorldState = EMPTY_WORLD
+        self.sent: dict[int, WorldState] = {}
+        self.sent_at: dict[int, float] = {} # when each state was first sent, to time its ack
+        self.last_sent: Optional[WorldState] = None
+
+    def needs_update(self, state: WorldState, reliable: bool = True) -> bool:
+        if state is not self.last_sent:
+            return True
+
+        # datagrams can be lost so keep sending until the client has the state
+        return not reliable and self.baseline is not state
+
+    def record_sent(self, state: WorldState) -> None:
+        self.sent[state.tick] = state
+        self.sent_at.setdefault(state.tick, time.perf_counter())
+        self.last_sent = state
+
+        if len(self.sent) > Settings.snapshot_history:
+            # client isn't acknowledging so start again from a full snapshot
+            self.baseline = EMPTY_WORLD
+            self.sent.clear()
+            self.sent_at.clear()
+
+    def ack(self, seq: int) -> Optional[float]:
+        '''Seconds since the acknowledged state was first sent. None if it was already superseded'''
+        state = self.sent.get(seq)
+        if state is None:
+            return None
+
+        rtt = time.perf_counter() - self.sent_at[seq]
+
+        self.baseline = state
+        self.sent = {tick: s for tick, s in self.sent.items() if tick > seq}
+        self.sent_at = {tick: t for tick, t in self.sent_at.items() if tick > seq}
+        return rtt
@@ -0,0 +1,87 @@
+import math
+
+from common.data_types import Rect, Vec2D
+
+# inclusive range of cells (min column, min row, max column, max row)
+Area = tuple[int, int, int, int]
+
+
+class SpatialGrid:
+    '''Uniform grid of square cells laid over the world to find what is near a point'''
+
+    def __init__(self, bounds: Rect, cell_size: int) -> None:
+        self.bounds: Rect = bounds
+        self.cell_size: int = cell_size
+
+        self.columns: int = max(1, math.ceil((bounds.max.x - bounds.min.x) / cell_size))
+        self.rows: int = max(1, math.ceil((bounds.max.y - bounds.min.y) / cell_size))
+
+    def column_of(self, x: int) -> int:
+        return min(self.columns-1, max(0, (x - self.bounds.min.x) // self.cell_size))
+
+    def row_of(self, y: int) -> int:
+        return min(self.rows-1, max(0, (y - self.bounds.min.y) // self.cell_size))
+
+    def cell_of(self, pos: Vec2D) -> int:
+        return self.row_of(pos.y) * self.columns + self.column_of(pos.x)
+
+    def area_around(self, pos: Vec2D, radius: int) -> Area:
+        return (
+            self.column_of(pos.x - radius),
+            self.row_of(pos.y - radius),
+            self.column_of(pos.x + radius),
+            self.row_of(pos.y + radius),
+        )
+
+    def cells_in(self, area: Area) -> list[int]:
+        min_col, min_row, max_col, max_row = area
+        return [
+            row * self.columns + col
+            for row in range(min_row, max_row+1)
+            for col in range(min_col, max_col+1)
+        ]
+
+
+class CellIndex:
+    '''Entity ids bucketed by grid cell. Kept up to date as entities move so
+    only the cells an entity changes between are touched'''
+
+    def __init__(self, grid: SpatialGrid) -> None:
+        self.grid: SpatialGrid = grid
+        self.cells: dict[int, set[int]] = {}
+        self.entity_cells: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.entity_cells)
+
+    def move(self, id: int, pos: Vec2D) -> None:
+        '''Adds id or moves it to the cell containing pos'''
+        cell = self.grid.cell_of(pos)
+        old_cell = self.entity_cells.get(id)
+        if old_cell == cell:
+            return
+
+        if old_cell is not None:
+            self._discard(id, old_cell)
+
+        self.entity_cells[id] = cell
+        self.cells.setdefault(cell, set()).add(id)
+
+    def remove(self, id: int) -> None:
+        cell = self.entity_cells.pop(id, None)
+        if cell is not None:
+            self._discard(id, cell)
+
+    def _discard(self, id: int, cell: int) -> None:
+        bucket = self.cells[cell]
+        bucket.discard(id)
+        if not bucket:
+            del self.cells[cell]
+
+    def ids_in(self, area: Area) -> list[int]:
+        ids: list[int] = []
+        for cell in self.grid.cells_in(area):
+            bucket = self.cells.get(cell)
+            if bucket:
+                ids.extend(bucket)
+        return ids
@@ -0,0 +1,93 @@
+import time
+from typing import Callable
+
+
+class TickStats:
+    '''Timing of the ticks run so far'''
+
+    def __init__(self) -> None:
+        self.ticks: int = 0
+        self.overruns: int = 0       # ticks whose work took longer than the tick time
+        self.late_ticks: int = 0     # ticks started more than a tick time after their deadline
+        self.skipped_ticks: int = 0  # ticks dropped because catch up was capped
+
+        self.max_lateness_ns: int = 0
+        self.max_work_ns: int = 0
+        self.mean_work_ns: float = 0 # exponential moving average
+
+    def record(self, lateness_ns: int, work_ns: int, tick_time_ns: int) -> None:
+        self.ticks += 1
+
+        if work_ns > tick_time_ns:
+            self.overruns += 1
+        if lateness_ns > tick_time_ns:
+            self.late_ticks += 1
+
+        self.max_lateness_ns = max(self.max_lateness_ns, lateness_ns)
+        self.max_work_ns = max(self.max_work_ns, work_ns)
+        self.mean_work_ns += (work_ns - self.mean_work_ns) / min(self.ticks, 100)
+
+    def __str__(self) -> str:
+        return (
+            f"Ticks[run= {self.ticks}, overruns= {self.overruns}, late= {self.late_ticks}, skipped= {self.skipped_ticks}, "
+            f"mean_work= {self.mean_work_ns/1_000_000:.2f}ms, max_work= {self.max_work_ns/1_000_000:.2f}ms, "
+            f"max_lateness= {self.max_lateness_ns/1_000_000:.2f}ms]"
+        )
+
+
+class TickScheduler:
+    '''Fixed timestep scheduler. Ticks are due at absolute deadlines so time
+    spent outside the tick doesn't make the rate drift. After a stall a
+    bounded number of ticks run back to back to catch up and the rest are
+    skipped'''
+
+    def __init__(self, tick_time_ns: int, max_catch_up: int, spin_ns: int) -> None:
+        self.tick_time_ns: int = tick_time_ns
+        self.max_catch_up: int = max_catch_up
+        self.spin_ns: int = spin_ns # the last stretch before a deadline is busy waited for precision
+
+        self.tick: int = 0 # monotonic count of ticks run
+        self.next_deadline_ns: int = time.perf_counter_ns()
+
+        self.stats: TickStats = TickStats()
+
+    def reset(self) -> None:
+        '''Starts the schedule from now, without catching up. Use after pausing'''
+        self.next_deadline_ns = time.perf_counter_ns()
+
+    def run_due(self, step: Callable[[], None]) -> None:
+        '''Runs step once for every tick that is due, up to max_catch_up'''
+        now = time.perf_counter_ns()
+        steps = 0
+
+        while now >= self.next_deadline_ns and steps < self.max_catch_up:
+            lateness_ns = now - self.next_deadline_ns
+
+            self.tick += 1
+            step()
+
+            work_end = time.perf_counter_ns()
+            self.stats.record(lateness_ns, work_end - now, self.tick_time_ns)
+
+            self.next_deadline_ns += self.tick_time_ns
+            steps += 1
+            now = work_end
+
+        if now >= self.next_deadline_ns:
+            skipped = (now - self.next_deadline_ns) // self.tick_time_ns + 1
+            self.stats.skipped_ticks += skipped
+            self.next_deadline_ns += skipped * self.tick_time_ns
+
+    def wait(self, sleep: Callable[[float], None]) -> None:
+        '''Waits for the next deadline. sleep(seconds) is called at least once and
+        may return early, e.g. to handle network events'''
+        remaining_ns = self.next_deadline_ns - time.perf_counter_ns()
+        sleep(max(remaining_ns - self.spin_ns, 0) / 1_000_000_000)
+
+        remaining_ns = self.next_deadline_ns - time.perf_counter_ns()
+        while remaining_ns > self.spin_ns:
+            sleep((remaining_ns - self.spin_ns) / 1_000_000_000)
+            remaining_ns = self.next_deadline_ns - time.perf_counter_ns()
+
+        while time.perf_counter_ns() < self.next_deadline_ns:
+            pass
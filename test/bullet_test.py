@@ -0,0 +1,41 @@
+import unittest
+
+from common.data_types import Vec2D
+from server.bullet import ServerBullet, bullet_velocity, ticks_in_world
+from server.settings import Settings
+
+
+class serverBullet(unittest.TestCase):
+    """Tests for bullets evaluated from their trajectory"""
+
+    def setUp(self):
+        self.tick = 100
+
+    def clock(self) -> int:
+        return self.tick
+
+    def testPositionFollowsTicks(self):
+        bullet = ServerBullet(Vec2D(500, 500), 9000, self.clock)
+        self.assertEqual(bullet.velocity, bullet_velocity(9000))
+        vx, vy = bullet.velocity
+        self.assertEqual(bullet.pos, Vec2D(500 + vx, 500 + vy)) # one step out on the tick it's fired
+
+        self.tick += 3
+        self.assertEqual(bullet.pos, Vec2D(500 + 4*vx, 500 + 4*vy))
+
+    def testExpiresOnFirstTickOutside(self):
+        for angle in [0, 4500, 9000, 13000, 18000, 27000, 31050]:
+            with self.subTest(angle=angle):
+                self.tick = 100
+                bullet = ServerBullet(Vec2D(700, 300), angle, self.clock)
+                assert bullet.expiry_tick is not None
+
+                self.tick = bullet.expiry_tick - 1
+                self.assertTrue(Settings.world_rect.contains(bullet.pos))
+
+                self.tick = bullet.expiry_tick
+                self.assertFalse(Settings.world_rect.contains(bullet.pos))
+
+    def testOnEdgeExpiresImmediately(self):
+        self.assertEqual(ticks_in_world(Vec2D(0, 300), (10, 0)), 1)
+        self.assertIsNone(ticks_in_world(Vec2D(10, 300), (0, 0)))
@@ -1,6 +1,6 @@
 import unittest
 
-from common.c2s_packets import C2SCreateBullet, C2SHandshake, C2SMovementUpdate
+from common.c2s_packets import C2SCreateBullet, C2SHandshake, C2SMovementUpdate, C2SSnapshotAck
 from common.data_types import Vec2D
 
 
@@ -14,6 +14,7 @@ class c2sPackets(unittest.TestCase):
             C2SMovementUpdate(Vec2D(-1, 0)): "-1, 0",
             C2SMovementUpdate(Vec2D( 0, 1)): " 0, 1",
             C2SMovementUpdate(Vec2D( 0,-1)): " 0,-1",
+            C2SMovementUpdate(Vec2D( 1, 1), 4_000_000_000): " 1, 1",
         }
 
         for p in packets:
@@ -22,14 +23,17 @@ class c2sPackets(unittest.TestCase):
                 decoded = C2SMovementUpdate.decode_data(encoded)
 
                 self.assertEqual(decoded.mov_dir, p.mov_dir)
+                self.assertEqual(decoded.seq, p.seq)
 
     def testHandshakePacket(self):
-        packet = C2SHandshake("test")
+        packet = C2SHandshake("test", capabilities=0b101, room=7)
 
         encoded = packet.encode()
         decoded = C2SHandshake.decode_data(encoded)
 
         self.assertEqual(decoded.message, packet.message)
+        self.assertEqual(decoded.capabilities, packet.capabilities)
+        self.assertEqual(decoded.room, packet.room)
     
     def testCreateBulletPacket(self):
         packets = {
@@ -37,7 +41,7 @@ class c2sPackets(unittest.TestCase):
             C2SCreateBullet(9000): "9000",
             C2SCreateBullet(18094): "18094",
             C2SCreateBullet(30000): "30000",
-            C2SCreateBullet(35999): "35999",
+            C2SCreateBullet(35999, 12): "35999",
         }
 
         for p in packets:
@@ -46,3 +50,12 @@ class c2sPackets(unittest.TestCase):
                 decoded = C2SCreateBullet.decode_data(encoded)
 
                 self.assertEqual(decoded.angle, p.angle)
+                self.assertEqual(decoded.seq, p.seq)
+
+    def testSnapshotAckPacket(self):
+        packet = C2SSnapshotAck(4_000_000_000)
+
+        encoded = packet.encode()
+        decoded = C2SSnapshotAck.decode_data(encoded)
+
+        self.assertEqual(decoded.seq, packet.seq)
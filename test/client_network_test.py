@@ -0,0 +1,179 @@
+import socket
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from typing import Callable
+
+from client.interpolation import SnapshotBuffer, SnapshotClock, extrapolate
+from client.network import Network
+from common import compression, datagram, packet_ids
+from common.bullet import CommonBullet
+from common.c2s_packets import C2SMovementUpdate, C2SSnapshotAck
+from common.data_types import Color, Vec2D
+from common.packet_base import Packet
+from common.packet_dispatch import MalformedPacket
+from common.packet_header import PacketHeader
+from common.player import CommonPlayer
+from common.s2c_packets import S2CCompressed, S2CWorldDelta
+from common.stream_reader import StreamReader
+
+
+def player(id: int, x: int) -> CommonPlayer:
+    return CommonPlayer(id, Vec2D(x, 50), Vec2D(0, 0), Color(id, id, id))
+
+
+class worldDeltas(unittest.TestCase):
+    """Tests for applying world deltas on the client"""
+
+    def setUp(self):
+        self.game = SimpleNamespace(
+            snapshot_clock=SnapshotClock(jitter_margin=2, max_delay=0.25),
+            player_snapshots=SnapshotBuffer(8),
+            bullet_snapshots=SnapshotBuffer(8),
+        )
+        self.network = Network(self.game, 0) # type: ignore[arg-type]
+        self.network.conn.close()
+        self.network.conn, self.server = socket.socketpair()
+        self.reader = StreamReader()
+
+    def tearDown(self):
+        self.network.conn.close()
+        self.server.close()
+
+    def receive(self, delta: S2CWorldDelta) -> None:
+        self.network.handle_packet(memoryview(delta.encode()))
+
+    def acked(self) -> int:
+        self.reader.recv(self.server)
+        frame = self.reader.next_frame()
+        assert frame is not None and bytes(frame)[0] == packet_ids.C2S_SNAPSHOT_ACK
+        return C2SSnapshotAck.decode_data(bytes(frame)).seq
+
+    def testKeptAsRecords(self):
+        self.receive(S2CWorldDelta(10, S2CWorldDelta.NO_BASELINE, [player(1, 10), player(2, 20)], [], [CommonBullet(Vec2D(5, 6), 9000, id=3, spawn_tick=8)], []))
+        self.assertEqual(self.acked(), 10)
+
+        self.receive(S2CWorldDelta(12, 10, [player(2, 25)], [1], [], []))
+        self.assertEqual(self.acked(), 12)
+
+        players, bullets = self.network.world_states[12]
+        self.assertEqual(players, {2: (25, 50, 2, 2, 2)})
+        self.assertEqual(bullets, {3: (5, 6, 10, 0, 8)}) # moving right at the bullet speed since tick 8
+        self.assertEqual(self.game.player_snapshots.sample(12), players)
+
+        self.assertEqual(extrapolate(self.game.bullet_snapshots.sample(12)[3], 12), (45, 6))
+
+    def testMissingBaselineIgnored(self):
+        self.receive(S2CWorldDelta(12, 10, [player(2, 25)], [], [], []))
+
+        self.assertNotIn(12, self.network.world_states)
+
+
+class sending(unittest.TestCase):
+    """Tests for sending from the game and network threads at once"""
+
+    def setUp(self):
+        self.network = Network(SimpleNamespace(), 0) # type: ignore[arg-type]
+        self.network.conn.close()
+        self.network.conn, self.server = socket.socketpair()
+        self.network.udp, self.server_udp = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.network.udp_bound = True
+
+    def tearDown(self):
+        for s in [self.network.conn, self.server, self.network.udp, self.server_udp]:
+            s.close()
+
+    def send_from_threads(self, packet: Callable[[int], Packet], count: int = 4, each: int = 100) -> None:
+        def send(thread: int) -> None:
+            for i in range(each):
+                self.network.send(packet(thread*each + i))
+
+        threads = [threading.Thread(target=send, args=(t,)) for t in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def testStreamFramesIntact(self):
+        self.network.udp_bound = False # acks go over the stream until the datagram channel is up
+
+        acks: list[int] = []
+        def receive() -> None:
+            reader = StreamReader()
+            while reader.recv(self.server):
+                acks.extend(C2SSnapshotAck.decode_data(bytes(frame)).seq for frame in reader.frames())
+        receiver = threading.Thread(target=receive)
+        receiver.start() # socket buffers are small, so it's drained while sending
+
+        self.send_from_threads(C2SSnapshotAck)
+        self.network.conn.shutdown(socket.SHUT_WR)
+        receiver.join()
+
+        self.assertEqual(sorted(acks), list(range(400)))
+
+    def testDatagramSeqsUnique(self):
+        seqs: list[int] = []
+        def receive() -> None:
+            for _ in range(400):
+                seqs.append(datagram.split(memoryview(self.server_udp.recv(1024)))[0])
+        receiver = threading.Thread(target=receive)
+        receiver.start()
+
+        self.send_from_threads(lambda seq: C2SMovementUpdate(Vec2D(1, 0), seq))
+        receiver.join()
+
+        self.assertEqual(sorted(seqs), list(range(1, 401)))
+
+
+class malformedPackets(unittest.TestCase):
+    """Tests for packets from the server that don't decode"""
+
+    def setUp(self):
+        self.network = Network(SimpleNamespace(), 0) # type: ignore[arg-type]
+        self.network.conn.close()
+        self.network.conn, self.server = socket.socketpair()
+
+    def tearDown(self):
+        self.network.conn.close()
+        self.server.close()
+
+    def testCorruptCompressedReturned(self):
+        error = self.network.handle_packet(memoryview(S2CCompressed(b"\xff" * 16).encode()))
+
+        self.assertIsInstance(error, MalformedPacket)
+
+    def testCorruptStreamDisconnects(self):
+        PacketHeader.send_packet(self.server, S2CCompressed(b"\xff" * 16))
+
+        reader = threading.Thread(target=self.network.read_loop)
+        reader.start()
+        reader.join(2)
+
+        self.assertFalse(reader.is_alive())
+        self.assertTrue(self.network.quit)
+
+    def testCorruptDatagramDropped(self):
+        self.network.udp, server_udp = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.network.udp.settimeout(0.05)
+        self.network.udp_token = 0
+        handled: list[bytes] = []
+        self.network.handle_packet = lambda raw_packet: handled.append(bytes(raw_packet)) # type: ignore[method-assign]
+
+        delta = S2CWorldDelta(1, S2CWorldDelta.NO_BASELINE, [], [], [], []).encode()
+        good = S2CCompressed(compression.Compressor(6).compress(delta)).encode()
+        server_udp.send(datagram.encode_seq(1) + S2CCompressed(b"\xff" * 16).encode())
+        server_udp.send(datagram.encode_seq(2) + good)
+
+        reader = threading.Thread(target=self.network.udp_read_loop)
+        reader.start()
+        deadline = time.perf_counter() + 2
+        while not handled and time.perf_counter() < deadline:
+            time.sleep(0.01)
+
+        self.network.quit = True
+        reader.join()
+        self.network.udp.close()
+        server_udp.close()
+
+        self.assertEqual(handled, [delta])
@@ -0,0 +1,90 @@
+import unittest
+
+from common.c2s_packets import C2SCreateBullet, C2SMovementUpdate
+from common.data_types import Color, Vec2D
+from common.player import CommonPlayer
+from server.commands import CommandBuffer
+from server.main import Server
+from server.settings import Settings
+
+
+class commandBuffer(unittest.TestCase):
+    """Tests for buffering a client's inputs until the next tick"""
+
+    def setUp(self):
+        self.buffer = CommandBuffer(4)
+
+    def testDrainsInSequenceOrder(self):
+        shot = C2SCreateBullet(9000, 2)
+        first = C2SMovementUpdate(Vec2D(1, 0), 1)
+        last = C2SMovementUpdate(Vec2D(0, 1), 3)
+        for command in (last, shot, first):
+            self.buffer.push(command.seq, command)
+
+        self.assertEqual(self.buffer.drain(0), [first, shot, last])
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.last_seq, 3)
+
+    def testDuplicatesIgnored(self):
+        movement = C2SMovementUpdate(Vec2D(1, 0), 1)
+        self.buffer.push(1, movement)
+        self.buffer.push(1, C2SMovementUpdate(Vec2D(1, 0), 1))
+
+        self.assertEqual(self.buffer.drain(0), [movement])
+
+        self.buffer.push(1, C2SMovementUpdate(Vec2D(1, 0), 1)) # redundant copy arriving a tick late
+        self.assertEqual(self.buffer.drain(0), [])
+
+    def testLateShotStillApplied(self):
+        self.buffer.push(5, C2SMovementUpdate(Vec2D(1, 0), 5))
+        self.buffer.drain(0)
+
+        shot = C2SCreateBullet(0, 4) # overtaken by a datagram sent after it
+        stale = C2SMovementUpdate(Vec2D(-1, 0), 3)
+        self.buffer.push(4, shot)
+        self.buffer.push(3, stale)
+
+        self.assertEqual(self.buffer.drain(0), [shot])
+
+    def testLimit(self):
+        for seq in range(6):
+            self.buffer.push(seq, C2SCreateBullet(0, seq))
+
+        self.assertEqual(len(self.buffer), 4)
+        self.assertEqual(self.buffer.dropped, 2)
+
+
+class tickInputs(unittest.TestCase):
+    """Tests for applying buffered inputs at the start of a tick"""
+
+    def setUp(self):
+        self.server = Server(0)
+        room = self.server.find_room(0)
+        assert room is not None
+        self.game = room.game
+
+        self.player = CommonPlayer(0, Vec2D(Settings.world_width // 2, Settings.world_height // 2), Vec2D(0, 0), Color(0, 0, 0))
+        self.game.add_player(self.player)
+
+    def tearDown(self):
+        self.server.network.close()
+
+    def testAppliedOnUpdate(self):
+        commands = self.game.commands[self.player.id]
+        commands.push(1, C2SMovementUpdate(Vec2D(1, 0), 1))
+        commands.push(2, C2SCreateBullet(9000, 2))
+        commands.push(3, C2SMovementUpdate(Vec2D(0, -1), 3))
+
+        self.assertEqual(self.player.mov_dir, Vec2D(0, 0))
+        self.assertEqual(len(self.game.bullets), 0)
+
+        self.game.update()
+
+        self.assertEqual(self.player.mov_dir, Vec2D(0, -1))
+        self.assertEqual(len(self.game.bullets), 1)
+        self.assertEqual(commands.last_seq, 3)
+
+    def testRemovedWithPlayer(self):
+        self.game.remove_player(self.player.id)
+
+        self.assertNotIn(self.player.id, self.game.commands)
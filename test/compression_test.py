@@ -0,0 +1,95 @@
+import socket
+import threading
+import unittest
+
+from common import capabilities, compression, packet_ids
+from common.c2s_packets import C2SHandshake
+from common.data_types import Vec2D
+from common.packet_base import Packet
+from common.packet_header import PacketHeader
+from common.s2c_packets import S2CCompressed, S2CWorldDelta
+from common.stream_reader import StreamReader
+from server.main import Server
+from server.settings import Settings
+
+
+class compressor(unittest.TestCase):
+    """Tests for compressing packets one at a time"""
+
+    def setUp(self):
+        self.compressor = compression.Compressor(Settings.compression_level)
+
+    def testRoundTrip(self):
+        packet = bytes(range(256)) * 8
+
+        self.assertEqual(compression.decompress(self.compressor.compress(packet)), packet)
+
+    def testCorruptOrTruncatedRejected(self):
+        compressed = self.compressor.compress(bytes(range(256)) * 8)
+
+        with self.assertRaises(ValueError):
+            compression.decompress(b"\xff" * 16)
+        with self.assertRaises(ValueError):
+            compression.decompress(compressed[:len(compressed) // 2])
+
+    def testPacketsAreIndependent(self):
+        first = bytes([1, 2, 3]) * 300
+        second = bytes([1, 2, 3]) * 200 + bytes([4]) * 50
+
+        self.compressor.compress(first)
+        compressed = self.compressor.compress(second)
+
+        self.assertEqual(compression.decompress(compressed), second)
+
+    def testStats(self):
+        self.compressor.compress(bytes(1000))
+        self.compressor.compress(bytes([7]))
+
+        stats = self.compressor.stats
+        self.assertEqual(stats.frames, 1)
+        self.assertEqual(stats.skipped, 1)
+        self.assertEqual(stats.raw_bytes, 1000)
+        self.assertLess(stats.ratio, 0.1)
+
+
+class compressedSnapshots(unittest.TestCase):
+    """Negotiates compression with a server over loopback"""
+
+    def setUp(self):
+        self.server = Server(0)
+        self.server.port = self.server.network.listen(self.server.server, 0)
+        self.server_thread = threading.Thread(target=self.server.main_loop)
+        self.server_thread.start()
+
+        self.tcp = socket.create_connection((self.server.server, self.server.port), timeout=2)
+        self.reader = StreamReader()
+
+    def tearDown(self):
+        self.tcp.close()
+        self.server.network.call_soon(self.server.close_server)
+        self.server_thread.join()
+
+    def recv(self, packet_id: int) -> bytes:
+        while True:
+            for frame in self.reader.frames():
+                if Packet.decode_id(frame) == packet_id:
+                    return bytes(frame)
+            self.reader.recv(self.tcp)
+
+    def testLargeDeltaCompressed(self):
+        self.recv(packet_ids.S2C_HANDSHAKE)
+        PacketHeader.send_packet(self.tcp, C2SHandshake(capabilities=capabilities.COMPRESSION))
+
+        def add_bullets() -> None:
+            room = next(iter(self.server.rooms.values()))
+            player = next(iter(room.game.players)) # bullets don't hit their shooter
+            for angle in range(0, 36000, 360):
+                room.game.add_bullet(Vec2D(Settings.world_width // 2, Settings.world_height // 2), angle, player)
+        self.server.network.call_soon(add_bullets)
+
+        compressed = S2CCompressed.decode_data(self.recv(packet_ids.S2C_COMPRESSED))
+        delta = S2CWorldDelta.decode_data(compressed.decompress())
+
+        self.assertEqual(len(delta.bullets), 100)
+        self.assertLess(len(compressed.data), len(delta.encode()))
+        self.assertGreater(self.server.network.compressor.stats.frames, 0)
@@ -0,0 +1,30 @@
+import unittest
+
+from common.data_types import Rect, Vec2D
+
+
+class vec2D(unittest.TestCase):
+    """Tests for the in place vector operations"""
+
+    def testAddInto(self):
+        v = Vec2D(1, 2)
+        same = v.add_into(Vec2D(3, -4))
+
+        self.assertIs(same, v)
+        self.assertEqual(v, Vec2D(4, -2))
+
+    def testAddScaledIntoMatchesOperators(self):
+        pos, mov_dir = Vec2D(10, 20), Vec2D(-1, 1)
+        expected = pos + mov_dir * 3
+
+        self.assertEqual(pos.add_scaled_into(mov_dir, 3), expected)
+
+    def testClampInto(self):
+        bounds = Rect(Vec2D(50, 50), Vec2D(150, 150))
+
+        self.assertEqual(Vec2D(10, 200).clamp_into(bounds), Vec2D(50, 150))
+        self.assertEqual(Vec2D(50, 100).clamp_into(bounds), Vec2D(50, 100))
+
+    def testSlotted(self):
+        with self.assertRaises(AttributeError):
+            Vec2D(0, 0).z = 1 # type: ignore[attr-defined]
@@ -0,0 +1,214 @@
+import random
+import unittest
+
+from common.data_types import Color, Vec2D
+from common.player import CommonPlayer
+from server.engine import ObjectEngine
+from server.game_data import GameData
+from server.main import Server
+from server.settings import Settings
+
+try:
+    from server.numpy_engine import NumpyEngine
+except ModuleNotFoundError:
+    NumpyEngine = None # type: ignore[assignment, misc]
+
+
+def populate(game: GameData, seed: int) -> None:
+    rng = random.Random(seed)
+    for id in range(20):
+        game.add_player(CommonPlayer(
+            id,
+            Vec2D(rng.randint(0, Settings.world_width), rng.randint(0, Settings.world_height)),
+            Vec2D(rng.randint(-1, 1), rng.randint(-1, 1)),
+            Color(rng.randint(0, 255), rng.randint(0, 255), rng.randint(0, 255)),
+        ))
+
+    players = game.players.values()
+    for _ in range(500):
+        shooter = rng.choice(players + [None])
+        pos = shooter.pos.clone() if shooter is not None else Vec2D(rng.randint(1, Settings.world_width-1), rng.randint(1, Settings.world_height-1))
+        game.add_bullet(pos, rng.randint(0, 35999), shooter, rng.randint(0, Settings.max_rewind_ticks))
+
+
+class engines(unittest.TestCase):
+    """Tests for the world simulation engines"""
+
+    def setUp(self):
+        self.max_rooms = Settings.max_rooms
+        Settings.max_rooms = 4 # games compared side by side each need a room
+        self.server = Server(0)
+
+    def tearDown(self):
+        self.server.network.close()
+        Settings.max_rooms = self.max_rooms
+
+    def new_game(self) -> GameData:
+        room = self.server.find_room(len(self.server.rooms))
+        assert room is not None
+        return room.game
+
+    def next_tick(self) -> None:
+        self.server.scheduler.tick += 1
+
+    def testLowestBulletIdHits(self):
+        game = self.new_game()
+        self.assertIsInstance(game.engine, ObjectEngine)
+
+        game.add_player(CommonPlayer(0, Vec2D(500, 500), Vec2D(0, 0), Color(0, 0, 0)))
+        for _ in range(3):
+            game.add_bullet(Vec2D(500, 500), 0) # straight up, stays inside the player
+
+        self.next_tick()
+        step = game.engine.step(game.pop_expired_bullets())
+
+        self.assertEqual(step.killed_players, [0])
+        self.assertEqual(step.gone_bullets, {0})
+
+    def testOwnBulletsDontHit(self):
+        game = self.new_game()
+
+        shooter = CommonPlayer(0, Vec2D(500, 500), Vec2D(0, 0), Color(0, 0, 0))
+        game.add_player(shooter)
+        game.add_bullet(Vec2D(500, 500), 0, shooter)
+
+        self.next_tick()
+        step = game.engine.step(game.pop_expired_bullets())
+
+        self.assertEqual(step.killed_players, [])
+        self.assertEqual(step.gone_bullets, set())
+
+    def testFirstStepTestedOnFiringTick(self):
+        game = self.new_game()
+        game.add_player(CommonPlayer(0, Vec2D(500, 445), Vec2D(0, 0), Color(0, 0, 0)))
+        game.add_bullet(Vec2D(500, 500), 0) # straight up, just outside the player until it moves
+
+        step = game.engine.step(game.pop_expired_bullets()) # same tick, as for a shot fired during apply_commands
+
+        self.assertEqual(step.killed_players, [0])
+
+    def rewind_setup(self) -> tuple[GameData, CommonPlayer]:
+        '''A game with a target that has just left the path of a bullet fired from (500, 800)'''
+        game = self.new_game()
+
+        target = CommonPlayer(0, Vec2D(548, 500), Vec2D(0, 0), Color(0, 0, 0))
+        game.add_player(target)
+        game.add_player(CommonPlayer(1, Vec2D(500, 800), Vec2D(0, 0), Color(0, 0, 0)))
+
+        game.history.record(self.server.tick, game.players)
+        self.next_tick()
+        target.pos.x += Settings.player_speed # just out of the way by the time the bullet gets there
+        game.history.record(self.server.tick, game.players)
+
+        return game, target
+
+    def testRewoundBulletHitsWhereShooterSawTarget(self):
+        game, target = self.rewind_setup()
+        shooter = game.players.get(1)
+        game.add_bullet(Vec2D(500, 555), 0, shooter, rewind=2) # the shooter was drawing the tick before the target moved
+
+        self.next_tick()
+        step = game.engine.step(game.pop_expired_bullets())
+
+        self.assertEqual(step.killed_players, [target.id])
+
+    def testUnrewoundBulletMisses(self):
+        game, _ = self.rewind_setup()
+        game.add_bullet(Vec2D(500, 555), 0, game.players.get(1))
+
+        self.next_tick()
+        step = game.engine.step(game.pop_expired_bullets())
+
+        self.assertEqual(step.killed_players, [])
+
+    def testRewoundBulletMissesPlayerReusingId(self):
+        game, target = self.rewind_setup()
+        game.remove_player(target.id)
+        game.add_player(CommonPlayer(target.id, Vec2D(590, 500), Vec2D(0, 0), Color(0, 0, 0))) # joins on the freed id, close enough to be checked
+
+        game.add_bullet(Vec2D(500, 555), 0, game.players.get(1), rewind=2) # through where the old owner was
+        self.next_tick()
+        step = game.engine.step(game.pop_expired_bullets())
+
+        self.assertEqual(step.killed_players, [])
+
+    def testRewindCapped(self):
+        game = self.new_game()
+
+        self.server.scheduler.tick = 1000
+        self.assertEqual(game.rewind_ticks(995), 5)
+        self.assertEqual(game.rewind_ticks(1), Settings.max_rewind_ticks)
+        self.assertEqual(game.rewind_ticks(1005), 0)
+        self.assertEqual(game.rewind_ticks(0), 0)
+
+    @unittest.skipIf(NumpyEngine is None, "numpy isn't installed")
+    def testNumpyMatchesObjects(self):
+        objects = self.new_game()
+        vectorised = self.new_game()
+        vectorised.engine = NumpyEngine(vectorised)
+
+        populate(objects, 5)
+        populate(vectorised, 5)
+
+        for _ in range(60):
+            for game in (objects, vectorised):
+                game.history.record(self.server.tick, game.players)
+
+            self.next_tick()
+            expected = objects.engine.step(objects.pop_expired_bullets())
+            actual = vectorised.engine.step(vectorised.pop_expired_bullets())
+
+            self.assertEqual(actual.killed_players, expected.killed_players)
+            self.assertEqual(actual.gone_bullets, expected.gone_bullets)
+            self.assertEqual(actual.players_dirty, expected.players_dirty)
+
+            for game, step in [(objects, expected), (vectorised, actual)]:
+                for id in step.killed_players:
+                    game.remove_player(id)
+                game.remove_bullets(step.gone_bullets)
+
+            self.assertEqual([p.encode() for p in vectorised.players], [p.encode() for p in objects.players])
+            self.assertEqual([b.encode() for b in vectorised.bullets], [b.encode() for b in objects.bullets])
+
+        self.assertEqual(vectorised.engine.encode_players(), b"".join(p.encode() for p in objects.players))
+        self.assertEqual(vectorised.engine.encode_bullets(), b"".join(b.encode() for b in objects.bullets))
+
+        vectorised.send_snapshots()
+        objects.send_snapshots()
+        self.assertEqual(vectorised.world_state.player_records, objects.world_state.player_records)
+        self.assertEqual(sorted(vectorised.world_state.bullets), sorted(objects.world_state.bullets))
+
+    def testSnapshotsUseEngineEncoders(self):
+        game = self.new_game()
+        populate(game, 3)
+
+        encoded: list[str] = []
+        class Encoding(ObjectEngine):
+            def encode_players(self):
+                encoded.append("players")
+                return b"".join(p.encode() for p in self.game.players)
+
+            def encode_bullets(self):
+                encoded.append("bullets")
+                return b"".join(b.encode() for b in self.game.bullets)
+
+        game.engine = Encoding(game)
+        game.send_snapshots()
+
+        # deltas send bullets as they're fired, so where they are isn't needed
+        self.assertEqual(encoded, ["players"])
+        self.assertEqual(game.world_state.player_records, {p.id: p.encode() for p in game.players})
+        self.assertEqual(game.world_state.bullet_records, {})
+
+    def testFullSnapshotsEncodeBullets(self):
+        game = self.new_game()
+        populate(game, 3)
+
+        delta_snapshots = Settings.delta_snapshots
+        Settings.delta_snapshots = False
+        try:
+            game.send_snapshots()
+        finally:
+            Settings.delta_snapshots = delta_snapshots
+
+        self.assertEqual(game.world_state.bullet_records, {b.id: b.encode() for b in game.bullets})
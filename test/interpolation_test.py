@@ -0,0 +1,76 @@
+import unittest
+
+from client.interpolation import SnapshotBuffer, SnapshotClock
+
+TICK = SnapshotClock.TICK_TIME
+
+
+class snapshotBuffer(unittest.TestCase):
+    """Tests for drawing entities between buffered snapshots"""
+
+    def setUp(self):
+        self.buffer = SnapshotBuffer(8)
+
+    def testInterpolates(self):
+        self.buffer.push(10, {1: (0, 0, 7)})
+        self.buffer.push(12, {1: (10, 20, 8)})
+
+        self.assertEqual(self.buffer.sample(10), {1: (0, 0, 7)})
+        self.assertEqual(self.buffer.sample(11), {1: (5, 10, 8)})
+        self.assertEqual(self.buffer.sample(11.5), {1: (8, 15, 8)})
+
+    def testComingAndGoing(self):
+        self.buffer.push(0, {1: (0, 0), 2: (50, 50)})
+        self.buffer.push(4, {1: (40, 0), 3: (90, 90)})
+
+        self.assertEqual(self.buffer.sample(1), {1: (10, 0), 2: (50, 50)})
+        self.assertEqual(self.buffer.sample(4), {1: (40, 0), 3: (90, 90)})
+
+    def testHoldsNewest(self):
+        self.buffer.push(0, {1: (0, 0)})
+        self.buffer.push(2, {1: (6, 0)})
+
+        self.assertEqual(self.buffer.sample(5), {1: (6, 0)})
+        self.assertEqual(self.buffer.starved, 1)
+
+    def testUntrackedNotInterpolated(self):
+        self.buffer.push(0, {0: (0, 0)}, tracked=False)
+        self.buffer.push(2, {0: (6, 0)}, tracked=False)
+
+        self.assertEqual(self.buffer.sample(1), {0: (0, 0)})
+
+    def testLateDropped(self):
+        self.buffer.push(4, {1: (4, 0)})
+        self.buffer.push(2, {1: (2, 0)})
+
+        self.assertEqual(self.buffer.sample(3), {1: (4, 0)})
+        self.assertEqual(self.buffer.late, 1)
+
+
+class snapshotClock(unittest.TestCase):
+    """Tests for choosing which server tick to draw"""
+
+    def setUp(self):
+        self.clock = SnapshotClock(jitter_margin=2, max_delay=0.25)
+
+    def testSteadyArrivals(self):
+        for tick in range(0, 200, 2):
+            self.clock.observe(tick, 1000 + tick*TICK)
+
+        self.assertAlmostEqual(self.clock.interval, 2*TICK, places=3)
+        self.assertAlmostEqual(self.clock.tick_at(1000 + 198*TICK), 196, places=1)
+
+    def testDelayGrowsWithJitter(self):
+        for tick in range(0, 200, 2):
+            self.clock.observe(tick, 1000 + tick*TICK + (0.02 if tick % 4 else 0))
+
+        self.assertGreater(self.clock.delay, self.clock.interval + 0.01)
+        self.assertLessEqual(self.clock.delay, 0.25)
+
+    def testNeverGoesBackwards(self):
+        self.clock.observe(100, 1000)
+        ahead = self.clock.tick_at(1000.5)
+
+        self.clock.observe(200, 1000.5 + 5) # arrives very late, so the clock is reset
+
+        self.assertGreaterEqual(self.clock.tick_at(1000.6), ahead)
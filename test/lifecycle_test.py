@@ -0,0 +1,157 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import unittest
+
+from common import packet_ids
+from common.c2s_packets import C2SHandshake
+from common.packet_base import Packet
+from common.packet_header import PacketHeader
+from common.stream_reader import StreamReader
+from server.lifecycle import Supervisor
+from server.main import Server
+
+
+def send_signal(signum: int, delay: float) -> None:
+    '''Signals this process from another thread once the main thread is waiting'''
+    threading.Timer(delay, os.kill, (os.getpid(), signum)).start()
+
+
+class supervisor(unittest.TestCase):
+    """Tests for supervising the server's worker threads"""
+
+    def setUp(self):
+        self.handlers = {s: signal.getsignal(s) for s in [signal.SIGINT, signal.SIGTERM]}
+        self.supervisor = Supervisor()
+
+    def tearDown(self):
+        self.supervisor.stop()
+        self.supervisor.join(1)
+        for s, handler in self.handlers.items():
+            signal.signal(s, handler)
+
+    def testFailingWorkerStopsAll(self):
+        def fail() -> None:
+            raise RuntimeError("worker failed")
+
+        failures: list[type] = []
+        excepthook = threading.excepthook
+        threading.excepthook = lambda args: failures.append(args.exc_type)
+        try:
+            self.supervisor.spawn(self.supervisor.stopped.wait, "healthy")
+            self.supervisor.spawn(fail, "failing")
+
+            self.supervisor.wait()
+            self.supervisor.join(1)
+        finally:
+            threading.excepthook = excepthook
+
+        self.assertEqual(failures, [RuntimeError])
+        self.assertFalse(any(t.is_alive() for t in self.supervisor.workers))
+
+    def testSignalShutsDownThroughWorkers(self):
+        closing = threading.Event()
+        self.supervisor.install_signal_handlers(closing.set)
+        self.supervisor.spawn(closing.wait, "main") # exits once told to close, which stops the rest
+
+        send_signal(signal.SIGTERM, 0.05)
+        self.supervisor.wait()
+        self.supervisor.join(1)
+
+        self.assertTrue(self.supervisor.shutdown_requested)
+        self.assertFalse(any(t.is_alive() for t in self.supervisor.workers))
+
+    def testSecondSignalExitsPastStuckWorkers(self):
+        # the stuck worker would keep the interpreter alive, so this runs in its own process
+        script = (
+            "import os, signal, threading, time\n"
+            "from server.lifecycle import Supervisor\n"
+            "s = Supervisor()\n"
+            "s.install_signal_handlers(lambda: None)\n"
+            "s.spawn(threading.Event().wait, 'stuck')\n"
+            "def kill():\n"
+            "    for _ in range(2):\n"
+            "        time.sleep(0.1)\n"
+            "        os.kill(os.getpid(), signal.SIGINT)\n"
+            "threading.Thread(target=kill, daemon=True).start()\n"
+            "s.wait()\n"
+            "s.exit()\n"
+        )
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", script], cwd=root, capture_output=True, text=True, timeout=10)
+
+        self.assertEqual(result.returncode, 1, result.stderr)
+        self.assertIn("Worker stuck didn't stop in time", result.stdout)
+
+    def testExitAfterWorkersStop(self):
+        closing = threading.Event()
+        self.supervisor.spawn(closing.wait, "main")
+        closing.set()
+
+        with self.assertRaises(SystemExit):
+            self.supervisor.exit(1)
+
+
+class HibernatingServer(Server):
+    '''Flags each time the main loop goes to sleep and wakes again'''
+
+    def __init__(self) -> None:
+        super().__init__(0)
+        self.asleep: threading.Event = threading.Event()
+        self.awake: threading.Event = threading.Event()
+
+    def hibernate(self) -> None:
+        self.awake.clear()
+        self.asleep.set()
+        super().hibernate()
+        self.asleep.clear()
+        self.awake.set()
+
+
+class hibernation(unittest.TestCase):
+    """Pauses the game loop while nobody is connected"""
+
+    def setUp(self):
+        self.server = HibernatingServer()
+        self.server.port = self.server.network.listen(self.server.server, 0)
+        self.server_thread = threading.Thread(target=self.server.main_loop)
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.server.network.call_soon(self.server.close_server)
+        self.server_thread.join()
+
+    def join(self) -> socket.socket:
+        sock = socket.create_connection((self.server.server, self.server.port), timeout=2)
+        reader = StreamReader()
+        while not any(Packet.decode_id(frame) == packet_ids.S2C_HANDSHAKE for frame in reader.frames()):
+            reader.recv(sock)
+        PacketHeader.send_packet(sock, C2SHandshake())
+        return sock
+
+    def testWakesOnConnect(self):
+        self.assertTrue(self.server.asleep.wait(2))
+        self.assertEqual(self.server.tick, 0)
+
+        sock = self.join()
+        self.assertTrue(self.server.awake.wait(2))
+
+        deadline = time.perf_counter() + 2
+        while self.server.tick == 0 and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        self.assertGreater(self.server.tick, 0)
+
+        sock.close()
+        self.assertTrue(self.server.asleep.wait(2))
+
+    def testShutdownWakesHibernatingLoop(self):
+        self.assertTrue(self.server.asleep.wait(2))
+
+        self.server.network.call_soon(self.server.close_server)
+        self.server_thread.join(2)
+
+        self.assertFalse(self.server_thread.is_alive())
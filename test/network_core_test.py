@@ -0,0 +1,144 @@
+import socket
+import struct
+import threading
+import unittest
+
+from common import packet_ids
+from common.c2s_packets import C2SHandshake, C2SMovementUpdate, C2SRequestPlayerList
+from common.data_types import Vec2D
+from common.packet_base import Packet
+from common.packet_header import PacketHeader
+from common.s2c_packets import S2CPlayers, S2CSendID
+from common.stream_reader import StreamReader
+from server.main import Server
+
+
+class Client:
+    '''A bare TCP client speaking to the server over loopback'''
+
+    def __init__(self, server: Server) -> None:
+        self.socket: socket.socket = socket.create_connection((server.server, server.port), timeout=2)
+        self.reader: StreamReader = StreamReader()
+
+    def recv(self, packet_id: int) -> bytes:
+        while True:
+            for frame in self.reader.frames():
+                if Packet.decode_id(frame) == packet_id:
+                    return bytes(frame)
+            if self.reader.recv(self.socket) == 0:
+                raise ConnectionError("closed by server")
+
+    def is_closed(self) -> bool:
+        '''True once the server has closed the connection. Drops anything still being sent'''
+        try:
+            while self.reader.recv(self.socket):
+                list(self.reader.frames())
+        except ConnectionResetError:
+            pass
+        return True
+
+    def join(self) -> int:
+        self.recv(packet_ids.S2C_HANDSHAKE)
+        PacketHeader.send_packet(self.socket, C2SHandshake())
+        return S2CSendID.decode_data(self.recv(packet_ids.S2C_SEND_ID)).player_id
+
+
+class networkCore(unittest.TestCase):
+    """Accepts, frames and closes connections over loopback"""
+
+    def setUp(self):
+        self.server = Server(0)
+        self.server.port = self.server.network.listen(self.server.server, 0)
+        self.server_thread = threading.Thread(target=self.server.main_loop)
+        self.server_thread.start()
+
+        self.clients: list[Client] = []
+
+    def tearDown(self):
+        for c in self.clients:
+            c.socket.close()
+        self.server.network.call_soon(self.server.close_server)
+        self.server_thread.join()
+
+    def connect(self) -> Client:
+        client = Client(self.server)
+        self.clients.append(client)
+        return client
+
+    def testHandshake(self):
+        first, second = self.connect(), self.connect()
+
+        self.assertNotEqual(first.join(), second.join())
+
+    def testFrameSplitAcrossReads(self):
+        client = self.connect()
+        client.recv(packet_ids.S2C_HANDSHAKE)
+
+        data = PacketHeader.encode_size(len(C2SHandshake().encode())) + C2SHandshake().encode()
+        for i in range(len(data)):
+            client.socket.send(data[i:i+1])
+
+        S2CSendID.decode_data(client.recv(packet_ids.S2C_SEND_ID))
+
+    def testFramesInOneRead(self):
+        client = self.connect()
+        client.recv(packet_ids.S2C_HANDSHAKE)
+
+        handshake, request = C2SHandshake().encode(), C2SRequestPlayerList().encode()
+        client.socket.send(PacketHeader.encode_size(len(handshake)) + handshake + PacketHeader.encode_size(len(request)) + request)
+
+        S2CSendID.decode_data(client.recv(packet_ids.S2C_SEND_ID))
+        S2CPlayers.decode_data(client.recv(packet_ids.S2C_PLAYERS))
+
+    def testClientClose(self):
+        client = self.connect()
+        id = client.join()
+
+        client.socket.close()
+        self.assertEqual(self.connect().join(), id) # served after the close is seen, so the id is free again
+
+        self.assertEqual(len(self.server.open_connections), 1)
+
+    def testResetOnConnect(self):
+        for _ in range(20):
+            sock = socket.create_connection((self.server.server, self.server.port))
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)) # close with a reset
+            sock.close()
+
+        self.connect().join()
+        self.assertTrue(self.server_thread.is_alive())
+
+    def testMalformedPacketDropsOnlySender(self):
+        good, bad = self.connect(), self.connect()
+        good.join()
+        bad.join()
+
+        truncated = C2SMovementUpdate(Vec2D(1, 0), 7).encode()[:3]
+        PacketHeader.sendBytes(bad.socket, truncated)
+
+        self.assertTrue(bad.is_closed())
+        self.assertTrue(self.server_thread.is_alive())
+
+        PacketHeader.send_packet(good.socket, C2SRequestPlayerList())
+        self.assertEqual(len(S2CPlayers.decode_data(good.recv(packet_ids.S2C_PLAYERS)).players), 1)
+
+    def testMalformedHandshakeDropsOnlySender(self):
+        bad = self.connect()
+        bad.recv(packet_ids.S2C_HANDSHAKE)
+
+        PacketHeader.sendBytes(bad.socket, bytes([packet_ids.C2S_HANDSHAKE, 0, 0xFF]) + b"\xff\xfe")
+
+        bad.recv(packet_ids.S2C_HANDSHAKE_FAIL)
+        self.assertTrue(bad.is_closed())
+        self.connect().join()
+
+    def testOversizedFrameDropsOnlySender(self):
+        good, bad = self.connect(), self.connect()
+        good.join()
+        bad.join()
+
+        bad.socket.send(PacketHeader.encode_size(PacketHeader.MAX_PACKET_SIZE))
+
+        self.assertTrue(bad.is_closed())
+        PacketHeader.send_packet(good.socket, C2SRequestPlayerList())
+        good.recv(packet_ids.S2C_PLAYERS)
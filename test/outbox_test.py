@@ -0,0 +1,67 @@
+import socket
+import unittest
+
+from common.bullet import CommonBullet
+from common.data_types import Color, Vec2D
+from common.player import CommonPlayer
+from common.s2c_packets import S2CBullets, S2CPlayers, S2CSendID
+from server.frame_cache import Frame
+from server.outbox import Outbox
+
+
+def players_frame(x: int) -> Frame:
+    return Frame(S2CPlayers([CommonPlayer(0, Vec2D(x, 0), Vec2D(0, 0), Color(0, 0, 0))]))
+
+
+class outbox(unittest.TestCase):
+    """Tests for the per connection write queue"""
+
+    def testStaleSnapshotDropped(self):
+        old, new = players_frame(1), players_frame(2)
+        id_frame = Frame(S2CSendID(3))
+
+        box = Outbox(1024)
+        box.push(old)
+        box.push(id_frame)
+        box.push(new)
+
+        self.assertEqual(list(box.frames), [id_frame, new])
+        self.assertEqual(box.size, id_frame.size + new.size)
+        self.assertEqual(box.dropped, 1)
+
+    def testCoalescedWrite(self):
+        a, b = socket.socketpair()
+        frames = [players_frame(1), Frame(S2CBullets([CommonBullet(Vec2D(5, 5), 0)]))]
+
+        box = Outbox(1024)
+        for f in frames:
+            box.push(f)
+
+        expected = b"".join(f.header + f.payload for f in frames)
+        self.assertEqual(box.write_to(a), len(expected))
+        self.assertEqual(b.recv(64), expected)
+        self.assertEqual(len(box), 0)
+
+        a.close()
+        b.close()
+
+    def testPartialWrite(self):
+        a, b = socket.socketpair()
+        first, second = players_frame(1), Frame(S2CSendID(3))
+
+        box = Outbox(1024)
+        box.push(first)
+        box.push(second)
+
+        box._consume(3)
+        box.push(players_frame(2))
+
+        # the partly written snapshot can't be dropped
+        self.assertEqual(box.head_offset, 3)
+        self.assertEqual(box.dropped, 0)
+
+        box.write_to(a)
+        self.assertEqual(b.recv(64)[:first.size-3 + second.size], (first.header + first.payload)[3:] + second.header + second.payload)
+
+        a.close()
+        b.close()
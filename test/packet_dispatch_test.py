@@ -0,0 +1,77 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from typing import Optional
+
+from common import packet_ids
+from common.c2s_packets import C2SCreateBullet, C2SSnapshotAck
+from common.packet_dispatch import UNKNOWN_PACKET, MalformedPacket, PacketDispatcher
+
+
+class packetDispatcher(unittest.TestCase):
+    """Tests for routing packets by id"""
+
+    def setUp(self):
+        self.handled: list[tuple[object, str]] = []
+        self.packets: PacketDispatcher[str] = PacketDispatcher()
+
+        self.packets.register(packet_ids.C2S_CREATE_BULLET, C2SCreateBullet.decode_data, self.handle)
+        self.packets.register(packet_ids.C2S_SNAPSHOT_ACK, C2SSnapshotAck.decode_data, self.handle)
+
+    def handle(self, packet: object, context: str) -> Optional[Exception]:
+        self.handled.append((packet, context))
+        return None
+
+    def testRoutesById(self):
+        self.assertIsNone(self.packets.dispatch(memoryview(C2SCreateBullet(9000).encode()), "a"))
+        self.assertIsNone(self.packets.dispatch(memoryview(C2SSnapshotAck(12).encode()), "b"))
+
+        (bullet, bullet_context), (ack, ack_context) = self.handled
+        self.assertIsInstance(bullet, C2SCreateBullet)
+        self.assertEqual(bullet.angle, 9000)
+        self.assertEqual(bullet_context, "a")
+        self.assertIsInstance(ack, C2SSnapshotAck)
+        self.assertEqual(ack.seq, 12)
+        self.assertEqual(ack_context, "b")
+
+    def testCounts(self):
+        for _ in range(3):
+            self.packets.dispatch(memoryview(C2SCreateBullet(0).encode()), "")
+
+        self.assertEqual(self.packets.stats(), {packet_ids.C2S_CREATE_BULLET: 3})
+
+    def testUnknownIdIsQuiet(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            error = self.packets.dispatch(memoryview(bytes([200, 1, 2])), "")
+
+        self.assertIs(error, UNKNOWN_PACKET)
+        self.assertEqual(self.packets.unknown, 1)
+        self.assertEqual(self.handled, [])
+        self.assertEqual(output.getvalue(), "")
+
+    def testMalformedReturned(self):
+        error = self.packets.dispatch(memoryview(C2SSnapshotAck(12).encode()[:3]), "")
+
+        self.assertIsInstance(error, MalformedPacket)
+        self.assertEqual(error.packet_id, packet_ids.C2S_SNAPSHOT_ACK)
+        self.assertEqual(self.handled, [])
+
+    def testHooks(self):
+        seen: list[tuple[int, int, str]] = []
+        self.packets.add_hook(packet_ids.C2S_SNAPSHOT_ACK, lambda id, size, context: seen.append((id, size, context)))
+
+        self.packets.dispatch(memoryview(C2SCreateBullet(0).encode()), "a")
+        self.packets.dispatch(memoryview(C2SSnapshotAck(1).encode()), "b")
+
+        self.assertEqual(seen, [(packet_ids.C2S_SNAPSHOT_ACK, 5, "b")])
+
+    def testReregisterKeepsHooks(self):
+        seen: list[int] = []
+        self.packets.add_hook(packet_ids.C2S_SNAPSHOT_ACK, lambda id, size, context: seen.append(id))
+        self.packets.register(packet_ids.C2S_SNAPSHOT_ACK, C2SSnapshotAck.decode_data, lambda packet, context: None)
+
+        self.packets.dispatch(memoryview(C2SSnapshotAck(1).encode()), "")
+
+        self.assertEqual(seen, [packet_ids.C2S_SNAPSHOT_ACK])
+        self.assertEqual(self.handled, [])
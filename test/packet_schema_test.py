@@ -0,0 +1,115 @@
+import unittest
+
+from common import packet_ids
+from common.packet_schema import U8, U16, U32, PacketSchema, Record
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None # type: ignore[assignment]
+
+ID: bytes = bytes(packet_ids.packet_id_size) # decode expects the packet id in front
+
+
+class packetSchema(unittest.TestCase):
+    """Tests for the compiled packet layouts"""
+
+    def testFields(self):
+        schema = PacketSchema([("a", U8), ("b", U16), ("c", U32)])
+
+        encoded = schema.encode((1, 0x0203, 0x04050607))
+
+        self.assertEqual(encoded, bytes([1, 2, 3, 4, 5, 6, 7]))
+        self.assertEqual(schema.decode(ID + encoded)[0], (1, 0x0203, 0x04050607))
+
+    def testCountedLists(self):
+        schema = PacketSchema([("seq", U32)], lists=[Record(("id", U16)), Record(("x", U16), ("y", U8))])
+
+        encoded = schema.encode((9,), [[1, 2], [(3, 4)]])
+
+        self.assertEqual(encoded, bytes([0, 0, 0, 9,  0, 2, 0, 1, 0, 2,  0, 1, 0, 3, 4]))
+
+        values, lists, rest = schema.decode(ID + encoded)
+        self.assertEqual(values, (9,))
+        self.assertEqual(lists, [[1, 2], [(3, 4)]])
+        self.assertIsNone(rest)
+
+    def testEmptyLists(self):
+        schema = PacketSchema(lists=[Record(("id", U16)), Record(("x", U16), ("y", U16))])
+
+        encoded = schema.encode(lists=[[], []])
+
+        self.assertEqual(encoded, bytes(4))
+        self.assertEqual(schema.decode(ID + encoded)[1], [[], []])
+
+    def testRestRecords(self):
+        schema = PacketSchema(rest=Record(("x", U16), ("y", U16)))
+        records = [(i, 2*i) for i in range(100)]
+
+        _, _, decoded = schema.decode(ID + schema.encode(rest=records))
+
+        self.assertEqual(decoded, records)
+
+    def testRestIgnoresPartialRecord(self):
+        schema = PacketSchema(rest=Record(("x", U16), ("y", U16)))
+
+        _, _, decoded = schema.decode(ID + bytes([0, 1, 0, 2, 0, 3]))
+
+        self.assertEqual(decoded, [(1, 2)])
+
+    def testText(self):
+        schema = PacketSchema([("caps", U8)], text=True)
+
+        encoded = schema.encode((5,), text="héllo")
+
+        self.assertEqual(encoded, bytes([5]) + "héllo".encode("utf-8"))
+        self.assertEqual(schema.decode(ID + encoded), ((5,), [], "héllo"))
+
+
+class recordArray(unittest.TestCase):
+    """Tests for records read in place"""
+
+    def setUp(self):
+        self.record = Record(("id", U16), ("x", U16), ("hp", U8))
+        self.schema = PacketSchema([("seq", U32)], lists=[Record(("removed", U16))], rest=self.record)
+
+        self.removed = [4, 5, 6]
+        self.records = [(i, 3*i, i % 256) for i in range(20)]
+        self.encoded = ID + self.schema.encode((1,), [self.removed], self.records)
+
+    def testMatchesEagerDecode(self):
+        values, (removed,), records = self.schema.decode(self.encoded, lazy=True)
+
+        self.assertEqual(values, (1,))
+        self.assertEqual(list(removed), self.removed)
+        self.assertEqual(list(records), self.records)
+
+    def testIndexing(self):
+        _, _, records = self.schema.decode(self.encoded, lazy=True)
+
+        self.assertEqual(len(records), 20)
+        self.assertEqual(records[3], (3, 9, 3))
+        self.assertEqual(records[-1], self.records[-1])
+        with self.assertRaises(IndexError):
+            records[20]
+
+    def testField(self):
+        _, _, records = self.schema.decode(self.encoded, lazy=True)
+
+        self.assertEqual(records.field(5, "id"), 5)
+        self.assertEqual(records.field(5, "x"), 15)
+        self.assertEqual(records.field(5, "hp"), 5)
+
+    def testNoCopy(self):
+        buffer = bytearray(self.encoded)
+        _, _, records = self.schema.decode(buffer, lazy=True)
+
+        buffer[-5:-3] = bytes([0, 42]) # id of the last record
+        self.assertEqual(records[-1][0], 42)
+
+    @unittest.skipIf(np is None, "numpy isn't installed")
+    def testNumpyExport(self):
+        _, _, records = self.schema.decode(self.encoded, lazy=True)
+        array = records.to_numpy()
+
+        self.assertEqual(array["x"].tolist(), [x for _, x, _ in self.records])
@@ -0,0 +1,54 @@
+import unittest
+
+from common.data_types import Color, Vec2D
+from common.player import CommonPlayer
+from server.position_history import PositionHistory
+
+
+def player(id: int, x: int, y: int) -> CommonPlayer:
+    return CommonPlayer(id, Vec2D(x, y), Vec2D(0, 0), Color(0, 0, 0))
+
+
+class positionHistory(unittest.TestCase):
+    """Tests for remembering where players were"""
+
+    def setUp(self):
+        self.history = PositionHistory(4)
+
+    def testPosition(self):
+        self.history.record(10, [player(0, 100, 200), player(3, 300, 400)])
+        self.history.record(11, [player(0, 103, 200)])
+
+        self.assertEqual(self.history.position(0, 10), (100, 200))
+        self.assertEqual(self.history.position(3, 10), (300, 400))
+        self.assertEqual(self.history.position(0, 11), (103, 200))
+
+    def testAbsent(self):
+        self.history.record(10, [player(0, 100, 200), player(3, 300, 400)])
+        self.history.record(14, [player(3, 300, 400)])
+
+        self.assertIsNone(self.history.position(1, 14)) # gap in the ids
+        self.assertIsNone(self.history.position(0, 14)) # left
+        self.assertIsNone(self.history.position(7, 14)) # past the highest id
+        self.assertIsNone(self.history.position(3, 10)) # overwritten by tick 14
+        self.assertIsNone(self.history.position(3, 12)) # never recorded
+
+    def testForget(self):
+        self.history.record(10, [player(0, 100, 200), player(3, 300, 400)])
+        self.history.record(11, [player(0, 103, 200), player(3, 300, 400)])
+
+        self.history.forget(3)
+        self.history.forget(9) # never recorded
+
+        self.assertIsNone(self.history.position(3, 10))
+        self.assertIsNone(self.history.position(3, 11))
+        self.assertEqual(self.history.position(0, 11), (103, 200))
+
+    def testCompact(self):
+        history = PositionHistory(16)
+        players = [player(id, id, id) for id in range(200)]
+        for tick in range(100):
+            history.record(tick, players)
+
+        self.assertEqual(history.size_bytes(), 16 * 200 * 4)
+        self.assertEqual(history.position(199, 99), (199, 199))
@@ -0,0 +1,100 @@
+import unittest
+
+from client.prediction import Predictor
+from common import movement
+from common.data_types import Vec2D
+from common.s2c_packets import S2CInputAck
+
+START = Vec2D(movement.WORLD_WIDTH // 2, movement.WORLD_HEIGHT // 2)
+
+
+class predictor(unittest.TestCase):
+    """Tests for predicting this client's movement"""
+
+    def setUp(self):
+        self.predictor = Predictor(5)
+        self.predictor.reconcile(0, 0, START.clone())
+
+    def testMovesStraightAway(self):
+        self.predictor.record_input(1, Vec2D(1, 0))
+        self.predictor.step()
+
+        self.assertEqual(self.predictor.pos, Vec2D(START.x + movement.PLAYER_SPEED, START.y))
+
+    def testStaysInBounds(self):
+        self.predictor.record_input(1, Vec2D(-1, -1))
+        for _ in range(movement.WORLD_WIDTH):
+            self.predictor.step()
+
+        self.assertEqual(self.predictor.pos, movement.PLAYER_BOUNDS.min)
+
+    def testReplaysUnacknowledgedInputs(self):
+        self.predictor.record_input(1, Vec2D(1, 0))
+        for _ in range(10):
+            self.predictor.step()
+
+        # the server applied input 1 and stepped 4 times, moving right 4 times. Replaying the other 6 agrees
+        self.predictor.reconcile(1, 4, Vec2D(START.x + 4*movement.PLAYER_SPEED, START.y))
+
+        self.assertEqual(self.predictor.pos, Vec2D(START.x + 10*movement.PLAYER_SPEED, START.y))
+        self.assertEqual(self.predictor.corrections, 0)
+
+    def testCorrectsToServer(self):
+        self.predictor.record_input(1, Vec2D(1, 0))
+        for _ in range(10):
+            self.predictor.step()
+
+        # something stopped the player after 2 steps on the server
+        self.predictor.reconcile(1, 4, Vec2D(START.x + 2*movement.PLAYER_SPEED, START.y))
+
+        self.assertEqual(self.predictor.pos, Vec2D(START.x + 8*movement.PLAYER_SPEED, START.y))
+        self.assertEqual(self.predictor.corrections, 1)
+
+    def testOldAcknowledgementIgnored(self):
+        self.predictor.record_input(1, Vec2D(1, 0))
+        self.predictor.step()
+        self.predictor.reconcile(1, 1, Vec2D(START.x + movement.PLAYER_SPEED, START.y))
+
+        self.predictor.reconcile(0, 5, START.clone())
+
+        self.assertEqual(self.predictor.pos, Vec2D(START.x + movement.PLAYER_SPEED, START.y))
+
+    def testAgreesWithServerAtHighLatency(self):
+        one_way = 5 # ticks each way, about 150ms round trip at 60 tps
+        presses = {10: Vec2D(1, 0), 40: Vec2D(1, -1), 70: Vec2D(0, 0), 75: Vec2D(-1, 1), 100: Vec2D(0, 0)}
+
+        # a server running the same rules, hearing from and replying to the client one_way ticks late
+        server_pos, server_dir = START.clone(), Vec2D(0, 0)
+        applied_seq, applied_tick = 0, -1
+        to_server: dict[int, tuple[int, Vec2D]] = {}
+        to_client: dict[int, S2CInputAck] = {}
+
+        seq = 0
+        for tick in range(150):
+            ack = to_client.pop(tick, None)
+            if ack is not None:
+                self.predictor.reconcile(ack.seq, ack.steps, ack.pos)
+
+            if tick in presses:
+                seq += 1
+                self.predictor.record_input(seq, presses[tick])
+                to_server[tick + one_way] = (seq, presses[tick])
+
+                before = self.predictor.pos.clone()
+                self.predictor.step()
+                if not presses[tick].is_none():
+                    self.assertNotEqual(self.predictor.pos, before) # moves on the same tick as the press
+            else:
+                self.predictor.step()
+
+            command = to_server.pop(tick, None)
+            if command is not None:
+                applied_seq, server_dir = command
+                applied_tick = tick
+            movement.step(server_pos, server_dir)
+
+            steps = 0 if applied_tick == -1 else tick - applied_tick + 1
+            to_client[tick + one_way] = S2CInputAck(applied_seq, steps, server_pos.clone())
+
+        self.assertEqual(self.predictor.corrections, 0)
+        self.assertEqual(self.predictor.pos, server_pos)
@@ -0,0 +1,59 @@
+import unittest
+
+from server.registry import IdAllocator, Registry
+
+
+class idAllocator(unittest.TestCase):
+    """Tests for handing out and reusing ids"""
+
+    def testReusesReleasedIds(self):
+        ids = IdAllocator(1 << 16)
+
+        self.assertEqual([ids.allocate() for _ in range(3)], [0, 1, 2])
+        ids.release(1)
+        self.assertEqual(ids.allocate(), 1)
+        self.assertEqual(ids.allocate(), 3)
+
+    def testExhausted(self):
+        ids = IdAllocator(2)
+
+        ids.allocate()
+        ids.allocate()
+        self.assertEqual(ids.allocate(), -1)
+
+
+class registry(unittest.TestCase):
+    """Tests for the id indexed registry"""
+
+    def testLookup(self):
+        reg: Registry[str] = Registry()
+        reg.add(300, "a")
+        reg.add(7, "b")
+
+        self.assertEqual(reg.get(300), "a")
+        self.assertIsNone(reg.get(8))
+        self.assertIn(7, reg)
+        self.assertEqual(len(reg), 2)
+
+        self.assertEqual(reg.remove(300), "a")
+        self.assertIsNone(reg.remove(300))
+        self.assertEqual(list(reg), ["b"])
+
+    def testSnapshotSharedUntilChanged(self):
+        reg: Registry[int] = Registry()
+        reg.add(0, 10)
+        reg.add(1, 11)
+
+        first = reg.values()
+        self.assertIs(reg.values(), first)
+
+        # changing it while iterating doesn't affect the loop
+        seen = []
+        for value in reg:
+            seen.append(value)
+            reg.remove(1)
+            reg.add(2, 12)
+
+        self.assertEqual(seen, [10, 11])
+        self.assertEqual(first, [10, 11])
+        self.assertEqual(reg.values(), [10, 12])
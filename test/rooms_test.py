@@ -0,0 +1,137 @@
+import socket
+import threading
+import unittest
+
+from common import packet_ids
+from common.c2s_packets import C2SHandshake
+from common.player import CommonPlayer
+from common.packet_base import Packet
+from common.packet_header import PacketHeader
+from common.s2c_packets import S2CSendID, S2CWorldDelta
+from common.stream_reader import StreamReader
+from server.main import Server
+from server.room import Room
+from server.settings import Settings
+
+
+def fill(room: Room, count: int) -> None:
+    for _ in range(count):
+        room.connections.add(room.player_ids.allocate(), None) # type: ignore[arg-type]
+
+
+class roomAssignment(unittest.TestCase):
+    """Tests for choosing the room a client joins"""
+
+    def setUp(self):
+        self.defaults = (Settings.max_rooms, Settings.room_capacity)
+        Settings.max_rooms, Settings.room_capacity = 8, 8 # sharding is opt in
+        self.server = Server(0)
+
+    def tearDown(self):
+        Settings.max_rooms, Settings.room_capacity = self.defaults
+        self.server.network.close()
+
+    def testDefaultIsOneArena(self):
+        Settings.max_rooms, Settings.room_capacity = self.defaults
+
+        room = self.server.find_room(C2SHandshake.ROOM_AUTO)
+        assert room is not None
+        self.assertEqual(room.capacity, 1 << (8*CommonPlayer.ID_SIZE))
+        fill(room, 100)
+
+        self.assertIs(self.server.find_room(C2SHandshake.ROOM_AUTO), room)
+        self.assertIsNone(self.server.find_room(1))
+
+    def testCapacityBoundedByIds(self):
+        Settings.room_capacity = 1 << 20
+
+        room = self.server.find_room(0)
+        assert room is not None
+        self.assertEqual(room.capacity, room.player_ids.limit)
+
+    def testOverflowAtCapacity(self):
+        for id in range(Settings.max_rooms):
+            room = self.server.find_room(C2SHandshake.ROOM_AUTO)
+            assert room is not None
+            self.assertEqual(room.id, id)
+
+            fill(room, Settings.room_capacity - 1)
+            self.assertIs(self.server.find_room(C2SHandshake.ROOM_AUTO), room)
+            fill(room, 1)
+
+        self.assertIsNone(self.server.find_room(C2SHandshake.ROOM_AUTO))
+
+    def testAutoFillsBusiestRoom(self):
+        quiet = self.server.find_room(3)
+        busy = self.server.find_room(5)
+        assert quiet is not None and busy is not None
+        fill(busy, 2)
+        fill(quiet, 1)
+
+        self.assertIs(self.server.find_room(C2SHandshake.ROOM_AUTO), busy)
+
+        fill(busy, Settings.room_capacity - 2)
+        self.assertIs(self.server.find_room(C2SHandshake.ROOM_AUTO), quiet)
+
+    def testAutoOpensLowestFreeRoom(self):
+        full = self.server.find_room(0)
+        assert full is not None
+        fill(full, Settings.room_capacity)
+
+        room = self.server.find_room(C2SHandshake.ROOM_AUTO)
+        assert room is not None
+        self.assertEqual(room.id, 1)
+
+    def testFullOrInvalidRoomRefused(self):
+        room = self.server.find_room(2)
+        assert room is not None
+        fill(room, Settings.room_capacity)
+
+        self.assertIsNone(self.server.find_room(2))
+        self.assertIsNone(self.server.find_room(Settings.max_rooms))
+
+
+class rooms(unittest.TestCase):
+    """Runs two rooms in one server over loopback"""
+
+    def setUp(self):
+        self.max_rooms = Settings.max_rooms
+        Settings.max_rooms = 4
+        self.server = Server(0)
+        self.server.port = self.server.network.listen(self.server.server, 0)
+        self.server_thread = threading.Thread(target=self.server.main_loop)
+        self.server_thread.start()
+
+    def tearDown(self):
+        self.server.network.call_soon(self.server.close_server)
+        self.server_thread.join()
+        Settings.max_rooms = self.max_rooms
+
+    def join(self, room: int) -> tuple[socket.socket, StreamReader]:
+        sock = socket.create_connection((self.server.server, self.server.port), timeout=2)
+        reader = StreamReader()
+        self.recv(sock, reader, packet_ids.S2C_HANDSHAKE)
+        PacketHeader.send_packet(sock, C2SHandshake(room=room))
+        return sock, reader
+
+    def recv(self, sock: socket.socket, reader: StreamReader, packet_id: int) -> bytes:
+        while True:
+            for frame in reader.frames():
+                if Packet.decode_id(frame) == packet_id:
+                    return bytes(frame)
+            reader.recv(sock)
+
+    def testRoomsAreSeparate(self):
+        a, a_reader = self.join(1)
+        b, b_reader = self.join(2)
+
+        # both are the first player in their room
+        self.assertEqual(S2CSendID.decode_data(self.recv(a, a_reader, packet_ids.S2C_SEND_ID)).player_id, 0)
+        self.assertEqual(S2CSendID.decode_data(self.recv(b, b_reader, packet_ids.S2C_SEND_ID)).player_id, 0)
+
+        for sock, reader in [(a, a_reader), (b, b_reader)]:
+            delta = S2CWorldDelta.decode_data(self.recv(sock, reader, packet_ids.S2C_WORLD_DELTA))
+            self.assertEqual(len(delta.players), 1)
+
+        a.close()
+        b.close()
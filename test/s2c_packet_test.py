@@ -3,18 +3,19 @@ import unittest
 from common.bullet import CommonBullet
 from common.data_types import Color, Vec2D
 from common.player import CommonPlayer
-from common.s2c_packets import S2CBullets, S2CDisconnectPlayer, S2CHandshake, S2CPlayers, S2CSendID
+from common.s2c_packets import S2CBullets, S2CDisconnectPlayer, S2CHandshake, S2CPlayers, S2CSendID, S2CWorldDelta
 
 
 class s2cPackets(unittest.TestCase):
 
     def testHandshakePacket(self):
-        packet = S2CHandshake("test")
+        packet = S2CHandshake("test", capabilities=0b101)
 
         encoded = packet.encode()
         decoded = S2CHandshake.decode_data(encoded)
 
         self.assertEqual(decoded.message, packet.message)
+        self.assertEqual(decoded.capabilities, packet.capabilities)
 
     def testPlayersPacket(self):
         packet = S2CPlayers([
@@ -22,11 +23,13 @@ class s2cPackets(unittest.TestCase):
             CommonPlayer(1, Vec2D(3,2), Vec2D(0,1), Color( 54, 127, 190)),
             CommonPlayer(2, Vec2D(4,7), Vec2D(0,1), Color(200, 235,  67)),
             CommonPlayer(3, Vec2D(9,9), Vec2D(0,1), Color(218,   0,   5)),
-        ])
+        ], tick=12)
 
         encoded = packet.encode()
         decoded = S2CPlayers.decode_data(encoded)
 
+        self.assertEqual(decoded.tick, packet.tick)
+
         for i, expected in enumerate(packet.players):
             actual = decoded.players[i]
 
@@ -47,8 +50,18 @@ class s2cPackets(unittest.TestCase):
 
             self.assertEqual(actual, expected)
 
+    def testBulletsView(self):
+        bullets = [CommonBullet(Vec2D(i, 1000-i), -1) for i in range(50)]
+
+        tick, records = S2CBullets.decode_view(S2CBullets(bullets, tick=70_000).encode())
+
+        self.assertEqual(tick, 70_000)
+        self.assertEqual(len(records), len(bullets))
+        self.assertEqual(list(records), [b.record() for b in bullets])
+        self.assertEqual(records.field(7, "y"), 993)
+
     def testSendID(self):
-        packet = S2CSendID(5)
+        packet = S2CSendID(1000)
 
         encoded = packet.encode()
         decoded = S2CSendID.decode_data(encoded)
@@ -62,3 +75,50 @@ class s2cPackets(unittest.TestCase):
         decoded = S2CDisconnectPlayer.decode_data(encoded)
 
         self.assertEqual(packet.reason, decoded.reason)
+
+    def testWorldDelta(self):
+        packet = S2CWorldDelta(
+            seq=1200,
+            baseline=1187,
+            players=[
+                CommonPlayer(4, Vec2D(80,600), Vec2D(0,1), Color(128, 253,  43)),
+                CommonPlayer(4000, Vec2D(35,200), Vec2D(0,1), Color( 54, 127, 190)),
+            ],
+            removed_players=[2, 700],
+            bullets=[
+                CommonBullet(Vec2D(128,  16), 4500, id=300, spawn_tick=1190),
+                CommonBullet(Vec2D(830, 678), 35999, id=65535, spawn_tick=1199),
+            ],
+            removed_bullets=[12],
+        )
+
+        encoded = packet.encode()
+        decoded = S2CWorldDelta.decode_data(encoded)
+
+        self.assertEqual(decoded.seq, packet.seq)
+        self.assertEqual(decoded.baseline, packet.baseline)
+        self.assertEqual(decoded.players, packet.players)
+        self.assertEqual([p.id for p in decoded.players], [4, 4000])
+        self.assertEqual(decoded.removed_players, packet.removed_players)
+        self.assertEqual(decoded.bullets, packet.bullets)
+        self.assertEqual([b.id for b in decoded.bullets], [300, 65535])
+        self.assertEqual([(b.shoot_angle, b.spawn_tick) for b in decoded.bullets], [(4500, 1190), (35999, 1199)])
+        self.assertEqual(decoded.removed_bullets, packet.removed_bullets)
+
+    def testWorldDeltaView(self):
+        packet = S2CWorldDelta(
+            seq=1200,
+            baseline=1187,
+            players=[CommonPlayer(4, Vec2D(80,600), Vec2D(0,1), Color(128, 253,  43))],
+            removed_players=[2, 700],
+            bullets=[CommonBullet(Vec2D(128,  16), -1, id=300, spawn_tick=1190)],
+            removed_bullets=[12],
+        )
+
+        view = S2CWorldDelta.decode_view(packet.encode())
+
+        self.assertEqual((view.seq, view.baseline), (1200, 1187))
+        self.assertEqual(list(view.players), [(4, 80, 600, 128, 253, 43)])
+        self.assertEqual(list(view.removed_players), [2, 700])
+        self.assertEqual(list(view.bullets), [(300, 128, 16, 35999, 1190)])
+        self.assertEqual(list(view.removed_bullets), [12])
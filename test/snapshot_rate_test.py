@@ -0,0 +1,85 @@
+import unittest
+
+from server.settings import Settings
+from server.snapshot_rate import SnapshotRate
+
+CONGESTED = Settings.rate_backlog_bytes + 1
+
+
+class snapshotRate(unittest.TestCase):
+    """Tests for slowing snapshots to clients that fall behind"""
+
+    def setUp(self):
+        self.rate = SnapshotRate()
+        self.tick = 1
+
+    def run_ticks(self, ticks: int, backlog: int = 0, behind_ticks: int = 0) -> list[int]:
+        '''Ticks on which the rate changed'''
+        changes = []
+        for _ in range(ticks):
+            if self.rate.update(self.tick, backlog, behind_ticks):
+                changes.append(self.tick)
+            self.tick += 1
+        return changes
+
+    def testStartsFastest(self):
+        self.assertEqual(self.rate.interval, Settings.snapshot_intervals[0])
+        self.assertTrue(self.rate.is_due(0))
+
+    def testStepsDownWhenBackedUp(self):
+        self.run_ticks(1, backlog=CONGESTED)
+
+        self.assertEqual(self.rate.interval, Settings.snapshot_intervals[1])
+
+    def testStepsDownWhenBehind(self):
+        self.run_ticks(1, behind_ticks=Settings.rate_behind_ticks + 1)
+
+        self.assertEqual(self.rate.level, 1)
+
+    def testSettlesBetweenChanges(self):
+        changes = self.run_ticks(Settings.rate_settle_ticks + 1, backlog=CONGESTED)
+
+        self.assertEqual(changes, [1, 1 + Settings.rate_settle_ticks])
+        self.assertEqual(self.rate.level, 2)
+
+    def testStaysAtSlowest(self):
+        self.run_ticks(10 * Settings.rate_settle_ticks, backlog=CONGESTED)
+
+        self.assertEqual(self.rate.level, len(Settings.snapshot_intervals) - 1)
+
+    def testStepsUpAfterRecovering(self):
+        self.run_ticks(1, backlog=CONGESTED)
+        self.run_ticks(Settings.rate_settle_ticks + Settings.rate_recovery_ticks - 2)
+        self.assertEqual(self.rate.level, 1)
+
+        self.run_ticks(1)
+        self.assertEqual(self.rate.level, 0)
+
+    def testBacksOffWhenStepUpFails(self):
+        self.run_ticks(1, backlog=CONGESTED)
+        self.run_ticks(Settings.rate_settle_ticks + Settings.rate_recovery_ticks)
+        self.assertEqual(self.rate.level, 0)
+
+        self.run_ticks(Settings.rate_settle_ticks)
+        self.run_ticks(1, backlog=CONGESTED)
+
+        self.assertEqual(self.rate.level, 1)
+        self.assertEqual(self.rate.recovery_ticks, 2 * Settings.rate_recovery_ticks)
+
+    def testQueueingRoundTrips(self):
+        self.rate.record_rtt(0.05)
+        for _ in range(100):
+            self.rate.record_rtt(0.05 + 2*Settings.rate_max_queue_delay)
+
+        self.assertGreater(self.rate.queue_delay(), Settings.rate_max_queue_delay)
+        self.run_ticks(1)
+        self.assertEqual(self.rate.level, 1)
+
+    def testThroughputPerSecond(self):
+        self.tick = 0
+        self.run_ticks(1)
+        self.rate.record_sent(1000)
+        self.rate.record_sent(500)
+        self.run_ticks(Settings.tps)
+
+        self.assertEqual(self.rate.throughput, 1500)
@@ -0,0 +1,95 @@
+import unittest
+
+from common.bullet import CommonBullet
+from common.data_types import Color, Rect, Vec2D
+from common.player import CommonPlayer
+from common.s2c_packets import S2CBullets, S2CPlayers, S2CWorldDelta
+from server.bullet import ServerBullet
+from server.snapshots import EMPTY_WORLD, DeltaTracker, WorldState
+from server.spatial_grid import SpatialGrid
+
+
+def player(id: int, x: int, y: int) -> CommonPlayer:
+    return CommonPlayer(id, Vec2D(x, y), Vec2D(0, 0), Color(id, id, id))
+
+
+class snapshots(unittest.TestCase):
+    """Tests for world states, deltas and views"""
+
+    def testDeltaFromEmpty(self):
+        state = WorldState(5, [player(0, 10, 10), player(1, 20, 20)], [CommonBullet(Vec2D(3, 4), 0, id=7)])
+
+        delta = state.delta_from(EMPTY_WORLD)
+
+        self.assertEqual(delta.seq, 5)
+        self.assertEqual([p.id for p in delta.players], [0, 1])
+        self.assertEqual([b.id for b in delta.bullets], [7])
+        self.assertEqual(delta.removed_players, [])
+
+    def testDeltaOnlyHasChanges(self):
+        baseline = WorldState(5, [player(0, 10, 10), player(1, 20, 20), player(2, 30, 30)], [])
+        state = WorldState(6, [player(0, 10, 10), player(1, 25, 20), player(3, 40, 40)], [])
+
+        delta = state.delta_from(baseline)
+
+        self.assertEqual(delta.baseline, 5)
+        self.assertEqual(sorted(p.id for p in delta.players), [1, 3])
+        self.assertEqual(delta.removed_players, [2])
+
+    def testMovingBulletsNotResent(self):
+        tick = [5]
+        clock = lambda: tick[0]
+        moving = ServerBullet(Vec2D(100, 100), 9000, clock)
+        gone = ServerBullet(Vec2D(200, 200), 0, clock)
+        moving.id, gone.id = 1, 2
+        baseline = WorldState(5, [], [moving, gone])
+
+        tick[0] = 6
+        fired = ServerBullet(Vec2D(300, 300), 0, clock)
+        reused = ServerBullet(Vec2D(400, 400), 0, clock)
+        fired.id, reused.id = 3, 2
+        delta = WorldState(6, [], [moving, fired, reused]).delta_from(baseline)
+
+        self.assertEqual(sorted(b.id for b in delta.bullets), [2, 3]) # 2 is a different bullet now
+        self.assertEqual(delta.removed_bullets, [])
+        self.assertEqual(WorldState(7, [], [moving]).delta_from(baseline).removed_bullets, [2])
+
+    def testBulletHeavyDeltaSize(self):
+        tick = [10]
+        clock = lambda: tick[0]
+        bullets = [ServerBullet(Vec2D(500, 500), i * 150, clock) for i in range(200)]
+        for i, b in enumerate(bullets):
+            b.id = i
+
+        baseline = WorldState(10, [player(i, 10*i, 10*i) for i in range(64)], bullets, bullet_positions=False)
+        tick[0] = 11
+        moved = [player(i, 10*i + (i < 8), 10*i) for i in range(64)]
+        delta = WorldState(11, moved, bullets, bullet_positions=False).delta_from(baseline)
+
+        full = len(S2CPlayers(moved).encode()) + len(S2CBullets(bullets).encode())
+        self.assertEqual(len(delta.encode()), len(S2CWorldDelta(11, 10, moved[:8], [], [], []).encode()))
+        self.assertLess(len(delta.encode()) * 8, full)
+
+    def testViewOnlyHasNearbyEntities(self):
+        grid = SpatialGrid(Rect(Vec2D(0, 0), Vec2D(1000, 1000)), 100)
+        state = WorldState(1, [player(0, 50, 50), player(1, 150, 50), player(2, 950, 950)], [CommonBullet(Vec2D(120, 120), 0, id=1), CommonBullet(Vec2D(800, 20), 0, id=2)], grid)
+
+        area = grid.area_around(Vec2D(50, 50), 100)
+        view = state.view(area)
+
+        self.assertEqual(sorted(view.players), [0, 1])
+        self.assertEqual(sorted(view.bullets), [1])
+        self.assertIs(state.view(area), view)
+
+    def testAckTimesRoundTrip(self):
+        tracker = DeltaTracker()
+        first, second = WorldState(2, [], []), WorldState(4, [], [])
+        tracker.record_sent(first)
+        tracker.record_sent(second)
+
+        rtt = tracker.ack(4)
+
+        self.assertIsNotNone(rtt)
+        self.assertGreaterEqual(rtt, 0)
+        self.assertIs(tracker.baseline, second)
+        self.assertIsNone(tracker.ack(2)) # superseded
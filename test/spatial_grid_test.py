@@ -0,0 +1,36 @@
+import unittest
+
+from common.data_types import Rect, Vec2D
+from server.spatial_grid import CellIndex, SpatialGrid
+
+
+class cellIndex(unittest.TestCase):
+    """Tests for the collision broadphase"""
+
+    def setUp(self):
+        self.index = CellIndex(SpatialGrid(Rect(Vec2D(0, 0), Vec2D(1000, 1000)), 100))
+
+    def testOnlyNearbyIdsFound(self):
+        self.index.move(1, Vec2D(150, 150))
+        self.index.move(2, Vec2D(250, 150))
+        self.index.move(3, Vec2D(850, 850))
+
+        area = self.index.grid.area_around(Vec2D(190, 150), 50)
+        self.assertEqual(sorted(self.index.ids_in(area)), [1, 2])
+
+    def testMoveBetweenCells(self):
+        self.index.move(1, Vec2D(150, 150))
+        self.index.move(1, Vec2D(160, 150)) # same cell
+        self.index.move(1, Vec2D(950, 950))
+
+        self.assertEqual(self.index.ids_in((1, 1, 1, 1)), [])
+        self.assertEqual(self.index.ids_in((9, 9, 9, 9)), [1])
+        self.assertEqual(len(self.index.cells), 1)
+
+    def testRemove(self):
+        self.index.move(1, Vec2D(150, 150))
+        self.index.remove(1)
+        self.index.remove(1)
+
+        self.assertEqual(len(self.index), 0)
+        self.assertEqual(self.index.cells, {})
@@ -0,0 +1,138 @@
+import socket
+import threading
+import unittest
+
+from common.packet_header import PacketHeader
+from common.stream_reader import FrameTooLarge, StreamReader
+
+
+def frame(payload: bytes) -> bytes:
+    return PacketHeader.encode_size(len(payload)) + payload
+
+
+class packetHeader(unittest.TestCase):
+    """Tests for the variable length frame header"""
+
+    def testShortHeaderUnchanged(self):
+        for size in (0, 1, 300, PacketHeader.MAX_SHORT_SIZE):
+            with self.subTest(size=size):
+                self.assertEqual(PacketHeader.encode_size(size), size.to_bytes(2, byteorder="big"))
+
+    def testLongHeader(self):
+        for size in (PacketHeader.MAX_SHORT_SIZE + 1, 70000, PacketHeader.MAX_PACKET_SIZE):
+            with self.subTest(size=size):
+                header = PacketHeader.encode_size(size)
+
+                self.assertEqual(len(header), PacketHeader.LONG_HEADER_SIZE)
+                self.assertEqual(PacketHeader.header_size(header[0]), PacketHeader.LONG_HEADER_SIZE)
+                self.assertEqual(PacketHeader.get_packet_size(header), size)
+
+    def testTooBig(self):
+        with self.assertRaises(ValueError):
+            PacketHeader.encode_size(PacketHeader.MAX_PACKET_SIZE + 1)
+
+
+class streamReader(unittest.TestCase):
+    """Tests for reassembling frames from a stream"""
+
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def testManyFramesOneRead(self):
+        payloads = [b"\x82abc", b"\x83", b"\x84" + bytes(100)]
+        self.a.sendall(b"".join(frame(p) for p in payloads))
+
+        reader = StreamReader(1024)
+        reader.recv(self.b)
+
+        self.assertEqual([bytes(f) for f in reader.frames()], payloads)
+
+    def testSplitFrame(self):
+        payload = bytes(range(200))
+        data = frame(payload)
+
+        reader = StreamReader(1024)
+        received = []
+        for chunk in (data[:1], data[1:50], data[50:]):
+            self.a.sendall(chunk)
+            reader.recv(self.b)
+            received += [bytes(f) for f in reader.frames()]
+
+        self.assertEqual(received, [payload])
+
+    def testFrameLargerThanBuffer(self):
+        payloads = [bytes([1]) * 30, bytes([2]) * 500, bytes([3]) * 10]
+        data = b"".join(frame(p) for p in payloads)
+
+        self.a.sendall(data)
+
+        reader = StreamReader(64)
+        received = []
+        while len(received) < len(payloads):
+            reader.recv(self.b)
+            received += [bytes(f) for f in reader.frames()]
+
+        self.assertEqual(received, payloads)
+
+    def testLongFrames(self):
+        payloads = [bytes([1]) * 10, bytes([2]) * 70000, bytes([3]) * 5]
+        data = b"".join(frame(p) for p in payloads)
+
+        reader = StreamReader(1024)
+        received = []
+        sender = threading.Thread(target=self.a.sendall, args=(data,))
+        sender.start()
+        while len(received) < len(payloads):
+            reader.recv(self.b)
+            received += [bytes(f) for f in reader.frames()]
+        sender.join()
+
+        self.assertEqual(received, payloads)
+
+    def testHeaderSplitAcrossReads(self):
+        payload = bytes(40000)
+        data = frame(payload)
+
+        reader = StreamReader(64)
+        received = []
+        sender = threading.Thread(target=lambda: [self.a.sendall(chunk) for chunk in (data[:3], data[3:])])
+        sender.start()
+        while not received:
+            reader.recv(self.b)
+            received += [bytes(f) for f in reader.frames()]
+        sender.join()
+
+        self.assertEqual(received, [payload])
+
+    def testClosedPeer(self):
+        self.a.close()
+
+        reader = StreamReader(64)
+        self.assertEqual(reader.recv(self.b), 0)
+
+    def testOversizedFrameRejectedFromHeader(self):
+        self.a.sendall(b"\xff\xff\xff\xff")
+
+        reader = StreamReader(64, max_frame_size=4096)
+        reader.recv(self.b)
+
+        with self.assertRaises(FrameTooLarge):
+            list(reader.frames())
+        with self.assertRaises(FrameTooLarge):
+            reader.recv(self.b) # without draining frames first
+        self.assertEqual(len(reader.buffer), 64)
+
+    def testFrameAtLimitAccepted(self):
+        self.a.sendall(frame(bytes(100)))
+
+        reader = StreamReader(64, max_frame_size=100)
+        received = []
+        while not received:
+            reader.recv(self.b)
+            received += [bytes(f) for f in reader.frames()]
+
+        self.assertEqual(received, [bytes(100)])
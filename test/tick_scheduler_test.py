@@ -0,0 +1,53 @@
+import time
+import unittest
+
+from server.tick_scheduler import TickScheduler
+
+TICK_NS = 5_000_000
+
+
+class tickScheduler(unittest.TestCase):
+    """Tests for the fixed timestep scheduler"""
+
+    def testDeadlinesDontDrift(self):
+        scheduler = TickScheduler(TICK_NS, 5, 500_000)
+        start = scheduler.next_deadline_ns
+
+        while scheduler.tick < 20:
+            scheduler.run_due(lambda: None)
+            scheduler.wait(time.sleep)
+
+        # every deadline is a whole number of ticks from the start however late a tick ran
+        scheduled = scheduler.tick + scheduler.stats.skipped_ticks
+        self.assertEqual(scheduler.next_deadline_ns, start + scheduled*TICK_NS)
+        self.assertGreaterEqual(time.perf_counter_ns(), scheduler.next_deadline_ns)
+
+    def testCatchUpIsBounded(self):
+        scheduler = TickScheduler(TICK_NS, 3, 500_000)
+        scheduler.next_deadline_ns -= 10*TICK_NS # stalled for 10 ticks
+
+        ran: list[int] = []
+        scheduler.run_due(lambda: ran.append(scheduler.tick))
+
+        self.assertEqual(ran, [1, 2, 3])
+        self.assertEqual(scheduler.stats.skipped_ticks, 8)
+        self.assertGreater(scheduler.next_deadline_ns, time.perf_counter_ns())
+        self.assertGreater(scheduler.stats.late_ticks, 0)
+
+    def testOverrunsCounted(self):
+        scheduler = TickScheduler(TICK_NS, 1, 500_000)
+        scheduler.run_due(lambda: time.sleep(2*TICK_NS / 1_000_000_000))
+
+        self.assertEqual(scheduler.stats.ticks, 1)
+        self.assertEqual(scheduler.stats.overruns, 1)
+        self.assertGreaterEqual(scheduler.stats.max_work_ns, 2*TICK_NS)
+
+    def testResetSkipsIdleTime(self):
+        scheduler = TickScheduler(TICK_NS, 5, 500_000)
+        scheduler.next_deadline_ns -= 100*TICK_NS
+        scheduler.reset()
+
+        scheduler.run_due(lambda: None)
+        self.assertEqual(scheduler.tick, 1)
+        self.assertEqual(scheduler.stats.skipped_ticks, 0)
+
@@ -0,0 +1,181 @@
+import socket
+import threading
+import unittest
+
+from common import capabilities, datagram, packet_ids
+from common.c2s_packets import C2SHandshake, C2SMovementUpdate, C2SSnapshotAck, C2SUdpBind
+from common.data_types import Vec2D
+from common.packet_base import Packet
+from common.packet_header import PacketHeader
+from common.s2c_packets import S2CFragment, S2CHandshake, S2CUdpToken, S2CWorldDelta
+from common.stream_reader import StreamReader
+from server.main import Server
+from server.settings import Settings
+
+
+class staleFilter(unittest.TestCase):
+    """Tests for dropping out of order datagrams"""
+
+    def testDropsOldAndDuplicate(self):
+        f = datagram.StaleFilter()
+
+        self.assertTrue(f.accept(packet_ids.S2C_PLAYERS, 5))
+        self.assertFalse(f.accept(packet_ids.S2C_PLAYERS, 5))
+        self.assertFalse(f.accept(packet_ids.S2C_PLAYERS, 3))
+        self.assertTrue(f.accept(packet_ids.S2C_BULLETS, 3))
+        self.assertTrue(f.accept(packet_ids.S2C_PLAYERS, 6))
+
+    def testSurvivesWrap(self):
+        f = datagram.StaleFilter()
+
+        self.assertTrue(f.accept(packet_ids.S2C_PLAYERS, datagram.SEQ_MODULO - 1))
+        self.assertTrue(f.accept(packet_ids.S2C_PLAYERS, 0))
+        self.assertFalse(f.accept(packet_ids.S2C_PLAYERS, datagram.SEQ_MODULO - 2))
+
+
+class fragments(unittest.TestCase):
+    """Tests for splitting packets across datagrams"""
+
+    def setUp(self):
+        self.packet = bytes(range(256)) * 20
+        self.fragments = [S2CFragment.decode_data(f) for f in datagram.fragment(self.packet, 7, 1000)]
+
+    def testFitsAndCovers(self):
+        encoded = datagram.fragment(self.packet, 7, 1000)
+
+        self.assertTrue(all(len(f) <= 1000 for f in encoded))
+        self.assertEqual(b"".join(bytes(f.data) for f in self.fragments), self.packet)
+        self.assertEqual({f.count for f in self.fragments}, {len(encoded)})
+
+    def testOutOfOrder(self):
+        r = datagram.Reassembler(4)
+        first_seq = 100
+        order = list(reversed(range(len(self.fragments))))
+
+        results = [r.add(first_seq + i, self.fragments[i]) for i in order]
+
+        self.assertEqual(results[:-1], [None] * (len(order) - 1))
+        self.assertEqual(results[-1], (first_seq, self.packet))
+        self.assertEqual(r.pending, {})
+
+    def testDuplicateIgnored(self):
+        r = datagram.Reassembler(4)
+
+        self.assertIsNone(r.add(0, self.fragments[0]))
+        self.assertIsNone(r.add(0, self.fragments[0]))
+        self.assertEqual(r.pending[7].missing, len(self.fragments) - 1)
+
+    def testIncompleteEvicted(self):
+        r = datagram.Reassembler(2)
+
+        for message in range(3):
+            r.add(0, S2CFragment(message, 0, 2, b"a"))
+
+        self.assertEqual(list(r.pending), [1, 2])
+
+
+class udpChannel(unittest.TestCase):
+    """Negotiates the datagram channel with a server over loopback"""
+
+    def setUp(self):
+        self.server = Server(0)
+        self.server.port = self.server.network.listen(self.server.server, 0)
+        self.server_thread = threading.Thread(target=self.server.main_loop)
+        self.server_thread.start()
+
+        self.tcp = socket.create_connection((self.server.server, self.server.port), timeout=2)
+        self.reader = StreamReader()
+
+        self.udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp.connect((self.server.server, self.server.port))
+        self.udp.settimeout(0.2)
+
+    def tearDown(self):
+        self.tcp.close()
+        self.udp.close()
+        self.server.network.call_soon(self.server.close_server)
+        self.server_thread.join()
+
+    def recv_tcp(self, packet_id: int) -> bytes:
+        while True:
+            for frame in self.reader.frames():
+                if Packet.decode_id(frame) == packet_id:
+                    return bytes(frame)
+            self.reader.recv(self.tcp)
+
+    def recv_udp(self, packet_id: int) -> tuple[int, bytes]:
+        for _ in range(20):
+            try:
+                seq, data = datagram.split(memoryview(self.udp.recv(65536)))
+            except socket.timeout:
+                continue
+            if Packet.decode_id(data) == packet_id:
+                return seq, bytes(data)
+        self.fail("no datagram received")
+
+    def testSnapshotsAndMovementOverUdp(self):
+        handshake = S2CHandshake.decode_data(self.recv_tcp(packet_ids.S2C_HANDSHAKE))
+        self.assertTrue(handshake.capabilities & capabilities.UDP)
+
+        PacketHeader.send_packet(self.tcp, C2SHandshake(capabilities=capabilities.UDP))
+        token = S2CUdpToken.decode_data(self.recv_tcp(packet_ids.S2C_UDP_TOKEN)).token
+
+        self.udp.send(datagram.encode_seq(0) + C2SUdpBind(token).encode())
+
+        # unacknowledged deltas are repeated until acked
+        seq, data = self.recv_udp(packet_ids.S2C_WORLD_DELTA)
+        delta = S2CWorldDelta.decode_data(data)
+        self.assertEqual(len(delta.players), 1)
+
+        self.udp.send(datagram.encode_seq(1) + C2SSnapshotAck(delta.seq).encode())
+        self.udp.send(datagram.encode_seq(2) + C2SMovementUpdate(Vec2D(1, 0)).encode())
+        self.udp.send(datagram.encode_seq(2) + C2SMovementUpdate(Vec2D(1, 0)).encode()) # redundant copy
+
+        moved = delta
+        while moved.baseline != delta.seq:
+            _, data = self.recv_udp(packet_ids.S2C_WORLD_DELTA)
+            moved = S2CWorldDelta.decode_data(data)
+
+        self.assertEqual(moved.players[0].id, delta.players[0].id)
+        self.assertNotEqual(moved.players[0].pos, delta.players[0].pos)
+
+    def testMalformedDatagramsDropped(self):
+        S2CHandshake.decode_data(self.recv_tcp(packet_ids.S2C_HANDSHAKE))
+        PacketHeader.send_packet(self.tcp, C2SHandshake(capabilities=capabilities.UDP))
+        token = S2CUdpToken.decode_data(self.recv_tcp(packet_ids.S2C_UDP_TOKEN)).token
+
+        bind = datagram.encode_seq(0) + C2SUdpBind(token).encode()
+        for size in range(datagram.SEQ_SIZE + 1, len(bind)):
+            self.udp.send(bind[:size]) # from an address nobody has bound
+        self.udp.send(bind + b"\0")
+
+        self.udp.send(bind)
+        self.udp.send(datagram.encode_seq(1) + C2SMovementUpdate(Vec2D(1, 0)).encode()[:2]) # truncated, from a bound peer
+
+        self.recv_udp(packet_ids.S2C_WORLD_DELTA)
+        self.assertTrue(self.server_thread.is_alive())
+
+    def testLargeSnapshotFragmented(self):
+        S2CHandshake.decode_data(self.recv_tcp(packet_ids.S2C_HANDSHAKE))
+        PacketHeader.send_packet(self.tcp, C2SHandshake(capabilities=capabilities.UDP))
+        token = S2CUdpToken.decode_data(self.recv_tcp(packet_ids.S2C_UDP_TOKEN)).token
+
+        self.udp.send(datagram.encode_seq(0) + C2SUdpBind(token).encode())
+        self.recv_udp(packet_ids.S2C_WORLD_DELTA)
+
+        def add_bullets() -> None:
+            room = next(iter(self.server.rooms.values()))
+            player = next(iter(room.game.players)) # bullets don't hit their shooter
+            for angle in range(0, 36000, 36):
+                room.game.add_bullet(Vec2D(Settings.world_width // 2, Settings.world_height // 2), angle, player)
+        self.server.network.call_soon(add_bullets)
+
+        r = datagram.Reassembler(4)
+        whole = None
+        while whole is None or Packet.decode_id(whole[1]) != packet_ids.S2C_WORLD_DELTA:
+            seq, data = self.recv_udp(packet_ids.S2C_FRAGMENT)
+            self.assertLessEqual(len(data) + datagram.SEQ_SIZE, Settings.max_datagram_size)
+            whole = r.add(seq, S2CFragment.decode_data(data))
+
+        delta = S2CWorldDelta.decode_data(whole[1])
+        self.assertEqual(len(delta.bullets), 1000)